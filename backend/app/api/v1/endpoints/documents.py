@@ -2,16 +2,18 @@
 文档管理API端点
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
-from typing import List
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request, Response
+from typing import List, Optional
+import asyncio
+import time
 import os
 import shutil
+import logging
 from pathlib import Path
 from datetime import datetime
-import uuid
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # 支持的文件类型
 ALLOWED_EXTENSIONS = {
@@ -47,49 +49,136 @@ def validate_file(filename: str) -> bool:
     return ext in ALLOWED_EXTENSIONS
 
 
-@router.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
+def check_upload_filename(filename: str):
+    """流式上传写盘前检查文件类型"""
+    from app.services.upload_stream import UploadError
+    if not validate_file(filename):
+        raise UploadError(f"不支持的文件类型。支持的类型: {', '.join(ALLOWED_EXTENSIONS)}")
+
+
+# 上传接口直接解析请求体流，在 OpenAPI 中仍按文件表单描述
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+
+def index_document(file_path: str, original_filename: str, user_id: Optional[int] = None):
+    """后台建立文档索引（抽取文本、切块、向量化），失败只记录日志"""
+    from app.core.documents import DocumentBusy, ingest_file
+    try:
+        ingest_file(file_path, source=original_filename, user_id=user_id)
+    except DocumentBusy:
+        logger.info(f"文档正在由其他进程建立索引，跳过: {original_filename}")
+    except Exception as e:
+        logger.warning(f"文档索引失败 {original_filename}: {e}")
+
+
+_catalog_imported = False
+
+
+def get_catalog():
+    """文档目录（按内容哈希存储），首次使用时登记 DOC_PATH 中已有的文件"""
+    global _catalog_imported
+    from app.services.document_store import document_store
+    if not _catalog_imported:
+        document_store.import_files(FILE_TYPE_MAPPING, original_filenames)
+        _catalog_imported = True
+    return document_store
+
+
+def original_filenames() -> dict:
+    """索引中记录的原始文件名，用于登记去重存储之前上传的文件"""
+    return {doc_id: state["source"] for doc_id, state in get_index_states().items() if state.get("source")}
+
+
+def get_index_states(doc_ids=None) -> dict:
+    """文档的索引状态，索引不可用时返回空字典"""
+    try:
+        from app.core.documents import get_document_index
+        return get_document_index().documents(doc_ids)
+    except Exception as e:
+        logger.warning(f"读取文档索引状态失败: {e}")
+        return {}
+
+
+@router.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_document(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user_id: Optional[int] = Query(None, description="上传者，按上传者分别计数对文档的引用"),
+):
     """
     上传文档到本地知识库
 
     支持的格式: PDF, TXT, CSV, XLSX, MD, PPT, PPTX, DOCX, DOC
+    文件按块流式写盘并同时计算 SHA-256，超过 MAX_UPLOAD_SIZE 立即中止（413）。
+    内容相同的文件只存一份：重复上传直接返回已有文档的 ID，复用其解析结果和向量索引（deduplicated 为 true）。
+    上传后在后台建立向量索引，本地文档研究直接检索索引
     """
+    from app.core.config import settings
+    from app.services.upload_stream import UploadError, UploadTooLarge, receive_upload
+
     try:
-        # 验证文件类型
-        if not validate_file(file.filename):
+        doc_dir = get_document_dir()
+        try:
+            received = await receive_upload(request, doc_dir, validate_filename=check_upload_filename)
+        except UploadTooLarge:
             raise HTTPException(
-                status_code=400,
-                detail=f"不支持的文件类型。支持的类型: {', '.join(ALLOWED_EXTENSIONS)}"
+                status_code=413,
+                detail=f"文件过大，最大允许 {settings.MAX_UPLOAD_SIZE / (1024 * 1024):.0f}MB"
             )
-
-        # 读取文件内容
-        content = await file.read()
-
-        # 生成唯一文件名
-        file_ext = Path(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-
-        # 保存文件
-        doc_dir = get_document_dir()
-        file_path = doc_dir / unique_filename
-
-        with open(file_path, "wb") as f:
-            f.write(content)
-
-        # 获取文件大小
-        file_size = len(content)
+        except UploadError as e:
+            raise HTTPException(status_code=e.status_code, detail=f"文件上传失败: {e}")
+
+        # 按内容哈希存储（临时文件在同一目录，新内容直接改名，重复内容删除临时文件）
+        catalog = await asyncio.to_thread(get_catalog)
+        stored = await asyncio.to_thread(
+            catalog.add, received.path, received.sha256, received.filename, received.size, user_id,
+            FILE_TYPE_MAPPING.get(Path(received.filename).suffix.lower(), 'unknown'),
+        )
 
         # 返回文档信息
         document_info = {
-            "id": unique_filename.split('.')[0],  # 使用UUID作为ID
-            "filename": unique_filename,
-            "original_filename": file.filename,
-            "file_type": FILE_TYPE_MAPPING.get(file_ext, 'unknown'),
-            "file_size": file_size,
+            "id": stored.id,  # 由内容哈希得出的UUID
+            "filename": stored.filename,
+            "original_filename": received.filename,
+            "file_type": stored.file_type,
+            "file_size": stored.size,
+            "content_hash": stored.content_hash,
+            "deduplicated": not stored.created,
+            "references": stored.references,
             "uploaded_at": datetime.utcnow().isoformat(),
-            "file_path": str(file_path)
+            "file_path": str(stored.path)
         }
 
+        if settings.DOCUMENT_INDEX_ON_UPLOAD:
+            from app.core.documents.index import indexing_in_progress
+
+            # 重复上传的文档已建好索引或正在建索引时不再解析和向量化
+            index_state = {} if stored.created else get_index_states([stored.id]).get(stored.id, {})
+            updated_at = index_state.get("updated_at")
+            if index_state.get("status") == "ready":
+                document_info["index_status"] = "ready"
+                document_info["chunk_count"] = index_state.get("chunk_count", 0)
+            elif indexing_in_progress(
+                index_state.get("status"), time.time() - updated_at if updated_at is not None else None
+            ):
+                document_info["index_status"] = "indexing"
+            else:
+                background_tasks.add_task(index_document, str(stored.path), stored.original_filename, user_id)
+                document_info["index_status"] = "pending"
+
         return document_info
 
     except HTTPException:
@@ -101,69 +190,190 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 
+def document_info(document, index_state: dict) -> dict:
+    """目录中文档的列表项"""
+    return {
+        "id": document.id,
+        "filename": document.filename,
+        "file_type": document.file_type,
+        "file_size": document.size,
+        "content_hash": document.content_hash,
+        "uploaded_at": datetime.fromtimestamp(document.created_at).isoformat(),
+        "file_path": str(document.path),
+        "original_filename": document.original_filename,
+        "index_status": index_state.get("status"),
+        "chunk_count": index_state.get("chunk_count", 0)
+    }
+
+
 @router.get("/")
-async def list_documents():
+async def list_documents(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="每页文档数"),
+    cursor: Optional[str] = Query(None, description="下一页的游标，即上一页响应头 X-Next-Cursor 的值"),
+    file_type: Optional[str] = Query(None, description="只列出该类型的文档，如 pdf、word、excel"),
+    user_id: Optional[int] = Query(None, description="只列出该上传者的文档（按其上传时间和文件名）"),
+):
     """
-    列出所有已上传的文档
+    列出已上传的文档，按上传时间倒序分页
+
+    还有下一页时响应头 X-Next-Cursor 给出下一页的游标
     """
+    def load_page():
+        documents, next_cursor = get_catalog().page(limit, cursor, file_type, user_id)
+        index_states = get_index_states([d.id for d in documents]) if documents else {}
+        return [document_info(d, index_states.get(d.id, {})) for d in documents], next_cursor
+
     try:
-        doc_dir = get_document_dir()
-        documents = []
+        documents, next_cursor = await asyncio.to_thread(load_page)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"无效的分页游标: {cursor}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取文档列表失败: {str(e)}"
+        )
 
-        if not doc_dir.exists():
-            return []
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return documents
 
-        # 遍历文档目录
-        for file_path in doc_dir.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in ALLOWED_EXTENSIONS:
-                stat = file_path.stat()
-                file_id = file_path.stem  # UUID作为ID
 
-                documents.append({
-                    "id": file_id,
-                    "filename": file_path.name,
-                    "file_type": FILE_TYPE_MAPPING.get(file_path.suffix.lower(), 'unknown'),
-                    "file_size": stat.st_size,
-                    "uploaded_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "file_path": str(file_path)
-                })
+@router.post("/rescan")
+async def rescan_documents():
+    """
+    重新扫描文档目录，登记手动放入 DOC_PATH 的文件，移除文件已不存在的文档
+    """
+    try:
+        catalog = await asyncio.to_thread(get_catalog)
+        registered = await asyncio.to_thread(catalog.import_files, FILE_TYPE_MAPPING, original_filenames, True)
+        return {"registered": registered}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"扫描文档目录失败: {str(e)}"
+        )
 
-        # 按上传时间倒序排列
-        documents.sort(key=lambda x: x["uploaded_at"], reverse=True)
 
-        return documents
+@router.get("/search")
+async def search_documents(
+    q: str = Query(..., min_length=1, description="检索内容"),
+    k: int = Query(5, ge=1, le=100, description="返回的文本块数"),
+    document_ids: Optional[List[str]] = Query(None, description="只检索这些文档"),
+    user_id: Optional[int] = Query(None, description="只检索该用户的文档"),
+    ef_search: Optional[int] = Query(
+        None, ge=1, le=1000,
+        description="pgvector HNSW 的 ef_search（IVFFlat 为 probes），越大召回率越高、越慢；FAISS 精确检索忽略"
+    ),
+    mode: Optional[str] = Query(
+        None, pattern="^(vector|lexical|hybrid)$",
+        description="检索方式: vector 向量, lexical BM25 关键词, hybrid 两者并行后按排名融合（默认 DOCUMENT_RETRIEVAL_MODE）"
+    ),
+):
+    """
+    在已建索引的文档中检索最相关的文本块
+
+    按用户检索时以文档目录中的引用为准：去重后多个用户共享的文档，每个上传者都能检索到
+    """
+    try:
+        from app.core.config import settings
+        from app.core.documents import get_document_index, aretrieve
+        index = get_document_index()
+
+        started = time.perf_counter()
+        if user_id is not None:
+            catalog = await asyncio.to_thread(get_catalog)
+            owned = await asyncio.to_thread(catalog.owned_documents, user_id)
+            if document_ids is not None:
+                owned = set(owned)
+                owned = [doc_id for doc_id in document_ids if doc_id in owned]
+            document_ids = owned
+        hits = []
+        if document_ids is None or document_ids:
+            hits = await aretrieve(q, k, document_ids, mode=mode, ef_search=ef_search, index=index)
+        took_ms = (time.perf_counter() - started) * 1000
+
+        return {
+            "query": q,
+            "vector_store": index.store_type,
+            "mode": mode or settings.DOCUMENT_RETRIEVAL_MODE,
+            "took_ms": round(took_ms, 2),
+            "results": [
+                {
+                    "document_id": chunk["doc_key"],
+                    "source": chunk["source"],
+                    "chunk_index": chunk["chunk_index"],
+                    "content": chunk["content"],
+                    "score": round(score, 4),
+                }
+                for chunk, score in hits
+            ],
+        }
 
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"获取文档列表失败: {str(e)}"
+            detail=f"文档检索失败: {str(e)}"
         )
 
 
-@router.delete("/{document_id}")
-async def delete_document(document_id: str):
+@router.get("/stats")
+async def get_document_store_stats():
     """
-    删除指定文档
+    文档存储的去重统计：存储的文件数、引用数和节省的字节数
     """
+    catalog = await asyncio.to_thread(get_catalog)
+    return await asyncio.to_thread(catalog.stats)
+
+
+def remove_from_index(document_id: str) -> bool:
+    """删除索引中文档的文本块和向量，失败只记录日志"""
     try:
-        doc_dir = get_document_dir()
+        from app.core.documents import get_document_index
+        return get_document_index().remove(document_id)
+    except Exception as e:
+        logger.warning(f"删除文档索引失败 {document_id}: {e}")
+        return False
+
 
-        # 查找文件（尝试各种扩展名）
-        found = False
-        for ext in ALLOWED_EXTENSIONS:
-            file_path = doc_dir / f"{document_id}{ext}"
-            if file_path.exists():
-                file_path.unlink()
-                found = True
-                break
+@router.delete("/{document_id}")
+async def delete_document(
+    document_id: str,
+    user_id: Optional[int] = Query(None, description="上传者，只释放该上传者的一次引用"),
+):
+    """
+    删除指定文档
 
-        if not found:
+    按内容去重存储的文档只释放一次引用，最后一个引用释放时才删除文件和索引。
+    不指定 user_id 时释放匿名上传的引用；文档只有一个上传者时释放该上传者的引用，
+    有多个上传者时返回 409，需指定 user_id
+    """
+    try:
+        catalog = await asyncio.to_thread(get_catalog)
+        if await asyncio.to_thread(catalog.get, document_id) is None:
+            # 不在目录中的文档（如文件已被手动删除）只清理索引
+            if not await asyncio.to_thread(remove_from_index, document_id):
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"文档不存在: {document_id}"
+                )
+            return {"message": "文档删除成功", "references": 0}
+
+        references = await asyncio.to_thread(catalog.release, document_id, user_id, remove_from_index)
+        if references is None and user_id is None:
+            raise HTTPException(
+                status_code=409,
+                detail=f"文档有多个上传者，请指定 user_id: {document_id}"
+            )
+        if references is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"文档不存在: {document_id}"
             )
-
-        return {"message": "文档删除成功"}
+        return {"message": "文档删除成功", "references": references}
 
     except HTTPException:
         raise
@@ -175,36 +385,34 @@ async def delete_document(document_id: str):
 
 
 @router.get("/{document_id}/download")
-async def download_document(document_id: str):
+@router.head("/{document_id}/download", include_in_schema=False)
+async def download_document(document_id: str, request: Request):
     """
     下载指定文档
-    """
-    try:
-        doc_dir = get_document_dir()
-
-        # 查找文件
-        file_path = None
-        original_filename = None
 
-        for ext in ALLOWED_EXTENSIONS:
-            potential_path = doc_dir / f"{document_id}{ext}"
-            if potential_path.exists():
-                file_path = potential_path
-                # 尝试从元数据中获取原始文件名
-                original_filename = f"document_{document_id}{ext}"
-                break
+    支持断点续传（Range）和条件请求（ETag 为内容哈希，未变化返回 304），
+    按文件名返回 MIME 类型；配置 DOCUMENT_DOWNLOAD_OFFLOAD 后由 nginx/Apache 发送文件
+    """
+    from app.services.file_download import file_response
 
-        if not file_path:
+    try:
+        catalog = await asyncio.to_thread(get_catalog)
+        document = await asyncio.to_thread(catalog.get, document_id)
+        if document is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"文档不存在: {document_id}"
             )
 
-        return FileResponse(
-            path=str(file_path),
-            filename=original_filename,
-            media_type='application/octet-stream'
-        )
+        try:
+            return await asyncio.to_thread(
+                file_response, request, document.path, document.original_filename, document.content_hash
+            )
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=404,
+                detail=f"文档不存在: {document_id}"
+            )
 
     except HTTPException:
         raise
@@ -4,7 +4,10 @@ from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisco
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import logging
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.database import Research, User
 from app.models.schemas import (
@@ -13,8 +16,18 @@ from app.models.schemas import (
     ResearchProgress,
     CostEstimate
 )
-from app.core.research.executor import ResearchExecutor
+from app.core.research.executor import ResearchExecutor, apply_cached_result
+from app.core.research.cancellation import research_cancellation
+from app.core.research.progress import progress_writer
 from app.core.websocket.manager import WebSocketManager
+from app.services.research_cache import research_cache, cache_key_for_research
+from app.services.research_estimator import research_estimator
+from app.services.mcp_pool import mcp_server_pool
+from app.services.page_store import page_store
+from app.services.embedding_cache import embedding_cache
+from app.services.research_scheduler import research_scheduler, SchedulerFull
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 websocket_manager = WebSocketManager()
@@ -28,27 +41,14 @@ async def estimate_research(
     """
     Estimate research cost and time
 
-    Analyzes the query and research type to provide:
+    Fitted on completed research history per report type:
     - Estimated cost in USD
     - Estimated time to complete
     - Estimated number of queries
+    - 90% intervals once enough history exists
     """
-    # TODO: Implement cost estimation logic
-    # This would analyze the query complexity and research type
-    estimated_cost = 0.15
-    estimated_time = 2  # minutes
-    estimated_queries = 10
-
-    if request.report_type == "deep":
-        estimated_cost = 0.40
-        estimated_time = 8
-        estimated_queries = 75
-
-    return CostEstimate(
-        estimated_cost=estimated_cost,
-        estimated_time_minutes=estimated_time,
-        estimated_queries=estimated_queries
-    )
+    executor = ResearchExecutor(websocket_manager)
+    return CostEstimate(**await executor.estimate_cost(request.query, request.report_type))
 
 
 @router.post("", response_model=ResearchResponse, status_code=201)
@@ -64,14 +64,21 @@ async def create_research(
     - Starts research execution in background
     - Returns task details with ID
     """
-    import threading
-    import asyncio
-    from app.core.research.executor import execute_research_task
-
     # TODO: Get current user from JWT token
     # For now, use a placeholder user_id
     user_id = 1
 
+    # Refuse early when the local queue is full
+    if settings.RESEARCH_TASK_BACKEND != "celery":
+        try:
+            research_scheduler.check_admission(user_id, request.report_type)
+        except SchedulerFull as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
     # Create research task
     research = Research(
         user_id=user_id,
@@ -84,31 +91,50 @@ async def create_research(
         status="pending"
     )
 
+    # Serve an identical, recently completed research from cache
+    cached = research_cache.lookup(
+        cache_key_for_research(research),
+        bypass=request.bypass_cache,
+        refresh=request.refresh_cache
+    )
+    if cached:
+        apply_cached_result(research, cached)
+
     db.add(research)
     db.commit()
     db.refresh(research)
 
-    # Start research execution in background thread
-    def run_research_in_background():
-        """Run research in a background thread"""
-        # Create new event loop for this thread
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        try:
-            # Run the async research task
-            loop.run_until_complete(execute_research_task(
-                research_id=research.id,
-                db_session=db,
-                websocket_manager=websocket_manager
-            ))
-        finally:
-            loop.close()
+    if cached:
+        return ResearchResponse(
+            id=research.id,
+            query=research.query,
+            report_type=research.report_type,
+            status=research.status,
+            current_depth=research.current_depth,
+            total_depth=research.total_depth,
+            current_breadth=research.current_breadth,
+            total_breadth=research.total_breadth,
+            completed_queries=research.completed_queries,
+            total_queries=research.total_queries,
+            progress_percentage=100.0,
+            report=research.report,
+            report_format=research.report_format,
+            sources=research.sources,
+            cost=research.cost,
+            cached=True,
+            created_at=research.created_at,
+            started_at=research.started_at,
+            completed_at=research.completed_at,
+            estimated_completion=None
+        )
 
-    # Start background thread
-    thread = threading.Thread(target=run_research_in_background, daemon=True)
-    thread.start()
+    queue_position = await _dispatch_research(
+        research,
+        db,
+        user_id,
+        bypass_cache=request.bypass_cache,
+        refresh_cache=request.refresh_cache
+    )
 
     return ResearchResponse(
         id=research.id,
@@ -126,6 +152,7 @@ async def create_research(
         report_format="markdown",
         sources=None,
         cost=0.0,
+        queue_position=queue_position,
         created_at=research.created_at,
         started_at=None,
         completed_at=None,
@@ -133,6 +160,230 @@ async def create_research(
     )
 
 
+async def _dispatch_research(
+    research: Research,
+    db: Session,
+    user_id: int,
+    bypass_cache: bool = False,
+    refresh_cache: bool = False
+) -> Optional[int]:
+    """
+    Start a pending research on Celery or the in-process scheduler
+
+    Returns:
+        1-based queue position when queued locally, otherwise None
+    """
+    from app.core.research.executor import execute_research_task
+
+    # Dispatch to the Celery queue for this report type
+    if settings.RESEARCH_TASK_BACKEND == "celery":
+        from app.tasks.research_tasks import enqueue_research
+        try:
+            # Publishing to the broker blocks, keep it off the event loop
+            await asyncio.to_thread(
+                enqueue_research,
+                research.id,
+                research.report_type,
+                bypass_cache=bypass_cache,
+                refresh_cache=refresh_cache
+            )
+            return None
+        except Exception as e:
+            logger.warning(f"Celery dispatch failed, running research {research.id} locally: {e}")
+
+    # Otherwise queue research on the in-process scheduler
+    research_id = research.id
+    try:
+        return research_scheduler.submit(
+            research_id,
+            lambda: execute_research_task(
+                research_id=research_id,
+                db_session=db,
+                websocket_manager=websocket_manager,
+                bypass_cache=bypass_cache,
+                refresh_cache=refresh_cache
+            ),
+            report_type=research.report_type,
+            user_id=user_id
+        )
+    except SchedulerFull as e:
+        research.status = "failed"
+        db.commit()
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+async def _pause_research(research: Research, db: Session):
+    """
+    Pause a deep research at its next sub-query boundary
+
+    Finished sub-queries stay checkpointed in research_tree.
+    """
+    if research.report_type != "deep":
+        raise HTTPException(status_code=400, detail="Only deep research can be paused")
+
+    if research.status not in ["pending", "running"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot pause research with status: {research.status}"
+        )
+
+    research.status = "paused"
+    db.commit()
+
+    # Drop it from the queue if it has not started yet
+    research_scheduler.discard(research.id)
+
+    await websocket_manager.broadcast_progress(research.id, {
+        "status": "paused",
+        "message": "Research pausing after the running sub-queries"
+    })
+
+
+async def _resume_research(research: Research, db: Session) -> Optional[int]:
+    """
+    Re-dispatch a paused or failed research
+
+    Deep research continues from its research_tree checkpoint, so only
+    unfinished sub-queries are searched again.
+    """
+    if research.status not in ["paused", "failed"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot resume research with status: {research.status}"
+        )
+
+    research.status = "pending"
+    research.completed_at = None
+    db.commit()
+
+    queue_position = await _dispatch_research(research, db, research.user_id)
+
+    await websocket_manager.broadcast_progress(research.id, {
+        "status": "pending",
+        "message": "Research resumed"
+    })
+
+    return queue_position
+
+
+async def _cancel_research(research: Research, db: Session) -> bool:
+    """
+    Cancel a research and stop the work running for it
+
+    Returns:
+        True if the research is confirmed stopped (or never started)
+    """
+    if research.status not in ["pending", "running", "paused"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot cancel research with status: {research.status}"
+        )
+
+    was_paused = research.status == "paused"
+    research.status = "cancelled"
+    db.commit()
+
+    # Drop it from the queue if it has not started yet
+    confirmed = research_scheduler.discard(research.id) or was_paused
+
+    if research_cancellation.is_running(research.id):
+        # Running in this process: cancel the task and wait for it to unwind
+        confirmed = await research_cancellation.cancel(research.id)
+    elif settings.RESEARCH_TASK_BACKEND == "celery" and not confirmed:
+        # Queued or running on a worker, which polls for the cancelled status
+        from app.tasks.research_tasks import revoke_research
+        try:
+            revoke_research(research.id)
+        except Exception as e:
+            logger.warning(f"Failed to revoke Celery task for research {research.id}: {e}")
+
+    # Notify WebSocket clients
+    await websocket_manager.broadcast_progress(research.id, {
+        "status": "cancelled",
+        "message": "Research cancelled by user",
+        "confirmed": confirmed
+    })
+
+    return confirmed
+
+
+@router.get("/estimate/stats")
+async def get_estimator_stats():
+    """
+    Get the estimator's fitted groups and sample counts
+    """
+    return research_estimator.stats()
+
+
+@router.get("/pages/stats")
+async def get_page_store_stats():
+    """
+    Get shared page store size and hit/revalidation counters
+    """
+    return page_store.stats()
+
+
+@router.get("/embeddings/stats")
+async def get_embedding_cache_stats():
+    """
+    Get embedding cache hit rate, bytes saved and evictions
+    """
+    return embedding_cache.stats()
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Get research result cache hit/miss counters
+    """
+    return research_cache.stats()
+
+
+@router.delete("/cache")
+async def clear_cache():
+    """
+    Drop all cached research results
+    """
+    research_cache.clear()
+    return {"message": "Research cache cleared"}
+
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """
+    Get research queue depth and worker utilisation
+    """
+    return research_scheduler.stats()
+
+
+@router.get("/cancellation/stats")
+async def get_cancellation_stats():
+    """
+    Get running research tasks and cancellation counters
+    """
+    return research_cancellation.stats()
+
+
+@router.get("/progress/stats")
+async def get_progress_writer_stats():
+    """
+    Get batched progress write counters
+    """
+    return progress_writer.stats()
+
+
+@router.get("/mcp-pool/stats")
+async def get_mcp_pool_stats():
+    """
+    Get MCP search server pool size and lease counters
+    """
+    return mcp_server_pool.stats()
+
+
 @router.get("/{research_id}", response_model=ResearchResponse)
 async def get_research(
     research_id: int,
@@ -166,6 +417,7 @@ async def get_research(
         report_format=research.report_format,
         sources=research.sources,
         cost=research.cost,
+        queue_position=research_scheduler.queue_position(research.id),
         created_at=research.created_at,
         started_at=research.started_at,
         completed_at=research.completed_at,
@@ -215,6 +467,7 @@ async def list_researches(
             report_format=research.report_format,
             sources=research.sources,
             cost=research.cost,
+            queue_position=research_scheduler.queue_position(research.id),
             created_at=research.created_at,
             started_at=research.started_at,
             completed_at=research.completed_at,
@@ -237,22 +490,53 @@ async def cancel_research(
     if not research:
         raise HTTPException(status_code=404, detail="Research not found")
 
-    if research.status not in ["pending", "running"]:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot cancel research with status: {research.status}"
-        )
+    confirmed = await _cancel_research(research, db)
 
-    research.status = "cancelled"
-    db.commit()
+    return {"message": "Research cancelled successfully", "confirmed": confirmed}
 
-    # Notify WebSocket clients
-    await websocket_manager.broadcast_progress(research_id, {
-        "status": "cancelled",
-        "message": "Research cancelled by user"
-    })
 
-    return {"message": "Research cancelled successfully"}
+@router.post("/{research_id}/pause")
+async def pause_research(
+    research_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Pause a running deep research
+    """
+    research = db.query(Research).filter(Research.id == research_id).first()
+
+    if not research:
+        raise HTTPException(status_code=404, detail="Research not found")
+
+    await _pause_research(research, db)
+
+    return {"message": "Research paused successfully"}
+
+
+@router.post("/{research_id}/resume")
+async def resume_research(
+    research_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Resume a paused or failed research
+
+    Completed deep research sub-queries are reused from the checkpoint.
+    """
+    research = db.query(Research).filter(Research.id == research_id).first()
+
+    if not research:
+        raise HTTPException(status_code=404, detail="Research not found")
+
+    queue_position = await _resume_research(research, db)
+
+    nodes = (research.research_tree or {}).get("nodes", {})
+    return {
+        "message": "Research resumed successfully",
+        "queue_position": queue_position,
+        "completed_queries": sum(1 for n in nodes.values() if n.get("status") == "done"),
+        "remaining_queries": sum(1 for n in nodes.values() if n.get("status") != "done")
+    }
 
 
 @router.websocket("/ws/{research_id}")
@@ -270,8 +554,14 @@ async def research_websocket(
     - research.connected: Connection established
     - research.started: Research has started
     - research.progress: Progress update (high frequency)
+    - research.report_chunk: Report text as it is written ({"chunk", "offset"})
     - research.completed: Research completed successfully
     - research.error: Research failed with error
+
+    Commands sent ({"command": ...}):
+    - pause: Stop a deep research after its running sub-queries
+    - resume: Continue a paused or failed research from its checkpoint
+    - cancel: Cancel the research
     """
     await websocket_manager.connect(websocket, research_id)
     research = db.query(Research).filter(Research.id == research_id).first()
@@ -302,20 +592,23 @@ async def research_websocket(
             command = data.get("command")
 
             if command == "pause":
-                # TODO: Implement pause functionality
-                pass
+                db.refresh(research)
+                try:
+                    await _pause_research(research, db)
+                except HTTPException as e:
+                    await websocket_manager.send_error(websocket, research_id, e.detail)
             elif command == "resume":
-                # TODO: Implement resume functionality
-                pass
+                db.refresh(research)
+                try:
+                    await _resume_research(research, db)
+                except HTTPException as e:
+                    await websocket_manager.send_error(websocket, research_id, e.detail)
             elif command == "cancel":
-                # Cancel the research
-                if research.status in ["pending", "running"]:
-                    research.status = "cancelled"
-                    db.commit()
-                    await websocket_manager.broadcast_progress(research_id, {
-                        "status": "cancelled",
-                        "message": "Research cancelled"
-                    })
+                db.refresh(research)
+                try:
+                    await _cancel_research(research, db)
+                except HTTPException as e:
+                    await websocket_manager.send_error(websocket, research_id, e.detail)
 
     except WebSocketDisconnect:
         websocket_manager.disconnect(websocket, research_id)
@@ -58,14 +58,45 @@ class Settings(BaseSettings):
     DEEP_RESEARCH_BREADTH: int = 5
     DEEP_RESEARCH_DEPTH: int = 3
     DEEP_RESEARCH_CONCURRENCY: int = 4
+    DEEP_RESEARCH_BATCH_SEARCH: bool = True  # one search_batch MCP call per fan-out
     MAX_SUBTOPICS: int = 5
     TEMPERATURE: float = 0.4
     LANGUAGE: str = "english"
     TOTAL_WORDS: int = 2000
 
+    # Research Scheduler (in-process worker pool)
+    RESEARCH_WORKERS: int = 2
+    RESEARCH_MAX_QUEUE_DEPTH: int = 50
+    RESEARCH_MAX_QUEUED_PER_USER: int = 10
+    RESEARCH_CANCEL_TIMEOUT: float = 10.0  # seconds to wait for a cancelled research to stop
+    RESEARCH_CANCEL_POLL_INTERVAL: float = 2.0  # seconds between cancellation checks in workers
+    RESEARCH_PROGRESS_FLUSH_INTERVAL: float = 1.0  # seconds between batched progress writes
+
+    # Research Result Cache
+    RESEARCH_CACHE_ENABLED: bool = True
+    RESEARCH_CACHE_TTL: int = 6 * 60 * 60  # 6 hours
+    RESEARCH_CACHE_MAX_ENTRIES: int = 500
+
+    # Scraped Page Store (extracted page text shared across researches)
+    PAGE_STORE_ENABLED: bool = True
+    PAGE_STORE_PATH: str = "data/page_store"
+    PAGE_STORE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB of page text
+    PAGE_STORE_FRESHNESS: int = 24 * 60 * 60  # seconds before a page is revalidated
+
+    # Embedding Cache (vectors keyed by embedding model + chunk hash)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache"
+    EMBEDDING_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # 1GB of float32 vectors
+
+    # Cost/Duration Estimator (fitted on completed researches)
+    RESEARCH_ESTIMATOR_REFIT_INTERVAL: int = 10 * 60  # seconds
+    RESEARCH_ESTIMATOR_MAX_SAMPLES: int = 2000
+
     # Report Configuration
     REPORT_FORMAT: str = "markdown"
     REPORT_TONE: str = "Analytical"
+    REPORT_STREAM_FLUSH_INTERVAL: float = 2.0  # seconds between partial report writes
+    REPORT_STREAM_FLUSH_CHARS: int = 2000
 
     # Cost Management
     DEFAULT_DAILY_BUDGET: float = 5.0
@@ -73,14 +104,39 @@ class Settings(BaseSettings):
 
     # File Upload
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024  # 50MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes written to disk per block while streaming an upload
     UPLOAD_DIR: str = "uploads"
 
     # Document Path for GPT-Researcher local document research
     DOC_PATH: str = "data/documents"  # 本地文档存储路径
+    DOCUMENT_DOWNLOAD_OFFLOAD: str = ""  # "", x-accel-redirect (nginx), x-sendfile (Apache/lighttpd)
+    DOCUMENT_DOWNLOAD_ACCEL_PREFIX: str = "/internal/documents/"  # nginx internal location aliased to DOC_PATH
 
     # Vector Store
     VECTOR_STORE_TYPE: str = "faiss"  # faiss, qdrant, weaviate, pgvector
     VECTOR_STORE_PATH: str = "data/vectors"
+    VECTOR_STORE_MMAP: bool = True  # map the FAISS base index read-only, shared by all workers
+    VECTOR_STORE_MERGE_THRESHOLD: int = 10000  # delta or removed vectors that trigger a background merge
+
+    # Document Ingestion (local documents are indexed once, research queries the index)
+    DOCUMENT_CHUNK_SIZE: int = 1000  # characters
+    DOCUMENT_CHUNK_OVERLAP: int = 200
+    DOCUMENT_EMBED_BATCH_SIZE: int = 64  # chunks per embedding request
+    DOCUMENT_INDEX_ON_UPLOAD: bool = True  # index uploads in the background
+    DOCUMENT_INDEX_STALE_AFTER: int = 600  # seconds without progress before an "indexing" run counts as dead
+    DOCUMENT_RETRIEVAL_MODE: str = "hybrid"  # vector, lexical, hybrid (BM25 + vector, rank fusion)
+    DOCUMENT_HYBRID_CANDIDATES: int = 50  # hits taken from each retriever before fusion
+    DOCUMENT_RRF_K: int = 60  # reciprocal rank fusion constant, higher flattens the ranks
+
+    # pgvector (VECTOR_STORE_TYPE=pgvector: document_chunks table in DATABASE_URL)
+    PGVECTOR_DIMENSIONS: int = 1536  # must match the EMBEDDING model
+    PGVECTOR_INDEX_TYPE: str = "hnsw"  # hnsw, ivfflat
+    PGVECTOR_HNSW_M: int = 16
+    PGVECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    PGVECTOR_EF_SEARCH: int = 40  # default hnsw.ef_search, higher means better recall and slower queries
+    PGVECTOR_IVFFLAT_LISTS: int = 100
+    PGVECTOR_IVFFLAT_PROBES: int = 10
+    PGVECTOR_ITERATIVE_SCAN: str = "relaxed_order"  # off, strict_order, relaxed_order (pgvector >= 0.8)
 
     # Qdrant
     QDRANT_HOST: Optional[str] = "localhost"
@@ -88,6 +144,17 @@ class Settings(BaseSettings):
 
     # MCP Configuration
     MCP_STRATEGY: str = "deep"
+    MCP_SERVER_SCRIPT: str = "reference/web_search_mcp.py"
+    SEARXNG_URL: str = "http://127.0.0.1:8888"  # comma-separated for several instances
+
+    # MCP Server Pool (long-lived search servers shared by researches)
+    MCP_POOL_ENABLED: bool = True
+    MCP_POOL_MIN_SIZE: int = 1
+    MCP_POOL_MAX_SIZE: int = 4
+    MCP_POOL_MAX_LEASES_PER_SERVER: int = 4
+    MCP_POOL_MAX_USES: int = 200
+    MCP_POOL_HEALTH_INTERVAL: int = 30  # seconds
+    MCP_POOL_LEASE_TIMEOUT: int = 30  # seconds
 
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -103,6 +170,19 @@ class Settings(BaseSettings):
     CELERY_WORKER_CONCURRENCY: int = 2
     CELERY_TASK_TIMEOUT: int = 3600
 
+    # Per-queue research time limits (seconds)
+    CELERY_STANDARD_SOFT_TIME_LIMIT: int = 10 * 60
+    CELERY_STANDARD_TIME_LIMIT: int = 12 * 60
+    CELERY_DEEP_SOFT_TIME_LIMIT: int = 40 * 60
+    CELERY_DEEP_TIME_LIMIT: int = 45 * 60
+    CELERY_MULTI_AGENT_SOFT_TIME_LIMIT: int = 55 * 60
+    CELERY_MULTI_AGENT_TIME_LIMIT: int = 60 * 60
+
+    # Where POST /research runs jobs: local (in-process scheduler) or celery (per-report-type queues).
+    # Celery workers broadcast progress from their own process, so WebSocket clients of the API
+    # only get live events, and admission control (queue full 503 / per-user 429) only applies, with local
+    RESEARCH_TASK_BACKEND: str = "local"
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -32,6 +32,16 @@ def get_db() -> Generator[Session, None, None]:
 def init_db():
     """
     Initialize database tables
+
+    The pgvector tables and their ANN index are only created where the
+    vector extension is available.
     """
-    from app.models.database import Base
-    Base.metadata.create_all(bind=engine)
+    from app.models.database import Base, VECTOR_TABLES
+    from app.core.documents.pgvector import init_vector_store
+
+    vector_ready = init_vector_store(engine)
+    Base.metadata.create_all(bind=engine, tables=[
+        table for table in Base.metadata.sorted_tables
+        if vector_ready or table.name not in VECTOR_TABLES
+    ])
+    return vector_ready
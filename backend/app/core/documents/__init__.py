@@ -0,0 +1,44 @@
+"""Local document ingestion and retrieval"""
+
+from .extraction import UnsupportedDocument, iter_text, extract_text
+from .chunking import iter_chunks
+from .index import DocumentBusy, FaissDocumentIndex, UnsupportedVectorStore, create_document_index
+from .pipeline import (
+    IngestResult,
+    ingest_file,
+    ingest_document,
+    get_document_index,
+    get_document_embeddings,
+)
+from .retriever import (
+    DocumentRetriever,
+    retrieve,
+    aretrieve,
+    reciprocal_rank_fusion,
+    is_indexed,
+    vector_store_kwargs,
+    add_knowledge_base_context,
+)
+
+__all__ = [
+    "UnsupportedDocument",
+    "iter_text",
+    "extract_text",
+    "iter_chunks",
+    "FaissDocumentIndex",
+    "UnsupportedVectorStore",
+    "DocumentBusy",
+    "create_document_index",
+    "IngestResult",
+    "ingest_file",
+    "ingest_document",
+    "get_document_index",
+    "get_document_embeddings",
+    "DocumentRetriever",
+    "retrieve",
+    "aretrieve",
+    "reciprocal_rank_fusion",
+    "is_indexed",
+    "vector_store_kwargs",
+    "add_knowledge_base_context",
+]
@@ -0,0 +1,208 @@
+"""Streaming Text Extraction
+
+Every extractor is a generator of `(text, progress)` pairs, progress
+being the fraction of the file read so far. Plain text formats are read
+block by block; office formats and PDFs are walked page, slide, sheet
+or paragraph at a time, so the caller can chunk and embed while the
+rest of the file is still being read.
+
+Parsers for the binary formats are optional dependencies and are only
+imported when a file of that type is processed.
+"""
+
+import csv
+import io
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Tuple
+
+Segment = Tuple[str, float]
+
+# Characters of plain text yielded per segment
+_TEXT_BLOCK = 64 * 1024
+
+# Spreadsheet and CSV rows per segment
+_ROWS_PER_SEGMENT = 200
+
+
+class UnsupportedDocument(Exception):
+    """The file type cannot be extracted in this environment"""
+
+
+def _open_text(path: str):
+    raw = open(path, "rb")
+    # utf-8-sig drops a BOM; undecodable bytes should not fail a whole document
+    return raw, io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+
+
+def iter_plain_text(path: str) -> Iterator[Segment]:
+    size = os.path.getsize(path) or 1
+    raw, text = _open_text(path)
+    with text:
+        block = []
+        length = 0
+        for line in text:
+            block.append(line)
+            length += len(line)
+            if length >= _TEXT_BLOCK:
+                yield "".join(block), raw.tell() / size
+                block, length = [], 0
+        if block:
+            yield "".join(block), 1.0
+
+
+def iter_csv(path: str) -> Iterator[Segment]:
+    size = os.path.getsize(path) or 1
+    raw, text = _open_text(path)
+    with text:
+        rows = []
+        for row in csv.reader(text):
+            rows.append(", ".join(cell.strip() for cell in row))
+            if len(rows) >= _ROWS_PER_SEGMENT:
+                yield "\n".join(rows) + "\n", raw.tell() / size
+                rows = []
+        if rows:
+            yield "\n".join(rows) + "\n", 1.0
+
+
+def iter_pdf(path: str) -> Iterator[Segment]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedDocument("PDF extraction needs pypdf (pip install pypdf)")
+
+    reader = PdfReader(path)
+    total = len(reader.pages) or 1
+    for i, page in enumerate(reader.pages):
+        yield (page.extract_text() or "") + "\n\n", (i + 1) / total
+
+
+def iter_docx(path: str) -> Iterator[Segment]:
+    try:
+        import docx
+    except ImportError:
+        raise UnsupportedDocument("Word extraction needs python-docx (pip install python-docx)")
+
+    document = docx.Document(path)
+    paragraphs = document.paragraphs
+    tables = document.tables
+    total = (len(paragraphs) + len(tables)) or 1
+    for i, paragraph in enumerate(paragraphs):
+        yield paragraph.text + "\n", (i + 1) / total
+    for i, table in enumerate(tables, start=len(paragraphs)):
+        rows = [" | ".join(cell.text.strip() for cell in row.cells) for row in table.rows]
+        yield "\n" + "\n".join(rows) + "\n\n", (i + 1) / total
+
+
+def iter_pptx(path: str) -> Iterator[Segment]:
+    try:
+        from pptx import Presentation
+    except ImportError:
+        raise UnsupportedDocument("PowerPoint extraction needs python-pptx (pip install python-pptx)")
+
+    slides = list(Presentation(path).slides)
+    total = len(slides) or 1
+    for i, slide in enumerate(slides):
+        texts = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                texts.append(shape.text_frame.text)
+            elif getattr(shape, "has_table", False) and shape.has_table:
+                for row in shape.table.rows:
+                    texts.append(" | ".join(cell.text.strip() for cell in row.cells))
+        yield "\n".join(t for t in texts if t.strip()) + "\n\n", (i + 1) / total
+
+
+def _iter_sheet_rows(title: str, rows, progress: float) -> Iterator[Segment]:
+    batch = [f"# {title}"]
+    for row in rows:
+        values = [str(v).strip() for v in row if v is not None and str(v).strip()]
+        if values:
+            batch.append(", ".join(values))
+        if len(batch) >= _ROWS_PER_SEGMENT:
+            yield "\n".join(batch) + "\n", progress
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n\n", progress
+
+
+def iter_xlsx(path: str) -> Iterator[Segment]:
+    try:
+        import openpyxl
+    except ImportError:
+        raise UnsupportedDocument("Excel extraction needs openpyxl (pip install openpyxl)")
+
+    # read_only streams rows instead of loading every cell into memory
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = workbook.worksheets
+        total = len(sheets) or 1
+        for i, sheet in enumerate(sheets):
+            yield from _iter_sheet_rows(sheet.title, sheet.iter_rows(values_only=True), (i + 1) / total)
+    finally:
+        workbook.close()
+
+
+def iter_xls(path: str) -> Iterator[Segment]:
+    try:
+        import xlrd
+    except ImportError:
+        raise UnsupportedDocument("Legacy .xls extraction needs xlrd (pip install xlrd)")
+
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        total = workbook.nsheets or 1
+        for i in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(i)
+            rows = (sheet.row_values(r) for r in range(sheet.nrows))
+            yield from _iter_sheet_rows(sheet.name, rows, (i + 1) / total)
+            workbook.unload_sheet(i)
+    finally:
+        workbook.release_resources()
+
+
+def iter_legacy_office(path: str) -> Iterator[Segment]:
+    """Binary .doc/.ppt files, through unstructured like gpt-researcher's own loader"""
+    try:
+        from unstructured.partition.auto import partition
+    except ImportError:
+        raise UnsupportedDocument(
+            f"{Path(path).suffix} extraction needs unstructured (pip install unstructured)"
+        )
+
+    elements = partition(filename=path)
+    total = len(elements) or 1
+    for i, element in enumerate(elements):
+        yield str(element) + "\n", (i + 1) / total
+
+
+EXTRACTORS: Dict[str, Callable[[str], Iterator[Segment]]] = {
+    ".txt": iter_plain_text,
+    ".md": iter_plain_text,
+    ".csv": iter_csv,
+    ".pdf": iter_pdf,
+    ".docx": iter_docx,
+    ".pptx": iter_pptx,
+    ".xlsx": iter_xlsx,
+    ".xls": iter_xls,
+    ".doc": iter_legacy_office,
+    ".ppt": iter_legacy_office,
+}
+
+
+def iter_text(path: str) -> Iterator[Segment]:
+    """
+    Stream the text of a document
+
+    Raises:
+        UnsupportedDocument: unknown extension or missing parser
+    """
+    ext = Path(path).suffix.lower()
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        raise UnsupportedDocument(f"No text extractor for {ext or 'files without extension'}")
+    return extractor(path)
+
+
+def extract_text(path: str) -> str:
+    return "".join(text for text, _ in iter_text(path))
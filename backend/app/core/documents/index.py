@@ -0,0 +1,980 @@
+"""Local Document Vector Index
+
+Chunks of uploaded documents and their embeddings, one index per
+embedding model (one knowledge base) under
+`<VECTOR_STORE_PATH>/documents/<model>/`:
+
+- `chunks.sqlite3` holds the documents (status, fingerprint, source
+  name) and the chunk texts with their term counts (see lexical.py);
+  chunk ids never get reused
+- `base-<n>.faiss` is the bulk of the vectors, a FAISS inner-product
+  index over L2-normalised vectors (cosine similarity). It is never
+  modified and is opened read-only through mmap, so every API and
+  worker process shares one copy of its pages in the page cache.
+  `base-<n>.ids.npy` maps its positions to chunk ids and
+  `base-<n>.lookup.npy` the other way round, both memory-mapped too.
+- `base-<n>.terms/offsets/postings/tfs/lengths.npy` are the BM25
+  inverted index of the base: the postings (base positions and term
+  frequencies) of every term, sorted by term id, memory-mapped like the
+  vectors so a query only pages in the postings of its own terms
+- `delta.faiss` holds vectors written since the last merge and is, with
+  the postings of its chunks, the only part loaded into process memory
+- `manifest.json` names the current base and changes on every write;
+  readers pick up new data on their next search by checking it
+
+Removing a document deletes its vectors from the delta and records its
+chunk ids as removed; searches skip those that are still in the base.
+Once the delta or the removals reach VECTOR_STORE_MERGE_THRESHOLD, a
+background thread writes a new base without the removed vectors and
+with the delta folded in, then switches the manifest to it. Cold start
+only maps the base and reads the small delta, nothing is rebuilt.
+
+Vector and BM25 search see the same chunks: those of finished documents.
+"""
+
+import functools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.documents.lexical import bm25_idf, bm25_weights, query_terms, term_counts
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialised
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+# Base vectors copied per step while merging
+_MERGE_BLOCK = 64 * 1024
+
+# Manifest stamp before the first load (a missing manifest is stamped None)
+_NOT_LOADED = ()
+
+# Files of a base generation besides `.faiss`
+_VECTOR_SUFFIXES = ("ids", "lookup")
+_LEXICAL_SUFFIXES = ("terms", "offsets", "postings", "tfs", "lengths")
+
+STATUS_INDEXING = "indexing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+class UnsupportedVectorStore(Exception):
+    """VECTOR_STORE_TYPE has no document index implementation"""
+
+
+class DocumentBusy(Exception):
+    """Another run is indexing the document"""
+
+
+def indexing_in_progress(status: Optional[str], idle_seconds: Optional[float]) -> bool:
+    """Whether a document state belongs to a live indexing run rather than one that died"""
+    return (
+        status == STATUS_INDEXING
+        and idle_seconds is not None
+        and idle_seconds < settings.DOCUMENT_INDEX_STALE_AFTER
+    )
+
+
+def _model_dir(model_key: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_key)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _replace_file(path: str, write: Callable[[str], None]):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _save_array(path: str, array: np.ndarray):
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+
+    _replace_file(path, write)
+
+
+class FaissDocumentIndex:
+    """
+    Document chunks in SQLite, their vectors in a memory-mapped FAISS
+    base plus an in-memory delta
+
+    Thread-safe; API and worker processes can share one directory.
+    """
+
+    store_type = "faiss"
+
+    def __init__(
+        self,
+        model_key: str,
+        path: str = settings.VECTOR_STORE_PATH,
+        merge_threshold: int = settings.VECTOR_STORE_MERGE_THRESHOLD,
+        mmap: bool = settings.VECTOR_STORE_MMAP,
+    ):
+        self.model_key = model_key
+        self.path = os.path.join(path, "documents", _model_dir(model_key))
+        self.manifest_path = os.path.join(self.path, "manifest.json")
+        self.delta_path = os.path.join(self.path, "delta.faiss")
+        self.legacy_path = os.path.join(self.path, "index.faiss")  # single-file index, read as the delta
+        self.merge_threshold = merge_threshold
+        self.mmap = mmap
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+        self._manifest: dict = {}
+        self._manifest_stamp = _NOT_LOADED  # (mtime_ns, size) of the loaded manifest
+        self._base = None
+        self._base_name: Optional[str] = None
+        self._base_ids = np.empty(0, dtype=np.int64)  # position -> chunk id
+        self._base_lookup = np.empty((2, 0), dtype=np.int64)  # sorted chunk ids, their positions
+        self._delta = None
+        self._excluded = np.empty(0, dtype=np.int64)  # base positions of removed chunks
+
+        # BM25: (terms, offsets, postings, tfs, lengths) of the base, None for
+        # bases written before lexical search; postings of the delta chunks
+        self._lexical_base: Optional[Tuple[np.ndarray, ...]] = None
+        self._base_alive = np.empty(0, dtype=bool)
+        self._base_live_chunks = 0
+        self._base_live_length = 0.0
+        self._lexical_stamp = _NOT_LOADED
+        self._delta_postings: Dict[int, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+        self._delta_lengths: Dict[int, int] = {}  # chunk id -> length
+        self._delta_length_total = 0.0
+
+        self._merge_thread: Optional[threading.Thread] = None
+        self.merges = 0
+        self.merge_errors = 0
+
+    def _open_db(self) -> sqlite3.Connection:
+        return sqlite3.connect(os.path.join(self.path, "chunks.sqlite3"), check_same_thread=False, timeout=30)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.path, exist_ok=True)
+            db = self._open_db()
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_key TEXT PRIMARY KEY,
+                    user_id INTEGER,
+                    source TEXT,
+                    fingerprint TEXT,
+                    status TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_key TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    UNIQUE (doc_key, chunk_index)
+                );
+                CREATE TABLE IF NOT EXISTS removed (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS terms (
+                    id INTEGER PRIMARY KEY,
+                    term TEXT NOT NULL UNIQUE
+                );
+                """
+            )
+            columns = [r[1] for r in db.execute("PRAGMA table_info(documents)")]
+            if "user_id" not in columns:
+                db.execute("ALTER TABLE documents ADD COLUMN user_id INTEGER")
+            # Term counts, NULL for chunks stored before lexical search
+            # (counted when first needed)
+            columns = [r[1] for r in db.execute("PRAGMA table_info(chunks)")]
+            for column, kind in (("length", "INTEGER"), ("term_ids", "BLOB"), ("tfs", "BLOB")):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE chunks ADD COLUMN {column} {kind}")
+            self._db = db
+        return self._db
+
+    @contextmanager
+    def _file_lock(self, name: str, blocking: bool = True):
+        """Cross-process lock file; yields False if non-blocking and already held"""
+        os.makedirs(self.path, exist_ok=True)
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.path, name), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialise index writers across threads and processes"""
+        with self._lock, self._file_lock("index.lock"):
+            self._refresh()
+            yield
+
+    # Loading
+
+    def _refresh(self):
+        """Reload the manifest, base and delta when another writer changed them"""
+        try:
+            st = os.stat(self.manifest_path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._manifest_stamp:
+            return
+
+        manifest = {}
+        if stamp is not None:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        if manifest.get("base") != self._base_name:
+            self._open_base(manifest.get("base"))
+        self._delta = self._read_delta()
+        self._manifest, self._manifest_stamp = manifest, stamp
+        self._excluded = self._base_positions(
+            [r[0] for r in self._connect().execute("SELECT id FROM removed")]
+        )
+
+    def _open_base(self, name: Optional[str]):
+        import faiss
+
+        if name is None:
+            self._base, self._base_name = None, None
+            self._base_ids = np.empty(0, dtype=np.int64)
+            self._base_lookup = np.empty((2, 0), dtype=np.int64)
+            self._lexical_base = None
+            return
+
+        flags = 0
+        if self.mmap:
+            if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+                # Flat codes stay in the file mapping instead of being copied to the heap
+                flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+            else:
+                logger.warning("This faiss build cannot mmap flat indexes, loading the base into memory")
+        prefix = os.path.join(self.path, name)
+        self._base = faiss.read_index(f"{prefix}.faiss", flags)
+        self._base_ids = np.load(f"{prefix}.ids.npy", mmap_mode="r")
+        self._base_lookup = np.load(f"{prefix}.lookup.npy", mmap_mode="r")
+        self._lexical_base = None
+        if os.path.exists(f"{prefix}.lengths.npy"):
+            # Plain ndarray views of the mappings, indexing np.memmap is slower
+            self._lexical_base = tuple(
+                np.asarray(np.load(f"{prefix}.{suffix}.npy", mmap_mode="r")) for suffix in _LEXICAL_SUFFIXES
+            )
+        self._base_name = name
+
+    def _read_delta(self):
+        import faiss
+
+        for path in (self.delta_path, self.legacy_path):
+            if os.path.exists(path):
+                return faiss.read_index(path)
+        return None
+
+    def _base_positions(self, ids: Sequence[int]) -> np.ndarray:
+        """Base positions of those chunk ids that are in the base"""
+        sorted_ids = self._base_lookup[0]
+        if not len(ids) or not len(sorted_ids):
+            return np.empty(0, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        idx = np.searchsorted(sorted_ids, ids)
+        idx[idx == len(sorted_ids)] = 0
+        found = sorted_ids[idx] == ids
+        return np.asarray(self._base_lookup[1][idx[found]], dtype=np.int64)
+
+    # Writing
+
+    def _save(self, **manifest_changes):
+        """Write the delta and a new manifest version (under the write lock)"""
+        import faiss
+
+        if self._delta is not None:
+            _replace_file(self.delta_path, lambda tmp: faiss.write_index(self._delta, tmp))
+            if os.path.exists(self.legacy_path):
+                os.unlink(self.legacy_path)
+        manifest = {**self._manifest, **manifest_changes}
+        manifest["version"] = manifest.get("version", 0) + 1
+
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(manifest, f)
+
+        _replace_file(self.manifest_path, write)
+        self._manifest_stamp = _NOT_LOADED
+        self._refresh()
+
+    def _remove_vectors(self, ids: Sequence[int]):
+        if not ids:
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        if self._delta is not None:
+            self._delta.remove_ids(ids)
+        # Also recorded for ids only in the delta: a running merge may be
+        # copying them into the next base
+        db = self._connect()
+        with db:
+            db.executemany("INSERT INTO removed (id) VALUES (?)", [(int(i),) for i in ids])
+        self._save()
+
+    def _chunk_ids(self, db: sqlite3.Connection, doc_key: str) -> List[int]:
+        return [r[0] for r in db.execute("SELECT id FROM chunks WHERE doc_key = ?", (doc_key,))]
+
+    def _term_ids(self, db: sqlite3.Connection, terms: Iterable[str], create: bool = True) -> Dict[str, int]:
+        """Ids of terms, new terms get one unless create is False"""
+        terms = list(terms)
+        if create:
+            db.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(t,) for t in terms])
+        ids = {}
+        for i in range(0, len(terms), _LOOKUP_BATCH):
+            batch = terms[i:i + _LOOKUP_BATCH]
+            ids.update(db.execute(
+                f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return ids
+
+    def _encode_terms(self, db: sqlite3.Connection, counted: Sequence[Tuple[List[str], List[int], int]]):
+        """(length, term_ids, tfs) column values of term_counts() results"""
+        ids = self._term_ids(db, {t for terms, _, _ in counted for t in terms})
+        return [
+            (
+                length,
+                np.asarray([ids[t] for t in terms], dtype="<i4").tobytes(),
+                np.minimum(tfs, 65535).astype("<u2").tobytes(),
+            )
+            for terms, tfs, length in counted
+        ]
+
+    def _chunk_terms(
+        self, db: sqlite3.Connection, ids: Sequence[int]
+    ) -> Dict[int, Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        chunk id -> (length, term ids, term frequencies) of the given chunks,
+        counting and storing the terms of chunks stored before lexical search
+        """
+        found = {}
+        missing = []
+        for i in range(0, len(ids), _LOOKUP_BATCH):
+            batch = [int(x) for x in ids[i:i + _LOOKUP_BATCH]]
+            for chunk_id, length, term_ids, tfs, content in db.execute(
+                "SELECT id, length, term_ids, tfs, content FROM chunks "
+                f"WHERE id IN ({','.join('?' * len(batch))})",
+                batch,
+            ):
+                if term_ids is None:
+                    missing.append((chunk_id, content))
+                else:
+                    found[chunk_id] = (length, np.frombuffer(term_ids, "<i4"), np.frombuffer(tfs, "<u2"))
+        if missing:
+            with db:
+                values = self._encode_terms(db, [term_counts(content) for _, content in missing])
+                db.executemany(
+                    "UPDATE chunks SET length = ?, term_ids = ?, tfs = ? WHERE id = ?",
+                    [(*v, chunk_id) for v, (chunk_id, _) in zip(values, missing)],
+                )
+            for (chunk_id, _), (length, term_ids, tfs) in zip(missing, values):
+                found[chunk_id] = (length, np.frombuffer(term_ids, "<i4"), np.frombuffer(tfs, "<u2"))
+        return found
+
+    # Documents
+
+    def get_document(self, doc_key: str) -> Optional[dict]:
+        return self.documents([doc_key]).get(doc_key)
+
+    def documents(self, doc_keys: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """Index state of the given documents (all when doc_keys is None)"""
+        with self._lock:
+            db = self._connect()
+            columns = "doc_key, source, fingerprint, status, chunk_count, error, updated_at, user_id"
+            if doc_keys is None:
+                rows = db.execute(f"SELECT {columns} FROM documents").fetchall()
+            else:
+                keys = list(doc_keys)
+                rows = []
+                for i in range(0, len(keys), _LOOKUP_BATCH):
+                    batch = keys[i:i + _LOOKUP_BATCH]
+                    rows += db.execute(
+                        f"SELECT {columns} FROM documents WHERE doc_key IN ({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+        return {
+            r[0]: {
+                "source": r[1],
+                "fingerprint": r[2],
+                "status": r[3],
+                "chunk_count": r[4],
+                "error": r[5],
+                "updated_at": r[6],
+                "user_id": r[7],
+            }
+            for r in rows
+        }
+
+    def is_ready(self, doc_keys: Iterable[str]) -> bool:
+        keys = list(doc_keys)
+        docs = self.documents(keys)
+        return bool(keys) and all(docs.get(k, {}).get("status") == STATUS_READY for k in keys)
+
+    def begin(self, doc_key: str, source: Optional[str], fingerprint: str, user_id: Optional[int] = None):
+        """
+        Drop whatever was indexed for the document and mark it as indexing
+
+        Raises:
+            DocumentBusy: another run is indexing the document
+        """
+        with self._write_lock():
+            db = self._connect()
+            row = db.execute(
+                "SELECT status, updated_at FROM documents WHERE doc_key = ?", (doc_key,)
+            ).fetchone()
+            if row is not None and indexing_in_progress(row[0], time.time() - (row[1] or 0)):
+                raise DocumentBusy(doc_key)
+            self._remove_vectors(self._chunk_ids(db, doc_key))
+            with db:
+                db.execute("DELETE FROM chunks WHERE doc_key = ?", (doc_key,))
+                db.execute(
+                    "INSERT OR REPLACE INTO documents "
+                    "(doc_key, user_id, source, fingerprint, status, chunk_count, error, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, 0, NULL, ?)",
+                    (doc_key, user_id, source, fingerprint, STATUS_INDEXING, time.time()),
+                )
+
+    def add_chunks(self, doc_key: str, start_index: int, texts: Sequence[str]) -> List[int]:
+        """Store one batch of chunk texts and their term counts, returns their ids"""
+        counted = [term_counts(text) for text in texts]
+        with self._lock:
+            db = self._connect()
+            ids = []
+            with db:
+                terms = self._encode_terms(db, counted)
+                for i, (text, (length, term_ids, tfs)) in enumerate(zip(texts, terms), start=start_index):
+                    cur = db.execute(
+                        "INSERT INTO chunks (doc_key, chunk_index, content, length, term_ids, tfs) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (doc_key, i, text, length, term_ids, tfs),
+                    )
+                    ids.append(cur.lastrowid)
+                db.execute(
+                    "UPDATE documents SET chunk_count = ?, updated_at = ? WHERE doc_key = ?",
+                    (start_index + len(texts), time.time(), doc_key),
+                )
+        return ids
+
+    def finish(self, doc_key: str, ids: Sequence[int], vectors: np.ndarray):
+        """Add the document's vectors to the delta and mark it ready"""
+        with self._write_lock():
+            if len(ids):
+                if self._delta is None:
+                    import faiss
+
+                    self._delta = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+                self._delta.add_with_ids(_normalize(vectors), np.asarray(ids, dtype=np.int64))
+                self._save(dim=int(vectors.shape[1]))
+            db = self._connect()
+            with db:
+                db.execute(
+                    "UPDATE documents SET status = ?, chunk_count = ?, updated_at = ? WHERE doc_key = ?",
+                    (STATUS_READY, len(ids), time.time(), doc_key),
+                )
+        self.maybe_merge()
+
+    def fail(self, doc_key: str, error: str):
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute(
+                    "UPDATE documents SET status = ?, error = ?, updated_at = ? WHERE doc_key = ?",
+                    (STATUS_FAILED, error[:1000], time.time(), doc_key),
+                )
+
+    def remove(self, doc_key: str) -> bool:
+        with self._write_lock():
+            db = self._connect()
+            self._remove_vectors(self._chunk_ids(db, doc_key))
+            with db:
+                db.execute("DELETE FROM chunks WHERE doc_key = ?", (doc_key,))
+                cur = db.execute("DELETE FROM documents WHERE doc_key = ?", (doc_key,))
+            removed = cur.rowcount > 0
+        self.maybe_merge()
+        return removed
+
+    # Merging
+
+    def pending_merge(self) -> int:
+        """Vectors in the delta plus removed vectors still in the base"""
+        with self._lock:
+            self._refresh()
+            return (self._delta.ntotal if self._delta is not None else 0) + len(self._excluded)
+
+    def maybe_merge(self):
+        """
+        Start a background merge once enough changes have piled up, or
+        when the base was written before lexical search and has no postings
+        """
+        if self._merge_thread is not None and self._merge_thread.is_alive():
+            return
+        if self.pending_merge() < self.merge_threshold and not (
+            self._base is not None and self._lexical_base is None
+        ):
+            return
+        self._merge_thread = threading.Thread(
+            target=self._merge_in_background, name="faiss-document-merge", daemon=True
+        )
+        self._merge_thread.start()
+
+    def _merge_in_background(self):
+        try:
+            self.merge()
+        except Exception as e:
+            self.merge_errors += 1
+            logger.error(f"Document index merge failed: {e}")
+
+    def merge(self) -> bool:
+        """
+        Write a new base from the current base and delta, minus removed vectors
+
+        Writers are only blocked while the delta is snapshotted and while
+        the manifest is switched, not while the new base is written.
+
+        Returns:
+            False if another thread or process is already merging
+        """
+        import faiss
+
+        with self._file_lock("merge.lock", blocking=False) as acquired:
+            if not acquired:
+                return False
+
+            # Snapshot what this merge folds in
+            with self._write_lock():
+                base, base_ids = self._base, self._base_ids
+                removed_upto = self._connect().execute("SELECT MAX(seq) FROM removed").fetchone()[0] or 0
+                removed = np.asarray(
+                    sorted(r[0] for r in self._connect().execute(
+                        "SELECT id FROM removed WHERE seq <= ?", (removed_upto,)
+                    )),
+                    dtype=np.int64,
+                )
+                delta_ids = np.empty(0, dtype=np.int64)
+                delta_vectors = None
+                if self._delta is not None and self._delta.ntotal:
+                    delta_ids = faiss.vector_to_array(self._delta.id_map).astype(np.int64)
+                    delta_vectors = self._delta.index.reconstruct_n(0, self._delta.ntotal)
+                generation = self._manifest.get("generation", 0) + 1
+                dim = self._manifest.get("dim") or (self._delta.d if self._delta is not None else None)
+            if dim is None:
+                return True
+
+            started = time.monotonic()
+            merged = faiss.IndexFlatIP(dim)
+            merged_ids = []
+            if base is not None:
+                for start in range(0, base.ntotal, _MERGE_BLOCK):
+                    n = min(_MERGE_BLOCK, base.ntotal - start)
+                    ids = np.asarray(base_ids[start:start + n])
+                    keep = ~np.isin(ids, removed)
+                    merged.add(base.reconstruct_n(start, n)[keep])
+                    merged_ids.append(ids[keep])
+            if delta_vectors is not None:
+                keep = ~np.isin(delta_ids, removed)
+                merged.add(delta_vectors[keep])
+                merged_ids.append(delta_ids[keep])
+            ids = np.concatenate(merged_ids) if merged_ids else np.empty(0, dtype=np.int64)
+            order = np.argsort(ids, kind="stable")
+            lookup = np.stack([ids[order], order.astype(np.int64)])
+
+            name = f"base-{generation}"
+            prefix = os.path.join(self.path, name)
+            _replace_file(f"{prefix}.faiss", functools.partial(faiss.write_index, merged))
+            for suffix, array in zip(_VECTOR_SUFFIXES, (ids, lookup)):
+                _save_array(f"{prefix}.{suffix}.npy", array)
+            del merged
+            self._write_lexical_base(prefix, ids)
+
+            # Switch to the new base; vectors added or removed meanwhile stay in the delta
+            with self._write_lock():
+                old_name = self._base_name
+                if self._delta is not None and len(delta_ids):
+                    self._delta.remove_ids(delta_ids)
+                db = self._connect()
+                with db:
+                    db.execute("DELETE FROM removed WHERE seq <= ?", (removed_upto,))
+                self._save(base=name, generation=generation)
+
+            if old_name:
+                # Processes still searching the old base keep their mapping
+                for suffix in (".faiss", *(f".{s}.npy" for s in _VECTOR_SUFFIXES + _LEXICAL_SUFFIXES)):
+                    try:
+                        os.unlink(os.path.join(self.path, old_name + suffix))
+                    except OSError:
+                        pass
+
+        self.merges += 1
+        logger.info(
+            f"Merged document index into {name}: {len(ids)} vectors "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+        return True
+
+    def _write_lexical_base(self, prefix: str, ids: np.ndarray):
+        """Write the BM25 postings of the chunks of a new base, in base position order"""
+        db = self._open_db()
+        try:
+            terms = self._chunk_terms(db, ids)
+        finally:
+            db.close()
+        lengths = np.zeros(len(ids), dtype=np.float32)
+        counts = np.zeros(len(ids), dtype=np.int64)
+        term_parts, tf_parts = [], []
+        for position, chunk_id in enumerate(ids.tolist()):
+            entry = terms.get(chunk_id)
+            if entry is None:  # deleted meanwhile, removed from the base by the next merge
+                continue
+            lengths[position], term_ids, tfs = entry
+            counts[position] = len(term_ids)
+            term_parts.append(term_ids)
+            tf_parts.append(tfs)
+        all_terms = np.concatenate(term_parts) if term_parts else np.empty(0, dtype=np.int32)
+        all_tfs = np.concatenate(tf_parts) if tf_parts else np.empty(0, dtype=np.uint16)
+        positions = np.repeat(np.arange(len(ids), dtype=np.int32), counts)
+        del terms, term_parts, tf_parts
+
+        order = np.argsort(all_terms, kind="stable")
+        unique, starts = np.unique(all_terms[order], return_index=True)
+        arrays = {
+            "terms": unique.astype(np.int32),
+            "offsets": np.append(starts, len(order)).astype(np.int64),
+            "postings": positions[order],
+            "tfs": all_tfs[order],
+            "lengths": lengths,
+        }
+        for suffix in _LEXICAL_SUFFIXES:
+            _save_array(f"{prefix}.{suffix}.npy", arrays[suffix])
+
+    # Search
+
+    def search(
+        self,
+        vector: Sequence[float],
+        k: int = 4,
+        doc_keys: Optional[Iterable[str]] = None,
+        user_id: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[Tuple[dict, float]]:
+        """
+        Nearest chunks by cosine similarity
+
+        Args:
+            vector: Query embedding
+            k: Number of chunks
+            doc_keys: Only search these documents
+            user_id: Only search documents of this user
+            ef_search: Ignored, flat FAISS search is exact
+
+        Returns:
+            [({"id", "doc_key", "chunk_index", "content", "source"}, score), ...]
+        """
+        import faiss
+
+        query = _normalize(np.asarray([vector], dtype=np.float32))
+        hits: List[Tuple[int, float]] = []
+
+        with self._lock:
+            self._refresh()
+            base, base_ids, excluded = self._base, self._base_ids, self._excluded
+
+            allowed = positions = None
+            if doc_keys is not None or user_id is not None:
+                allowed = self._allowed_ids(doc_keys, user_id)
+                if not allowed:
+                    return []
+                allowed = np.asarray(allowed, dtype=np.int64)
+                positions = self._base_positions(allowed)
+
+            # The delta is modified in place by writers of this process
+            if self._delta is not None and self._delta.ntotal:
+                params = None
+                if allowed is not None:
+                    params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(allowed))
+                scores, ids = self._delta.search(query, k, params=params)
+                hits += [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1]
+
+        # The base is read-only, searching it needs no lock
+        if base is not None and base.ntotal:
+            selector = None
+            if allowed is not None:
+                if len(positions):
+                    selector = faiss.IDSelectorBatch(positions)
+            elif len(excluded):
+                inner = faiss.IDSelectorBatch(excluded)
+                selector = faiss.IDSelectorNot(inner)
+            if allowed is None or selector is not None:
+                params = faiss.SearchParameters(sel=selector) if selector is not None else None
+                scores, positions = base.search(query, k, params=params)
+                hits += [
+                    (int(base_ids[p]), float(s)) for p, s in zip(positions[0], scores[0]) if p != -1
+                ]
+
+        hits.sort(key=lambda h: -h[1])
+        return self._chunks(hits[:k])
+
+    def _refresh_lexical(self):
+        """Load the postings of new delta chunks and the live base positions (under the lock)"""
+        self._refresh()
+        if self._lexical_stamp == self._manifest_stamp:
+            return
+        import faiss
+
+        delta_ids = np.empty(0, dtype=np.int64)
+        if self._delta is not None and self._delta.ntotal:
+            delta_ids = faiss.vector_to_array(self._delta.id_map).astype(np.int64)
+        if not set(self._delta_lengths).issubset(delta_ids.tolist()):
+            # Chunks left the delta (merged or removed), start over
+            self._delta_postings, self._delta_lengths, self._delta_length_total = {}, {}, 0.0
+        new = [i for i in delta_ids.tolist() if i not in self._delta_lengths]
+        if new:
+            self._add_delta_postings(self._chunk_terms(self._connect(), new))
+
+        if self._lexical_base is not None:
+            lengths = self._lexical_base[4]
+            alive = np.ones(len(lengths), dtype=bool)
+            alive[self._excluded] = False
+            self._base_alive = alive
+            self._base_live_chunks = int(alive.sum())
+            self._base_live_length = float(np.asarray(lengths, dtype=np.float64)[alive].sum())
+        self._lexical_stamp = self._manifest_stamp
+
+    def _add_delta_postings(self, chunks: Dict[int, Tuple[int, np.ndarray, np.ndarray]]):
+        if not chunks:
+            return
+        ids = np.fromiter(chunks, dtype=np.int64, count=len(chunks))
+        counts = [len(chunks[i][1]) for i in ids.tolist()]
+        chunk_lengths = np.asarray([chunks[i][0] for i in ids.tolist()], dtype=np.float32)
+        all_terms = np.concatenate([chunks[i][1] for i in ids.tolist()])
+        all_tfs = np.concatenate([chunks[i][2] for i in ids.tolist()])
+        all_ids = np.repeat(ids, counts)
+        all_lengths = np.repeat(chunk_lengths, counts)
+
+        order = np.argsort(all_terms, kind="stable")
+        unique, starts = np.unique(all_terms[order], return_index=True)
+        bounds = np.append(starts, len(order)).tolist()
+        for n, term in enumerate(unique.tolist()):
+            part = order[bounds[n]:bounds[n + 1]]
+            self._delta_postings.setdefault(term, []).append((all_ids[part], all_tfs[part], all_lengths[part]))
+        self._delta_lengths.update(zip(ids.tolist(), chunk_lengths.tolist()))
+        self._delta_length_total += float(chunk_lengths.sum())
+
+    def lexical_search(
+        self,
+        query: str,
+        k: int = 4,
+        doc_keys: Optional[Iterable[str]] = None,
+        user_id: Optional[int] = None,
+    ) -> List[Tuple[dict, float]]:
+        """
+        Best chunks by BM25 over their terms (see lexical.py)
+
+        The delta postings are scored under the lock, the memory-mapped base
+        postings outside it; only the postings of the query terms are read.
+
+        Returns:
+            [({"id", "doc_key", "chunk_index", "content", "source"}, score), ...]
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            self._refresh_lexical()
+            term_ids = list(self._term_ids(self._connect(), terms, create=False).values())
+            if not term_ids:
+                return []
+            base, alive, excluded_any = self._lexical_base, self._base_alive, len(self._excluded) > 0
+            live_chunks = self._base_live_chunks + len(self._delta_lengths)
+            live_length = self._base_live_length + self._delta_length_total
+
+            allowed = positions = None
+            if doc_keys is not None or user_id is not None:
+                allowed = np.asarray(self._allowed_ids(doc_keys, user_id), dtype=np.int64)
+                if not len(allowed):
+                    return []
+                positions = self._base_positions(allowed)
+
+            # Copies of the delta postings, writers of this process append to them
+            delta = {}
+            for term in term_ids:
+                parts = self._delta_postings.get(term)
+                if parts:
+                    delta[term] = tuple(np.concatenate(column) for column in zip(*parts))
+            base_ids = self._base_ids
+        if base is None and self._base is not None:
+            self.maybe_merge()
+        if not live_chunks:
+            return []
+        avg_length = max(live_length / live_chunks, 1.0)
+
+        terms_sorted, offsets, postings, base_tfs, base_lengths = base if base is not None else (None,) * 5
+        base_scores = np.zeros(len(base_lengths) if base is not None else 0, dtype=np.float32)
+        delta_ids, delta_weights = [], []
+        for term in term_ids:
+            hits = None
+            if base is not None:
+                i = int(np.searchsorted(terms_sorted, term))
+                if i < len(terms_sorted) and terms_sorted[i] == term:
+                    hits = postings[offsets[i]:offsets[i + 1]]
+                    tfs = base_tfs[offsets[i]:offsets[i + 1]]
+                    if excluded_any:
+                        live = alive[hits]
+                        hits, tfs = hits[live], tfs[live]
+            d_ids, d_tfs, d_lengths = delta.get(term, (None, None, None))
+            df = (len(hits) if hits is not None else 0) + (len(d_ids) if d_ids is not None else 0)
+            if not df:
+                continue
+            idf = bm25_idf(df, live_chunks)
+            if hits is not None and len(hits):
+                base_scores[hits] += bm25_weights(tfs, base_lengths[hits], idf, avg_length)
+            if d_ids is not None:
+                delta_ids.append(d_ids)
+                delta_weights.append(bm25_weights(d_tfs, d_lengths, idf, avg_length))
+
+        candidates: List[Tuple[int, float]] = []
+        if len(base_scores):
+            scored = positions if positions is not None else np.flatnonzero(base_scores)
+            scored = scored[base_scores[scored] > 0]
+            if len(scored) > k:
+                scored = scored[np.argpartition(-base_scores[scored], k - 1)[:k]]
+            candidates += zip(np.asarray(base_ids)[scored].tolist(), base_scores[scored].tolist())
+        if delta_ids:
+            ids, inverse = np.unique(np.concatenate(delta_ids), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(delta_weights))
+            if allowed is not None:
+                keep = np.isin(ids, allowed)
+                ids, scores = ids[keep], scores[keep]
+            top = np.argsort(-scores, kind="stable")[:k]
+            candidates += [(int(ids[i]), float(scores[i])) for i in top]
+
+        candidates.sort(key=lambda h: -h[1])
+        return self._chunks(candidates[:k])
+
+    def _allowed_ids(self, doc_keys: Optional[Iterable[str]], user_id: Optional[int]) -> List[int]:
+        """Chunk ids of the documents a filtered search may return"""
+        db = self._connect()
+        sql = "SELECT c.id FROM chunks c JOIN documents d ON d.doc_key = c.doc_key WHERE 1 = 1"
+        params: list = []
+        if user_id is not None:
+            sql += " AND d.user_id = ?"
+            params.append(user_id)
+        if doc_keys is None:
+            return [r[0] for r in db.execute(sql, params)]
+        keys = list(doc_keys)
+        allowed = []
+        for i in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[i:i + _LOOKUP_BATCH]
+            allowed += [r[0] for r in db.execute(
+                f"{sql} AND c.doc_key IN ({','.join('?' * len(batch))})", params + batch
+            )]
+        return allowed
+
+    def _chunks(self, hits: List[Tuple[int, float]]) -> List[Tuple[dict, float]]:
+        if not hits:
+            return []
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT c.id, c.doc_key, c.chunk_index, c.content, d.source "
+                "FROM chunks c JOIN documents d ON d.doc_key = c.doc_key "
+                f"WHERE c.id IN ({','.join('?' * len(hits))})",
+                [i for i, _ in hits],
+            ).fetchall()
+        by_id = {
+            r[0]: {"id": r[0], "doc_key": r[1], "chunk_index": r[2], "content": r[3], "source": r[4]}
+            for r in rows
+        }
+        return [(by_id[i], score) for i, score in hits if i in by_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            db = self._connect()
+            by_status = dict(db.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall())
+            chunks = db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            base_bytes = 0
+            if self._base_name:
+                try:
+                    base_bytes = os.path.getsize(os.path.join(self.path, f"{self._base_name}.faiss"))
+                except OSError:
+                    pass
+            return {
+                "vector_store": self.store_type,
+                "model": self.model_key,
+                "documents": by_status,
+                "chunks": chunks,
+                "base": self._base_name,
+                "lexical_base": self._lexical_base is not None,
+                "base_vectors": self._base.ntotal if self._base is not None else 0,
+                "base_bytes": base_bytes,
+                "mmap": self.mmap,
+                "delta_vectors": self._delta.ntotal if self._delta is not None else 0,
+                "removed_vectors": len(self._excluded),
+                "merge_threshold": self.merge_threshold,
+                "merging": self._merge_thread is not None and self._merge_thread.is_alive(),
+                "merges": self.merges,
+                "merge_errors": self.merge_errors,
+            }
+
+
+def _pgvector_index(model_key: str):
+    from app.core.documents.pgvector import PgvectorDocumentIndex
+
+    return PgvectorDocumentIndex(model_key)
+
+
+INDEX_TYPES = {
+    "faiss": FaissDocumentIndex,
+    "pgvector": _pgvector_index,
+}
+
+
+def create_document_index(model_key: str, store_type: str = settings.VECTOR_STORE_TYPE):
+    """
+    Document index for VECTOR_STORE_TYPE
+
+    Raises:
+        UnsupportedVectorStore: no implementation for store_type
+    """
+    index_type = INDEX_TYPES.get(store_type)
+    if index_type is None:
+        raise UnsupportedVectorStore(
+            f"Document indexing supports VECTOR_STORE_TYPE {', '.join(INDEX_TYPES)}, not {store_type}"
+        )
+    return index_type(model_key)
@@ -0,0 +1,96 @@
+"""Lexical Terms of Document Chunks
+
+Embeddings blur exact identifiers (product codes, version numbers, file
+names) and short Chinese terms, so every chunk is also indexed by its
+terms for BM25 search next to its vector:
+
+- Latin words and numbers are lower-cased; identifiers such as
+  `SKU-1024.b` are kept whole and also split into their parts
+- Runs of CJK characters become overlapping bigrams, which needs no word
+  segmentation dictionary. Chunks also get the single characters so
+  that one-character queries match; longer queries only use bigrams.
+
+The same tokenizer runs on chunks and queries. The FAISS store keeps
+the term counts of every chunk and scores them with BM25 itself (see
+index.py), the pgvector store hands them to PostgreSQL as a tsvector.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"  # kana, CJK ideographs, hangul
+_WORD = rf"[^\W_{_CJK}]+"
+_TOKEN = re.compile(rf"{_WORD}(?:[._/-]{_WORD})*|[{_CJK}]+")
+_CJK_RUN = re.compile(f"[{_CJK}]+")
+_PARTS = re.compile(r"[._/-]")
+
+# Terms of one query, the rest are ignored
+MAX_QUERY_TERMS = 64
+
+# Largest position a PostgreSQL tsvector stores
+_MAX_POSITION = 16383
+
+# BM25 term frequency saturation and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str, cjk_unigrams: bool = False) -> List[str]:
+    """Terms of a text, in order and with repeats"""
+    terms: List[str] = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        if _CJK_RUN.fullmatch(token):
+            if len(token) == 1:
+                terms.append(token)
+                continue
+            for i in range(len(token) - 1):
+                terms.append(token[i:i + 2])
+                if cjk_unigrams:
+                    terms.append(token[i])
+            if cjk_unigrams:
+                terms.append(token[-1])
+        else:
+            terms.append(token)
+            if _PARTS.search(token):
+                terms.extend(p for p in _PARTS.split(token) if p)
+    return terms
+
+
+def query_terms(query: str) -> List[str]:
+    """Distinct terms of a query, at most MAX_QUERY_TERMS"""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def term_counts(text: str) -> Tuple[List[str], List[int], int]:
+    """Distinct terms of a chunk, their frequencies and the chunk length in terms"""
+    terms = tokenize(text, cjk_unigrams=True)
+    counts = Counter(terms)
+    return list(counts), list(counts.values()), len(terms)
+
+
+def bm25_idf(df: int, n: int) -> float:
+    return math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+
+
+def bm25_weights(tfs: np.ndarray, lengths: np.ndarray, idf: float, avg_length: float) -> np.ndarray:
+    """BM25 contribution of one term to the chunks it occurs in"""
+    tfs = np.asarray(tfs, dtype=np.float32)
+    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * np.asarray(lengths, dtype=np.float32) / avg_length)
+    return idf * tfs * (BM25_K1 + 1.0) / (tfs + norm)
+
+
+def tsvector_literal(text: str) -> str:
+    """tsvector of a text's terms with their positions (for term frequencies)"""
+    positions: dict = {}
+    for position, term in enumerate(tokenize(text, cjk_unigrams=True), start=1):
+        positions.setdefault(term, []).append(min(position, _MAX_POSITION))
+    return " ".join(f"'{t}':{','.join(map(str, p[:256]))}" for t, p in positions.items())
+
+
+def tsquery_literal(terms: List[str]) -> str:
+    return " | ".join(f"'{t}'" for t in terms)
@@ -0,0 +1,412 @@
+"""pgvector Document Index
+
+VECTOR_STORE_TYPE=pgvector keeps document chunks and their embeddings
+in the `document_chunks` table of DATABASE_URL, searched through an
+HNSW (or IVFFlat) cosine index. `init_vector_store` creates the
+extension, the tables and the index; the index is managed, so changing
+PGVECTOR_INDEX_TYPE or its build parameters rebuilds it on the next
+init_db.
+
+The chunk terms are stored as a GIN-indexed tsvector for lexical search.
+PostgreSQL has no BM25, so those hits are ranked by ts_rank normalised by
+chunk length, which is only used for its ordering (see retriever.py).
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import cast, delete, func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import TSQUERY
+
+from app.core.config import settings
+from app.core.documents.lexical import query_terms, tsquery_literal, tsvector_literal
+from app.core.documents.index import (
+    STATUS_FAILED,
+    STATUS_INDEXING,
+    STATUS_READY,
+    DocumentBusy,
+    indexing_in_progress,
+)
+from app.models.database import DocumentChunk, IndexedDocument, Vector
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "ix_document_chunks_embedding"
+LEXEMES_INDEX_NAME = "ix_document_chunks_lexemes"
+
+# ts_rank normalisation: divide by 1 + log(document length)
+_RANK_NORMALIZATION = 1
+
+# Chunks filled per statement when adding the lexemes column to an existing table
+_BACKFILL_BATCH = 1000
+
+INDEX_TYPES = ("hnsw", "ivfflat")
+
+
+def vector_index_options(index_type: str = settings.PGVECTOR_INDEX_TYPE) -> Dict[str, int]:
+    if index_type == "hnsw":
+        return {"m": settings.PGVECTOR_HNSW_M, "ef_construction": settings.PGVECTOR_HNSW_EF_CONSTRUCTION}
+    if index_type == "ivfflat":
+        return {"lists": settings.PGVECTOR_IVFFLAT_LISTS}
+    raise ValueError(f"PGVECTOR_INDEX_TYPE must be one of {', '.join(INDEX_TYPES)}, not {index_type}")
+
+
+def vector_index_ddl(
+    table: str = "document_chunks",
+    index_name: str = INDEX_NAME,
+    index_type: str = settings.PGVECTOR_INDEX_TYPE,
+) -> str:
+    options = ", ".join(f"{k} = {v}" for k, v in vector_index_options(index_type).items())
+    return (
+        f"CREATE INDEX {index_name} ON {table} "
+        f"USING {index_type} (embedding vector_cosine_ops) WITH ({options})"
+    )
+
+
+def search_settings(ef_search: Optional[int] = None, filtered: bool = False) -> List[str]:
+    """SET LOCAL statements tuning one ANN query"""
+    if settings.PGVECTOR_INDEX_TYPE == "ivfflat":
+        statements = [f"SET LOCAL ivfflat.probes = {int(ef_search or settings.PGVECTOR_IVFFLAT_PROBES)}"]
+        prefix = "ivfflat"
+    else:
+        statements = [f"SET LOCAL hnsw.ef_search = {int(ef_search or settings.PGVECTOR_EF_SEARCH)}"]
+        prefix = "hnsw"
+    # Without iterative scans a selective filter can leave fewer than k rows
+    if filtered and settings.PGVECTOR_ITERATIVE_SCAN in ("strict_order", "relaxed_order"):
+        statements.append(f"SET LOCAL {prefix}.iterative_scan = {settings.PGVECTOR_ITERATIVE_SCAN}")
+    return statements
+
+
+def enable_vector_extension(engine) -> bool:
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        return True
+    except Exception as e:
+        logger.warning(f"pgvector extension unavailable: {e}")
+        return False
+
+
+def ensure_vector_index(engine) -> str:
+    """
+    Create the ANN index on document_chunks.embedding, or rebuild it when
+    its type or build parameters differ from the settings
+
+    Returns:
+        "created", "rebuilt" or "unchanged"
+    """
+    index_type = settings.PGVECTOR_INDEX_TYPE
+    wanted = [f"USING {index_type} "] + [
+        f"{k}='{v}'" for k, v in vector_index_options(index_type).items()
+    ]
+    with engine.begin() as conn:
+        row = conn.execute(
+            text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"), {"name": INDEX_NAME}
+        ).fetchone()
+        if row is not None and all(part in row[0] for part in wanted):
+            return "unchanged"
+        if row is not None:
+            conn.execute(text(f"DROP INDEX {INDEX_NAME}"))
+        conn.execute(text(vector_index_ddl()))
+    logger.info(f"{'Rebuilt' if row is not None else 'Created'} {index_type} index {INDEX_NAME}")
+    return "rebuilt" if row is not None else "created"
+
+
+def ensure_lexical_index(engine):
+    """
+    Add the lexemes column and its GIN index to tables created before
+    lexical search, filling it for the chunks already stored
+    """
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS lexemes tsvector"))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {LEXEMES_INDEX_NAME} ON document_chunks USING gin (lexemes)"
+        ))
+    filled = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, content FROM document_chunks WHERE lexemes IS NULL LIMIT :n"
+            ), {"n": _BACKFILL_BATCH}).all()
+            if not rows:
+                break
+            conn.execute(
+                text("UPDATE document_chunks SET lexemes = CAST(:lexemes AS tsvector) WHERE id = :id"),
+                [{"id": r.id, "lexemes": tsvector_literal(r.content)} for r in rows],
+            )
+        filled += len(rows)
+    if filled:
+        logger.info(f"Filled lexical terms of {filled} document chunks")
+
+
+def init_vector_store(engine) -> bool:
+    """
+    Create the vector extension, the pgvector tables and their ANN index
+
+    Returns:
+        False when the database cannot hold vectors (not PostgreSQL, no
+        extension, or the pgvector package is missing)
+    """
+    if engine.dialect.name != "postgresql" or Vector is None:
+        return False
+    if not enable_vector_extension(engine):
+        return False
+    IndexedDocument.__table__.create(bind=engine, checkfirst=True)
+    DocumentChunk.__table__.create(bind=engine, checkfirst=True)
+    ensure_vector_index(engine)
+    ensure_lexical_index(engine)
+    return True
+
+
+class PgvectorDocumentIndex:
+    """
+    Document chunks and embeddings in PostgreSQL
+
+    Same interface as FaissDocumentIndex. Embeddings are written when the
+    whole document is embedded, so searches never see half a document.
+    """
+
+    store_type = "pgvector"
+
+    def __init__(self, model_key: str, session_factory=None):
+        if Vector is None:
+            raise RuntimeError("VECTOR_STORE_TYPE=pgvector needs the pgvector package (pip install pgvector)")
+        if session_factory is None:
+            from app.core.database import SessionLocal as session_factory
+        self.model_key = model_key
+        self.session_factory = session_factory
+
+    # Documents
+
+    def get_document(self, doc_key: str) -> Optional[dict]:
+        return self.documents([doc_key]).get(doc_key)
+
+    def documents(self, doc_keys: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """Index state of the given documents (all when doc_keys is None)"""
+        query = select(IndexedDocument).where(IndexedDocument.model == self.model_key)
+        if doc_keys is not None:
+            query = query.where(IndexedDocument.doc_key.in_(list(doc_keys)))
+        with self.session_factory() as db:
+            return {
+                d.doc_key: {
+                    "source": d.source,
+                    "fingerprint": d.fingerprint,
+                    "status": d.status,
+                    "chunk_count": d.chunk_count,
+                    "error": d.error,
+                    "user_id": d.user_id,
+                    "updated_at": d.updated_at.timestamp() if d.updated_at else None,
+                }
+                for d in db.scalars(query)
+            }
+
+    def is_ready(self, doc_keys: Iterable[str]) -> bool:
+        keys = list(doc_keys)
+        docs = self.documents(keys)
+        return bool(keys) and all(docs.get(k, {}).get("status") == STATUS_READY for k in keys)
+
+    def begin(self, doc_key: str, source: Optional[str], fingerprint: str, user_id: Optional[int] = None):
+        """
+        Drop whatever was indexed for the document and mark it as indexing
+
+        Raises:
+            DocumentBusy: another run is indexing the document
+        """
+        with self.session_factory() as db, db.begin():
+            # Row lock, so two runs cannot both find the document idle
+            current = db.get(IndexedDocument, doc_key, with_for_update=True)
+            if current is not None and current.updated_at is not None and indexing_in_progress(
+                current.status, (datetime.utcnow() - current.updated_at).total_seconds()
+            ):
+                raise DocumentBusy(doc_key)
+            db.execute(delete(DocumentChunk).where(DocumentChunk.doc_key == doc_key))
+            db.merge(IndexedDocument(
+                doc_key=doc_key,
+                user_id=user_id,
+                model=self.model_key,
+                source=source,
+                fingerprint=fingerprint,
+                status=STATUS_INDEXING,
+                chunk_count=0,
+                error=None,
+            ))
+
+    def add_chunks(self, doc_key: str, start_index: int, texts: Sequence[str]) -> List[int]:
+        """Store one batch of chunk texts, returns their ids"""
+        with self.session_factory() as db, db.begin():
+            ids = db.scalars(
+                insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True),
+                [
+                    {"doc_key": doc_key, "chunk_index": i, "content": t, "lexemes": tsvector_literal(t)}
+                    for i, t in enumerate(texts, start=start_index)
+                ],
+            ).all()
+            db.execute(
+                update(IndexedDocument)
+                .where(IndexedDocument.doc_key == doc_key)
+                .values(chunk_count=start_index + len(texts))
+            )
+        return list(ids)
+
+    def finish(self, doc_key: str, ids: Sequence[int], vectors: np.ndarray):
+        """Write the document's embeddings and mark it ready"""
+        with self.session_factory() as db, db.begin():
+            if len(ids):
+                db.execute(
+                    update(DocumentChunk),
+                    [{"id": int(i), "embedding": v} for i, v in zip(ids, np.asarray(vectors, dtype=np.float32))],
+                )
+            db.execute(
+                update(IndexedDocument)
+                .where(IndexedDocument.doc_key == doc_key)
+                .values(status=STATUS_READY, chunk_count=len(ids))
+            )
+
+    def fail(self, doc_key: str, error: str):
+        with self.session_factory() as db, db.begin():
+            db.execute(
+                update(IndexedDocument)
+                .where(IndexedDocument.doc_key == doc_key)
+                .values(status=STATUS_FAILED, error=error[:1000])
+            )
+
+    def remove(self, doc_key: str) -> bool:
+        with self.session_factory() as db, db.begin():
+            db.execute(delete(DocumentChunk).where(DocumentChunk.doc_key == doc_key))
+            result = db.execute(delete(IndexedDocument).where(IndexedDocument.doc_key == doc_key))
+            return result.rowcount > 0
+
+    # Search
+
+    def search(
+        self,
+        vector: Sequence[float],
+        k: int = 4,
+        doc_keys: Optional[Iterable[str]] = None,
+        user_id: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[Tuple[dict, float]]:
+        """
+        Approximate nearest chunks by cosine similarity
+
+        Args:
+            vector: Query embedding
+            k: Number of chunks
+            doc_keys: Only search these documents
+            user_id: Only search documents of this user
+            ef_search: hnsw.ef_search (ivfflat.probes for IVFFlat) for this query
+
+        Returns:
+            [({"id", "doc_key", "chunk_index", "content", "source"}, score), ...]
+        """
+        distance = DocumentChunk.embedding.cosine_distance(np.asarray(vector, dtype=np.float32))
+        query = (
+            select(
+                DocumentChunk.id,
+                DocumentChunk.doc_key,
+                DocumentChunk.chunk_index,
+                DocumentChunk.content,
+                IndexedDocument.source,
+                distance.label("distance"),
+            )
+            .join(IndexedDocument, IndexedDocument.doc_key == DocumentChunk.doc_key)
+            .where(IndexedDocument.model == self.model_key, IndexedDocument.status == STATUS_READY)
+        )
+        if doc_keys is not None:
+            query = query.where(DocumentChunk.doc_key.in_(list(doc_keys)))
+        if user_id is not None:
+            query = query.where(IndexedDocument.user_id == user_id)
+        query = query.order_by(distance).limit(k)
+
+        filtered = doc_keys is not None or user_id is not None
+        with self.session_factory() as db, db.begin():
+            for statement in search_settings(ef_search, filtered):
+                db.execute(text(statement))
+            rows = db.execute(query).all()
+        return [
+            (
+                {"id": r.id, "doc_key": r.doc_key, "chunk_index": r.chunk_index, "content": r.content, "source": r.source},
+                1.0 - float(r.distance),
+            )
+            for r in rows
+        ]
+
+    def lexical_search(
+        self,
+        query: str,
+        k: int = 4,
+        doc_keys: Optional[Iterable[str]] = None,
+        user_id: Optional[int] = None,
+    ) -> List[Tuple[dict, float]]:
+        """
+        Best chunks by ts_rank over their terms, among ready documents
+
+        Returns:
+            [({"id", "doc_key", "chunk_index", "content", "source"}, score), ...]
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        tsquery = cast(tsquery_literal(terms), TSQUERY)
+        rank = func.ts_rank(DocumentChunk.lexemes, tsquery, _RANK_NORMALIZATION)
+        statement = (
+            select(
+                DocumentChunk.id,
+                DocumentChunk.doc_key,
+                DocumentChunk.chunk_index,
+                DocumentChunk.content,
+                IndexedDocument.source,
+                rank.label("rank"),
+            )
+            .join(IndexedDocument, IndexedDocument.doc_key == DocumentChunk.doc_key)
+            .where(
+                DocumentChunk.lexemes.op("@@")(tsquery),
+                IndexedDocument.model == self.model_key,
+                IndexedDocument.status == STATUS_READY,
+            )
+        )
+        if doc_keys is not None:
+            statement = statement.where(DocumentChunk.doc_key.in_(list(doc_keys)))
+        if user_id is not None:
+            statement = statement.where(IndexedDocument.user_id == user_id)
+        statement = statement.order_by(rank.desc()).limit(k)
+
+        with self.session_factory() as db:
+            rows = db.execute(statement).all()
+        return [
+            (
+                {"id": r.id, "doc_key": r.doc_key, "chunk_index": r.chunk_index, "content": r.content, "source": r.source},
+                float(r.rank),
+            )
+            for r in rows
+        ]
+
+    def stats(self) -> dict:
+        with self.session_factory() as db:
+            by_status = dict(db.execute(
+                select(IndexedDocument.status, func.count())
+                .where(IndexedDocument.model == self.model_key)
+                .group_by(IndexedDocument.status)
+            ).all())
+            chunks = db.scalar(
+                select(func.count()).select_from(DocumentChunk)
+                .join(IndexedDocument, IndexedDocument.doc_key == DocumentChunk.doc_key)
+                .where(IndexedDocument.model == self.model_key)
+            )
+            index = db.execute(
+                text("SELECT indexdef, pg_relation_size(indexname::regclass) FROM pg_indexes WHERE indexname = :name"),
+                {"name": INDEX_NAME},
+            ).fetchone()
+            table_bytes = db.scalar(text("SELECT pg_total_relation_size('document_chunks')"))
+        return {
+            "vector_store": self.store_type,
+            "model": self.model_key,
+            "documents": by_status,
+            "chunks": chunks,
+            "index": index[0] if index else None,
+            "index_bytes": index[1] if index else 0,
+            "table_bytes": table_bytes,
+            "ef_search": settings.PGVECTOR_EF_SEARCH,
+        }
@@ -0,0 +1,303 @@
+"""Document Ingestion Pipeline
+
+extract → chunk → embed → index, streamed: chunks are embedded in
+batches of DOCUMENT_EMBED_BATCH_SIZE while the rest of the file is
+still being read.
+
+Re-running is idempotent. A document whose file, chunking settings and
+embedding model are unchanged since it was last indexed is skipped;
+otherwise its previous chunks and vectors are dropped before it is
+indexed again, so interrupted runs leave nothing behind. Only one run
+indexes a document at a time: runs in the same process wait for each
+other, the index refuses a run while another process is indexing.
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.documents.chunking import iter_chunks
+from app.core.documents.extraction import iter_text, extract_text
+from app.core.documents.index import STATUS_READY, create_document_index
+from app.services.embedding_cache import embedding_model_key, install_embedding_hook
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[dict], None]
+
+
+@dataclass
+class IngestResult:
+    doc_key: str
+    status: str  # indexed, unchanged
+    chunk_count: int
+    fingerprint: str
+    chars: int = 0
+    content: Optional[str] = field(default=None, repr=False)
+
+
+def embedding_model() -> Tuple[str, str, dict]:
+    """(provider, model, kwargs) of the configured EMBEDDING, as gpt-researcher parses it"""
+    provider, _, model = settings.EMBEDDING.partition(":")
+    try:
+        kwargs = json.loads(settings.EMBEDDING_KWARGS or "{}")
+    except ValueError:
+        kwargs = {}
+    return provider, model, kwargs
+
+
+def current_model_key() -> str:
+    provider, model, kwargs = embedding_model()
+    return embedding_model_key(provider, model, **kwargs)
+
+
+_embeddings = None
+_indexes = {}
+_init_lock = threading.Lock()
+# doc_key -> [lock, runs holding or waiting for it]
+_ingest_locks: Dict[str, list] = {}
+
+
+@contextlib.contextmanager
+def _ingest_lock(doc_key: str):
+    """Serialise the ingest runs of one document in this process"""
+    with _init_lock:
+        entry = _ingest_locks.setdefault(doc_key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _init_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _ingest_locks[doc_key]
+
+
+def get_document_embeddings():
+    """LangChain embeddings of the configured model, through the embedding cache"""
+    global _embeddings
+    with _init_lock:
+        if _embeddings is None:
+            from gpt_researcher.memory.embeddings import Memory
+
+            install_embedding_hook()
+            provider, model, kwargs = embedding_model()
+            _embeddings = Memory(provider, model, **kwargs).get_embeddings()
+        return _embeddings
+
+
+def get_document_index():
+    """Document index of the configured vector store and embedding model"""
+    key = (settings.VECTOR_STORE_TYPE, current_model_key())
+    with _init_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = create_document_index(key[1], key[0])
+        return index
+
+
+def file_fingerprint(path: str) -> str:
+    """Hash of the file content and everything else that changes its chunks or vectors"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    digest.update(
+        f"|{settings.DOCUMENT_CHUNK_SIZE}|{settings.DOCUMENT_CHUNK_OVERLAP}|{current_model_key()}".encode()
+    )
+    return digest.hexdigest()
+
+
+def ingest_file(
+    path: str,
+    doc_key: Optional[str] = None,
+    source: Optional[str] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    force: bool = False,
+    keep_text: bool = False,
+    user_id: Optional[int] = None,
+) -> IngestResult:
+    """
+    Index one document file
+
+    Args:
+        path: File to index
+        doc_key: Key of the document in the index, the file stem by default
+            (the UUID the upload endpoint names files with)
+        source: Name shown as the source of retrieved chunks
+        on_progress: Called after every embedded batch with
+            {"status", "chunks", "progress"}
+        force: Re-index even if nothing changed
+        keep_text: Return the extracted text in the result
+        user_id: Owner recorded when the document is indexed. An unchanged
+            document is not indexed again for another owner, the document
+            catalog tracks everyone who uploaded it.
+
+    Raises:
+        UnsupportedDocument: the file type cannot be extracted
+        UnsupportedVectorStore: VECTOR_STORE_TYPE has no document index
+        DocumentBusy: another process is indexing the document
+    """
+    doc_key = doc_key or Path(path).stem
+    with _ingest_lock(doc_key):
+        return _ingest_file(path, doc_key, source, on_progress, force, keep_text, user_id)
+
+
+def _ingest_file(
+    path: str,
+    doc_key: str,
+    source: Optional[str],
+    on_progress: Optional[ProgressCallback],
+    force: bool,
+    keep_text: bool,
+    user_id: Optional[int],
+) -> IngestResult:
+    index = get_document_index()
+    fingerprint = file_fingerprint(path)
+
+    existing = index.get_document(doc_key)
+    if (
+        not force
+        and existing
+        and existing["status"] == STATUS_READY
+        and existing["fingerprint"] == fingerprint
+    ):
+        result = IngestResult(doc_key, "unchanged", existing["chunk_count"], fingerprint)
+        if keep_text:
+            result.content = extract_text(path)
+            result.chars = len(result.content)
+        return result
+
+    index.begin(doc_key, source or Path(path).name, fingerprint, user_id=user_id)
+    try:
+        embeddings = get_document_embeddings()
+        batch_size = max(settings.DOCUMENT_EMBED_BATCH_SIZE, 1)
+
+        progress = 0.0
+        chars = 0
+        text_parts: List[str] = []
+
+        def segments():
+            nonlocal progress, chars
+            for text, fraction in iter_text(path):
+                progress = fraction
+                chars += len(text)
+                if keep_text:
+                    text_parts.append(text)
+                yield text
+
+        ids: List[int] = []
+        vectors: List[np.ndarray] = []
+        batch: List[str] = []
+
+        def flush():
+            ids.extend(index.add_chunks(doc_key, len(ids), batch))
+            vectors.append(np.asarray(embeddings.embed_documents(batch), dtype=np.float32))
+            batch.clear()
+            if on_progress:
+                on_progress({"status": "indexing", "chunks": len(ids), "progress": round(progress, 4)})
+
+        for chunk in iter_chunks(segments()):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        index.finish(doc_key, ids, np.concatenate(vectors) if vectors else np.empty((0, 0), np.float32))
+    except Exception as e:
+        index.fail(doc_key, str(e))
+        raise
+
+    if on_progress:
+        on_progress({"status": "indexed", "chunks": len(ids), "progress": 1.0})
+    logger.info(f"Indexed document {doc_key}: {len(ids)} chunks from {chars} characters")
+    return IngestResult(
+        doc_key,
+        "indexed",
+        len(ids),
+        fingerprint,
+        chars=chars,
+        content="".join(text_parts) if keep_text else None,
+    )
+
+
+def ingest_document(
+    document_id: int,
+    on_progress: Optional[ProgressCallback] = None,
+    force: bool = False,
+) -> IngestResult:
+    """
+    Index a Document row and fill its content, chunk_count and is_processed
+
+    Progress is committed to the row after every embedded batch.
+    """
+    from sqlalchemy.orm.attributes import flag_modified
+    from app.core.database import SessionLocal
+    from app.models.database import Document
+
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document is None:
+            raise ValueError(f"Document {document_id} not found")
+
+        def set_ingest(**values):
+            metadata = dict(document.doc_metadata or {})
+            metadata["ingest"] = {**metadata.get("ingest", {}), **values}
+            document.doc_metadata = metadata
+            flag_modified(document, "doc_metadata")
+
+        def progress(update: dict):
+            document.chunk_count = update["chunks"]
+            set_ingest(status=update["status"], progress=update["progress"])
+            db.commit()
+            if on_progress:
+                on_progress(update)
+
+        set_ingest(status="indexing", progress=0.0, error=None)
+        document.is_processed = 0
+        db.commit()
+
+        try:
+            result = ingest_file(
+                document.file_path,
+                source=document.original_filename,
+                on_progress=progress,
+                force=force,
+                keep_text=not document.content or force,
+                user_id=document.user_id,
+            )
+        except Exception as e:
+            db.rollback()
+            set_ingest(status="failed", error=str(e))
+            db.commit()
+            raise
+
+        if result.content is not None:
+            document.content = result.content
+        document.chunk_count = result.chunk_count
+        document.is_processed = 1
+        set_ingest(
+            status="indexed",
+            progress=1.0,
+            doc_key=result.doc_key,
+            fingerprint=result.fingerprint,
+            vector_store=settings.VECTOR_STORE_TYPE,
+            embedding=current_model_key(),
+            indexed_at=datetime.utcnow().isoformat(),
+        )
+        db.commit()
+        return result
+    finally:
+        db.close()
@@ -0,0 +1,256 @@
+"""Local Document Retriever for gpt-researcher
+
+A LangChain-style vector store over the document index, handed to
+GPTResearcher with report_source="langchain_vectorstore" so local
+research searches the prebuilt index instead of loading and re-embedding
+every file in DOC_PATH.
+
+Retrieval runs BM25 over the chunk terms (see lexical.py) in parallel
+with the query embedding and vector search, then merges both rankings
+by reciprocal rank fusion: a chunk scores sum(1 / (DOCUMENT_RRF_K + rank))
+over the rankings it appears in, so exact identifiers found only by BM25
+and paraphrases found only by the vectors both make it to the top.
+"""
+
+import asyncio
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from langchain_core.documents import Document
+except ImportError:  # only needed once handed to gpt-researcher
+    from dataclasses import dataclass, field
+
+    @dataclass
+    class Document:
+        page_content: str
+        metadata: dict = field(default_factory=dict)
+
+from app.core.config import settings
+from app.core.documents.pipeline import get_document_embeddings, get_document_index
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+# Lexical searches of synchronous retrievals, run while the query is embedded
+_lexical_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="document-bm25")
+
+Hits = List[Tuple[dict, float]]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Hits], k: int, rrf_k: int = settings.DOCUMENT_RRF_K) -> Hits:
+    """Merge rankings of chunks into the top k by reciprocal rank fusion"""
+    scores = {}
+    chunks = {}
+    for hits in rankings:
+        for rank, (chunk, _) in enumerate(hits, start=1):
+            scores[chunk["id"]] = scores.get(chunk["id"], 0.0) + 1.0 / (rrf_k + rank)
+            chunks.setdefault(chunk["id"], chunk)
+    return [(chunks[i], scores[i]) for i in heapq.nlargest(k, scores, key=scores.get)]
+
+
+def _retrieval_plan(mode: Optional[str], k: int) -> Tuple[str, int]:
+    mode = mode or settings.DOCUMENT_RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Retrieval mode must be one of {', '.join(RETRIEVAL_MODES)}, not {mode}")
+    return mode, max(k, settings.DOCUMENT_HYBRID_CANDIDATES) if mode == "hybrid" else k
+
+
+def _lexical_hits(index, query: str, k: int, doc_keys, user_id) -> Hits:
+    try:
+        return index.lexical_search(query, k, doc_keys, user_id=user_id)
+    except Exception as e:
+        # Keep answering from the vectors
+        logger.warning(f"Lexical document search failed: {e}")
+        return []
+
+
+def retrieve(
+    query: str,
+    k: int = 4,
+    doc_keys: Optional[Sequence[str]] = None,
+    user_id: Optional[int] = None,
+    mode: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    index=None,
+    embeddings=None,
+) -> Hits:
+    """
+    Best chunks for a query from the document index
+
+    Args:
+        query: Search text
+        k: Number of chunks
+        doc_keys: Only search these documents
+        user_id: Only search documents of this user
+        mode: vector, lexical or hybrid, DOCUMENT_RETRIEVAL_MODE by default
+        ef_search: Search breadth of approximate vector indexes
+
+    Returns:
+        [({"id", "doc_key", "chunk_index", "content", "source"}, score), ...],
+        scores are similarities, BM25 or fusion scores depending on the mode
+    """
+    mode, n = _retrieval_plan(mode, k)
+    index = index or get_document_index()
+    doc_keys = list(doc_keys) if doc_keys is not None else None
+
+    lexical = None
+    if mode != "vector":
+        lexical = _lexical_pool.submit(_lexical_hits, index, query, n, doc_keys, user_id)
+        if mode == "lexical":
+            return lexical.result()
+
+    vector = (embeddings or get_document_embeddings()).embed_query(query)
+    vector_hits = index.search(vector, n, doc_keys, user_id=user_id, ef_search=ef_search)
+    if lexical is None:
+        return vector_hits
+    return reciprocal_rank_fusion([vector_hits, lexical.result()], k)
+
+
+async def aretrieve(
+    query: str,
+    k: int = 4,
+    doc_keys: Optional[Sequence[str]] = None,
+    user_id: Optional[int] = None,
+    mode: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    index=None,
+    embeddings=None,
+) -> Hits:
+    """Async `retrieve`, BM25 runs while the query is being embedded"""
+    mode, n = _retrieval_plan(mode, k)
+    index = index or get_document_index()
+    doc_keys = list(doc_keys) if doc_keys is not None else None
+
+    lexical = None
+    if mode != "vector":
+        lexical = asyncio.ensure_future(asyncio.to_thread(_lexical_hits, index, query, n, doc_keys, user_id))
+        if mode == "lexical":
+            return await lexical
+
+    try:
+        vector = await (embeddings or get_document_embeddings()).aembed_query(query)
+        vector_hits = await asyncio.to_thread(
+            index.search, vector, n, doc_keys, user_id=user_id, ef_search=ef_search
+        )
+    except BaseException:
+        if lexical is not None:
+            lexical.cancel()
+        raise
+    if lexical is None:
+        return vector_hits
+    return reciprocal_rank_fusion([vector_hits, await lexical], k)
+
+
+class DocumentRetriever:
+    """
+    Similarity search restricted to a set of indexed documents
+
+    A `{"document_ids": [...]}` filter passed by gpt-researcher narrows
+    the search further.
+    """
+
+    def __init__(
+        self,
+        document_ids: Optional[Sequence[str]] = None,
+        index=None,
+        embeddings=None,
+        mode: Optional[str] = None,
+    ):
+        self.document_ids = list(document_ids) if document_ids else None
+        self.index = index or get_document_index()
+        self.embeddings = embeddings or get_document_embeddings()
+        self.mode = mode
+
+    def _doc_keys(self, filter: Optional[dict]):
+        keys = self.document_ids
+        if filter and filter.get("document_ids"):
+            requested = list(filter["document_ids"])
+            keys = [k for k in requested if keys is None or k in keys]
+        return keys
+
+    def _documents(self, hits) -> List[Document]:
+        return [
+            Document(
+                page_content=chunk["content"],
+                metadata={
+                    "source": chunk["source"] or chunk["doc_key"],
+                    "title": chunk["source"],
+                    "document_id": chunk["doc_key"],
+                    "chunk_index": chunk["chunk_index"],
+                    "score": score,
+                },
+            )
+            for chunk, score in hits
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        hits = retrieve(
+            query, k, self._doc_keys(filter), mode=self.mode, index=self.index, embeddings=self.embeddings
+        )
+        return self._documents(hits)
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        hits = await aretrieve(
+            query, k, self._doc_keys(filter), mode=self.mode, index=self.index, embeddings=self.embeddings
+        )
+        return self._documents(hits)
+
+    def add_documents(self, documents, **kwargs) -> list:
+        # The index only holds uploaded documents, scraped web pages are not added
+        return []
+
+
+def is_indexed(document_ids: Sequence[str]) -> bool:
+    """
+    Whether research can read the given documents from the index
+
+    False when any of them is not indexed yet (or indexing is unavailable),
+    in which case research falls back to loading DOC_PATH.
+    """
+    try:
+        return get_document_index().is_ready(document_ids)
+    except Exception as e:
+        logger.warning(f"Document index unavailable, loading documents from DOC_PATH: {e}")
+        return False
+
+
+def vector_store_kwargs(document_ids: Sequence[str]) -> dict:
+    """
+    GPTResearcher arguments for researching the given documents from the
+    index, empty unless they are all indexed
+    """
+    if not is_indexed(document_ids):
+        return {}
+    return {
+        "report_source": "langchain_vectorstore",
+        "vector_store": DocumentRetriever(document_ids),
+        "vector_store_filter": {"document_ids": list(document_ids)},
+    }
+
+
+async def add_knowledge_base_context(researcher, query: str, document_ids: Sequence[str], k: int = 10) -> int:
+    """
+    Append the best chunks of the given documents to a researcher's context
+
+    For hybrid researches, whose web part gpt-researcher conducts itself
+    and whose local part comes from the index instead of DOC_PATH.
+
+    Returns:
+        Number of chunks added
+    """
+    documents = await DocumentRetriever(document_ids).asimilarity_search(query, k)
+    context = [
+        f"Source: {d.metadata['source']}\nTitle: {d.metadata['title']}\nContent: {d.page_content}\n"
+        for d in documents
+    ]
+    if not context:
+        return 0
+    if isinstance(researcher.context, list):
+        researcher.context.extend(context)
+    else:
+        researcher.context = "\n".join([researcher.context or "", *context])
+    return len(context)
@@ -1,5 +1,13 @@
 """Research modules"""
 
 from .executor import ResearchExecutor, execute_research_task
+from .streaming import ReportStreamHandler
+from .deep import DeepResearchRunner, ResearchPaused
 
-__all__ = ["ResearchExecutor", "execute_research_task"]
+__all__ = [
+    "ResearchExecutor",
+    "execute_research_task",
+    "ReportStreamHandler",
+    "DeepResearchRunner",
+    "ResearchPaused",
+]
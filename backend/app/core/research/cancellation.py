@@ -0,0 +1,125 @@
+"""Research Cancellation"""
+
+import asyncio
+import contextlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.research.deep import load_research_status
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Running:
+    task: asyncio.Task
+    loop: asyncio.AbstractEventLoop
+    done: threading.Event = field(default_factory=threading.Event)
+
+
+class CancellationRegistry:
+    """
+    Running research tasks by research id
+
+    Cancelling a research cancels its asyncio task, which unwinds the
+    executor: in-flight LLM/HTTP awaits raise CancelledError, the MCP
+    session and any stdio MCP subprocess are closed by their context
+    managers and the pooled MCP lease is returned. Researches running in
+    another process (Celery workers) notice the `cancelled` status through
+    a watcher that polls the database.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = settings.RESEARCH_CANCEL_POLL_INTERVAL,
+        timeout: float = settings.RESEARCH_CANCEL_TIMEOUT,
+        load_status: Callable[[int], Optional[str]] = load_research_status,
+    ):
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.load_status = load_status
+
+        self._running: Dict[int, _Running] = {}
+        self._lock = threading.Lock()
+
+        self.cancelled = 0
+        self.confirmed = 0
+
+    @contextlib.asynccontextmanager
+    async def track(self, research_id: int):
+        """
+        Register the current task as the runner of a research
+        """
+        entry = _Running(asyncio.current_task(), asyncio.get_running_loop())
+        with self._lock:
+            self._running[research_id] = entry
+
+        watcher = asyncio.create_task(self._watch(research_id, entry.task))
+        try:
+            yield
+        finally:
+            watcher.cancel()
+            with self._lock:
+                if self._running.get(research_id) is entry:
+                    del self._running[research_id]
+            entry.done.set()
+
+    async def _watch(self, research_id: int, task: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                status = await asyncio.to_thread(self.load_status, research_id)
+            except Exception as e:
+                logger.debug(f"Cancellation watcher for research {research_id}: {e}")
+                continue
+            if status == "cancelled":
+                logger.info(f"Research {research_id} cancelled, stopping its task")
+                task.cancel()
+                return
+
+    def is_running(self, research_id: int) -> bool:
+        with self._lock:
+            return research_id in self._running
+
+    async def cancel(self, research_id: int, timeout: Optional[float] = None) -> bool:
+        """
+        Cancel a research running in this process and wait for it to stop
+
+        Safe to call from any event loop or thread.
+
+        Returns:
+            True once the task has unwound, False if it is not running here
+            or did not stop within the timeout
+        """
+        with self._lock:
+            entry = self._running.get(research_id)
+        if entry is None:
+            return False
+
+        self.cancelled += 1
+        entry.loop.call_soon_threadsafe(entry.task.cancel)
+
+        stopped = await asyncio.to_thread(entry.done.wait, timeout or self.timeout)
+        if stopped:
+            self.confirmed += 1
+        else:
+            logger.warning(f"Research {research_id} did not stop within {timeout or self.timeout}s")
+        return stopped
+
+    def stats(self) -> dict:
+        """
+        Get running research count and cancellation counters
+        """
+        with self._lock:
+            running = len(self._running)
+        return {
+            "running": running,
+            "cancelled": self.cancelled,
+            "confirmed": self.confirmed,
+        }
+
+
+research_cancellation = CancellationRegistry()
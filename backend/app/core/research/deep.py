@@ -0,0 +1,342 @@
+"""Checkpointed Deep Research"""
+
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from gpt_researcher import GPTResearcher
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TREE_VERSION = 1
+
+# Same budget gpt-researcher's deep research trims its final context to
+MAX_CONTEXT_WORDS = 25000
+
+
+class ResearchPaused(Exception):
+    """Deep research stopped at a node boundary because it was paused"""
+
+
+def persist_research_tree(research_id: int, tree: dict):
+    """
+    Write a research tree checkpoint to the research row
+    """
+    from app.core.database import SessionLocal
+    from app.models.database import Research
+
+    db = SessionLocal()
+    try:
+        db.query(Research).filter(Research.id == research_id).update(
+            {"research_tree": tree}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_research_status(research_id: int) -> Optional[str]:
+    """
+    Read the current status of a research from the database
+    """
+    from app.core.database import SessionLocal
+    from app.models.database import Research
+
+    db = SessionLocal()
+    try:
+        row = db.query(Research.status).filter(Research.id == research_id).first()
+        if row is None:
+            return None
+        status = row[0]
+        return status.value if hasattr(status, "value") else status
+    finally:
+        db.close()
+
+
+def new_research_tree(query: str, breadth: int, depth: int) -> dict:
+    return {
+        "version": TREE_VERSION,
+        "query": query,
+        "breadth": breadth,
+        "depth": depth,
+        "expanded": False,
+        "roots": [],
+        "nodes": {},
+    }
+
+
+def tree_progress(tree: dict) -> Dict[str, int]:
+    """
+    Count finished and known nodes of a research tree
+    """
+    nodes = (tree or {}).get("nodes", {}).values()
+    return {
+        "completed_queries": sum(1 for n in nodes if n["status"] == "done"),
+        "total_queries": len((tree or {}).get("nodes", {})),
+    }
+
+
+def _trim_to_words(parts: List[str], max_words: int) -> List[str]:
+    trimmed, words = [], 0
+    for part in parts:
+        count = len(part.split())
+        if words + count > max_words:
+            break
+        trimmed.append(part)
+        words += count
+    return trimmed
+
+
+class DeepResearchRunner:
+    """
+    Breadth x depth research tree with a checkpoint after every node
+
+    Mirrors gpt-researcher's DeepResearchSkill (it reuses the skill's
+    query generation and result summarisation) but drives the recursion
+    itself, so finished sub-queries are stored in `Research.research_tree`
+    and skipped when a paused or failed research is resumed.
+
+    With `search_batch`, the sub-queries of each fan-out are searched in one
+    batched call up front and every sub-researcher reads the pages found for
+    its query instead of making its own MCP search.
+    """
+
+    def __init__(
+        self,
+        researcher: GPTResearcher,
+        research_id: int,
+        tree: Optional[dict] = None,
+        breadth: int = settings.DEEP_RESEARCH_BREADTH,
+        depth: int = settings.DEEP_RESEARCH_DEPTH,
+        concurrency: int = settings.DEEP_RESEARCH_CONCURRENCY,
+        researcher_kwargs: Optional[dict] = None,
+        on_progress: Optional[Callable[[dict], Awaitable[None]]] = None,
+        checkpoint: Callable[[int, dict], None] = persist_research_tree,
+        load_status: Callable[[int], Optional[str]] = load_research_status,
+        search_batch: Optional[Callable[[List[str]], Awaitable[Dict[str, List[dict]]]]] = None,
+    ):
+        self.researcher = researcher
+        self.skill = researcher.deep_researcher
+        self.research_id = research_id
+        self.researcher_kwargs = researcher_kwargs or {}
+        self.on_progress = on_progress
+        self.checkpoint = checkpoint
+        self.load_status = load_status
+        self.search_batch = search_batch
+
+        if tree and tree.get("version") == TREE_VERSION and tree.get("nodes") is not None:
+            self.tree = tree
+        else:
+            self.tree = new_research_tree(researcher.query, breadth, depth)
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._checkpoint_lock = asyncio.Lock()
+        # Batched search results by query, consumed by the node researching it
+        self._prefetched: Dict[str, List[dict]] = {}
+        self.paused = False
+
+    @property
+    def nodes(self) -> Dict[str, dict]:
+        return self.tree["nodes"]
+
+    async def run(self) -> str:
+        """
+        Research every unfinished node and return the combined context
+
+        Raises:
+            ResearchPaused: the research was paused, finished nodes are kept
+        """
+        tree = self.tree
+        resumed = sum(1 for n in self.nodes.values() if n["status"] == "done")
+        if resumed:
+            logger.info(f"Resuming deep research {self.research_id}: {resumed} nodes already done")
+
+        if not tree["expanded"]:
+            tree["roots"] = await self._add_children(None, tree["query"], tree["breadth"], 1)
+            tree["expanded"] = True
+            await self._save()
+
+        await self._process(tree["roots"])
+
+        if self.paused:
+            raise ResearchPaused(f"Research {self.research_id} paused")
+
+        return self._finalize()
+
+    async def _add_children(self, parent: Optional[dict], query: str, breadth: int, level: int) -> List[str]:
+        queries = await self.skill.generate_search_queries(query, num_queries=breadth)
+        prefix = f"{parent['id']}." if parent else ""
+        ids = []
+        for index, item in enumerate(queries[:breadth], start=1):
+            node_id = f"{prefix}{index}"
+            self.nodes[node_id] = {
+                "id": node_id,
+                "parent": parent["id"] if parent else None,
+                "level": level,
+                "breadth": breadth,
+                "query": item.get("query", ""),
+                "goal": item.get("researchGoal", ""),
+                "status": "pending",
+                "expanded": False,
+                "children": [],
+                "sources": [],
+                "learnings": [],
+                "citations": {},
+                "follow_ups": [],
+                "context": "",
+                "error": None,
+            }
+            ids.append(node_id)
+        return ids
+
+    async def _process(self, node_ids: List[str]):
+        await self._prefetch(node_ids)
+        await asyncio.gather(*(self._process_node(node_id) for node_id in node_ids))
+
+    async def _process_node(self, node_id: str):
+        node = self.nodes[node_id]
+
+        if node["status"] != "done":
+            async with self._semaphore:
+                if self.paused or await self._pause_requested():
+                    self.paused = True
+                    return
+                await self._research_node(node)
+
+        if node["status"] != "done":
+            return
+
+        if (
+            not node["expanded"]
+            and node["level"] < self.tree["depth"]
+            and node["follow_ups"]
+        ):
+            async with self._semaphore:
+                if self.paused:
+                    return
+                next_query = (
+                    f"Previous research goal: {node['goal']}\n"
+                    f"Follow-up questions: {' '.join(node['follow_ups'])}"
+                )
+                node["children"] = await self._add_children(
+                    node, next_query, max(2, node["breadth"] // 2), node["level"] + 1
+                )
+                node["expanded"] = True
+                await self._save()
+
+        if node["children"]:
+            await self._process(node["children"])
+
+    async def _prefetch(self, node_ids: List[str]):
+        """
+        Search the queries of all unfinished nodes in one batched call
+        """
+        if not self.search_batch or self.paused:
+            return
+        queries = [self.nodes[i]["query"] for i in node_ids if self.nodes[i]["status"] != "done"]
+        if len(queries) < 2:
+            return
+        try:
+            self._prefetched.update(await self.search_batch(queries))
+        except Exception as e:
+            # Sub-researchers fall back to searching on their own
+            logger.warning(f"Batched search for research {self.research_id} failed: {e}")
+
+    def _node_researcher_kwargs(self, node: dict) -> dict:
+        kwargs = dict(self.researcher_kwargs)
+        results = self._prefetched.pop(node["query"], None)
+        if results:
+            kwargs.pop("mcp_configs", None)
+            kwargs.pop("mcp_strategy", None)
+            kwargs["source_urls"] = [r["href"] for r in results]
+            kwargs["complement_source_urls"] = False
+        return kwargs
+
+    async def _research_node(self, node: dict):
+        node["status"] = "running"
+        try:
+            sub_researcher = GPTResearcher(
+                query=node["query"],
+                report_type="research_report",
+                report_source="web",
+                **self._node_researcher_kwargs(node)
+            )
+            context = await sub_researcher.conduct_research()
+            if isinstance(context, list):
+                context = "\n".join(str(c) for c in context)
+            context = context or ""
+
+            results = await self.skill.process_research_results(query=node["query"], context=context)
+
+            node.update({
+                "status": "done",
+                "context": context,
+                "learnings": results.get("learnings", []),
+                "citations": results.get("citations", {}),
+                "follow_ups": results.get("followUpQuestions", []),
+                "sources": [
+                    {"url": s.get("url"), "title": s.get("title")}
+                    for s in (sub_researcher.get_research_sources() or [])
+                    if isinstance(s, dict) and s.get("url")
+                ],
+                "error": None,
+            })
+        except Exception as e:
+            logger.error(f"Deep research node {node['id']} failed: {e}")
+            node.update({"status": "failed", "error": str(e)})
+
+        await self._save()
+        await self._report_progress(node)
+
+    async def _pause_requested(self) -> bool:
+        status = await asyncio.to_thread(self.load_status, self.research_id)
+        return status == "paused"
+
+    async def _save(self):
+        # Snapshot under the lock so concurrent nodes cannot mutate it mid-write
+        async with self._checkpoint_lock:
+            snapshot = json.loads(json.dumps(self.tree))
+            try:
+                await asyncio.to_thread(self.checkpoint, self.research_id, snapshot)
+            except Exception as e:
+                logger.warning(f"Failed to checkpoint research tree {self.research_id}: {e}")
+
+    async def _report_progress(self, node: dict):
+        if not self.on_progress:
+            return
+        progress = tree_progress(self.tree)
+        await self.on_progress({
+            "current_depth": node["level"],
+            "total_depth": self.tree["depth"],
+            "current_breadth": node["breadth"],
+            "total_breadth": self.tree["breadth"],
+            "current_query": node["query"],
+            **progress,
+        })
+
+    def _finalize(self) -> str:
+        """
+        Combine node results into the researcher's context, like DeepResearchSkill.run
+        """
+        done = [n for n in self.nodes.values() if n["status"] == "done"]
+
+        parts = []
+        for node in done:
+            for learning in node["learnings"]:
+                citation = node["citations"].get(learning, "")
+                parts.append(f"{learning} [Source: {citation}]" if citation else learning)
+        parts.extend(n["context"] for n in done if n["context"])
+
+        sources, seen = [], set()
+        for node in done:
+            for source in node["sources"]:
+                if source["url"] not in seen:
+                    seen.add(source["url"])
+                    sources.append(source)
+
+        self.researcher.context = "\n".join(_trim_to_words(parts, MAX_CONTEXT_WORDS))
+        self.researcher.visited_urls = seen
+        self.researcher.research_sources = sources
+        return self.researcher.context
@@ -1,18 +1,43 @@
 """Research Execution Core"""
 
 import asyncio
+import contextlib
+import functools
 import json
+import sys
 from typing import Optional, Callable, Awaitable
 from datetime import datetime, timedelta
 import logging
 
 from gpt_researcher import GPTResearcher
+from sqlalchemy.orm.attributes import flag_modified
 from app.core.config import settings
 from app.core.websocket.manager import WebSocketManager
+from app.core.research.streaming import ReportStreamHandler
+from app.core.research.deep import DeepResearchRunner, ResearchPaused
+from app.core.research.cancellation import research_cancellation
+from app.core.research.progress import progress_writer
 from app.models.database import Research
+from app.services.research_cache import research_cache, cache_key_for_research
+from app.services.research_estimator import research_estimator
+from app.services.mcp_pool import mcp_server_pool, MCPPoolExhausted
+from app.services import mcp_search
+from app.services.page_store import install_scraper_hook
+from app.services.embedding_cache import install_embedding_hook
+
+try:
+    from celery.exceptions import SoftTimeLimitExceeded
+except ImportError:  # only raised inside Celery workers
+    class SoftTimeLimitExceeded(Exception):
+        pass
 
 logger = logging.getLogger(__name__)
 
+# gpt-researcher's scraper consults the shared page store before fetching,
+# its embeddings only send chunks missing from the embedding cache
+install_scraper_hook()
+install_embedding_hook()
+
 
 class ResearchExecutor:
     """
@@ -25,7 +50,9 @@ class ResearchExecutor:
     async def execute_research(
         self,
         research: Research,
-        on_progress: Optional[Callable[[dict], Awaitable[None]]] = None
+        on_progress: Optional[Callable[[dict], Awaitable[None]]] = None,
+        bypass_cache: bool = False,
+        refresh_cache: bool = False
     ) -> dict:
         """
         Execute a research task
@@ -33,23 +60,71 @@ class ResearchExecutor:
         Args:
             research: Research database model
             on_progress: Optional callback for progress updates
+            bypass_cache: Neither read nor write the result cache
+            refresh_cache: Ignore a cached result and overwrite it
 
         Returns:
             dict with research results
         """
         logger.info(f"Starting research {research.id}: {research.query}")
 
-        # Configure gpt-researcher
-        mcp_configs = []
+        # Serve an identical, recently completed research from cache
+        cache_key = cache_key_for_research(research)
+        cached = research_cache.lookup(cache_key, bypass=bypass_cache, refresh=refresh_cache)
+        if cached:
+            logger.info(f"Research {research.id} served from cache")
+            apply_cached_result(research, cached)
+            await self.websocket_manager.broadcast_completed(research.id, research.report)
+            return {
+                "report": research.report,
+                "sources": research.sources,
+                "context": research.context,
+                "cost": research.cost,
+                "cached": True
+            }
+
+        # Lease a warm MCP search server for the duration of the research
+        async with contextlib.AsyncExitStack() as stack:
+            mcp_configs = [await self._lease_mcp_config(stack)]
+            return await self._run_researcher(
+                research, mcp_configs, cache_key, on_progress, bypass_cache
+            )
+
+    async def _lease_mcp_config(self, stack: contextlib.AsyncExitStack) -> dict:
+        """
+        Get the MCP search server config for one research
 
+        Prefers a pooled long-lived server and falls back to spawning a
+        stdio server when the pool is disabled or exhausted.
+        """
         # TODO: Load MCP configs from user settings
-        # For now, use the reference implementation
-        mcp_configs.append({
-            "name": "searxng-search",
-            "command": "python",
-            "args": ["reference/web_search_mcp.py"],
-            "env": {"SEARXNG_URL": "http://127.0.0.1:8888"}
-        })
+        if settings.MCP_POOL_ENABLED:
+            try:
+                server = await stack.enter_async_context(mcp_server_pool.lease())
+                return server.mcp_config(mcp_server_pool.name)
+            except MCPPoolExhausted as e:
+                logger.warning(f"MCP server pool unavailable, spawning stdio server: {e}")
+
+        return {
+            "name": mcp_server_pool.name,
+            "command": sys.executable,
+            "args": [settings.MCP_SERVER_SCRIPT],
+            "env": {"SEARXNG_URL": settings.SEARXNG_URL}
+        }
+
+    async def _run_researcher(
+        self,
+        research: Research,
+        mcp_configs: list,
+        cache_key: str,
+        on_progress: Optional[Callable[[dict], Awaitable[None]]],
+        bypass_cache: bool
+    ) -> dict:
+        """
+        Run gpt-researcher and store the results on the research
+        """
+        # Report tokens and logs are streamed through this handler
+        stream = ReportStreamHandler(research.id, self.websocket_manager)
 
         # Create researcher instance
         researcher = GPTResearcher(
@@ -60,6 +135,7 @@ class ResearchExecutor:
             mcp_configs=mcp_configs,
             mcp_strategy="deep" if research.report_type == "deep" else "auto",
             max_subtopics=research.max_subtopics,
+            websocket=stream,
             verbose=True
         )
 
@@ -70,16 +146,26 @@ class ResearchExecutor:
             """
             logger.debug(f"Progress: {progress_data}")
 
-            # Update research in database
+            stage_changed = "stage" in progress_data or (
+                "current_depth" in progress_data
+                and progress_data["current_depth"] != research.current_depth
+            )
+
+            # Keep the ORM object current for the final commit
             if "current_depth" in progress_data:
                 research.current_depth = progress_data.get("current_depth", 0)
             if "current_breadth" in progress_data:
                 research.current_breadth = progress_data.get("current_breadth", 0)
             if "completed_queries" in progress_data:
                 research.completed_queries = progress_data.get("completed_queries", 0)
+            if "total_queries" in progress_data:
+                research.total_queries = progress_data.get("total_queries", 0)
             if "cost" in progress_data:
                 research.cost = progress_data.get("cost", 0.0)
 
+            # Persist live progress, coalesced and batched with other researches
+            progress_writer.update(research.id, progress_data, stage_changed=stage_changed)
+
             # Broadcast via WebSocket
             await self.websocket_manager.broadcast_progress(
                 research.id,
@@ -90,6 +176,35 @@ class ResearchExecutor:
             if on_progress:
                 await on_progress(progress_data)
 
+        # Standard and multi-agent researches report progress through their logs;
+        # deep research reports per node instead, its sub-researchers share the stream
+        if research.report_type != "deep":
+            async def handle_log_progress(progress_data):
+                await handle_progress({**progress_data, "cost": researcher.get_costs()})
+
+            stream.on_progress = handle_log_progress
+
+        # Deep research checkpoints its tree so it can be resumed
+        runner = None
+        if research.report_type == "deep" and researcher.deep_researcher:
+            runner = DeepResearchRunner(
+                researcher,
+                research.id,
+                tree=research.research_tree,
+                researcher_kwargs={
+                    "tone": research.tone,
+                    "mcp_configs": mcp_configs,
+                    "mcp_strategy": "deep",
+                    "websocket": stream,
+                    "verbose": True
+                },
+                on_progress=handle_progress,
+                search_batch=(
+                    functools.partial(mcp_search.search_batch, mcp_configs[0])
+                    if settings.DEEP_RESEARCH_BATCH_SEARCH else None
+                )
+            )
+
         # Execute research
         try:
             # Broadcast started
@@ -99,7 +214,18 @@ class ResearchExecutor:
             )
 
             # Conduct research
-            await researcher.conduct_research()
+            if runner:
+                try:
+                    await runner.run()
+                finally:
+                    # The tree may be the loaded JSON mutated in place
+                    research.research_tree = runner.tree
+                    flag_modified(research, "research_tree")
+            else:
+                await researcher.conduct_research()
+
+            # Research -> writing is a stage transition, flushed right away
+            await handle_progress({"stage": "writing", "cost": researcher.get_costs()})
 
             # Generate report
             report = await researcher.write_report()
@@ -115,6 +241,15 @@ class ResearchExecutor:
             research.status = "completed"
             research.completed_at = datetime.utcnow()
 
+            if not bypass_cache:
+                research_cache.set(cache_key, {
+                    "research_id": research.id,
+                    "report": report,
+                    "sources": sources,
+                    "context": context,
+                    "cost": research.cost
+                })
+
             # Broadcast completion
             await self.websocket_manager.broadcast_completed(
                 research.id,
@@ -127,13 +262,46 @@ class ResearchExecutor:
                 "report": report,
                 "sources": sources,
                 "context": context,
-                "cost": research.cost
+                "cost": research.cost,
+                "cached": False
+            }
+
+        except asyncio.CancelledError:
+            logger.info(f"Research {research.id} cancelled")
+            research.status = "cancelled"
+
+            # Keep whatever part of the report was already written
+            if stream.partial_report and not research.report:
+                research.report = stream.partial_report
+
+            raise
+
+        except ResearchPaused:
+            logger.info(f"Research {research.id} paused")
+            research.status = "paused"
+
+            await self.websocket_manager.broadcast_progress(research.id, {
+                "status": "paused",
+                "message": "Research paused, finished sub-queries are kept"
+            })
+
+            return {
+                "report": None,
+                "sources": None,
+                "context": None,
+                "cost": research.cost,
+                "cached": False,
+                "paused": True
             }
 
         except Exception as e:
             logger.error(f"Research {research.id} failed: {e}")
             research.status = "failed"
 
+            # Keep whatever part of the report was already written
+            if stream.partial_report and not research.report:
+                research.report = stream.partial_report
+
             # Broadcast error
             await self.websocket_manager.broadcast_to_research(
                 research.id,
@@ -146,6 +314,10 @@ class ResearchExecutor:
 
             raise
 
+        finally:
+            # The caller commits the final values next
+            await asyncio.to_thread(progress_writer.finish, research.id)
+
     async def estimate_cost(self, query: str, report_type: str) -> dict:
         """
         Estimate research cost and time
@@ -157,39 +329,42 @@ class ResearchExecutor:
         Returns:
             dict with cost, time, and query estimates
         """
-        # Base estimates
-        base_cost = 0.10
-        base_time = 2  # minutes
-        base_queries = 10
-
-        # Adjust based on report type
-        if report_type == "deep":
-            base_cost = 0.40
-            base_time = 8
-            base_queries = 75
-        elif report_type == "multi_agent":
-            base_cost = 0.60
-            base_time = 15
-            base_queries = 100
-
-        # Adjust based on query complexity (simple heuristic)
-        query_length = len(query)
-        if query_length > 200:
-            base_cost *= 1.5
-            base_time *= 1.3
-            base_queries *= 1.2
+        estimate = research_estimator.estimate(query, report_type)
 
         return {
-            "estimated_cost": round(base_cost, 2),
-            "estimated_time_minutes": int(base_time),
-            "estimated_queries": int(base_queries)
+            "estimated_cost": round(estimate["cost"], 2),
+            "estimated_time_minutes": int(round(estimate["minutes"])),
+            "estimated_queries": int(round(estimate["queries"])),
+            "cost_interval": estimate["cost_interval"],
+            "time_interval_minutes": estimate["minutes_interval"],
+            "queries_interval": estimate["queries_interval"],
+            "basis": estimate["basis"],
+            "samples": estimate["samples"]
         }
 
 
+def apply_cached_result(research: Research, cached: dict):
+    """
+    Fill a Research row from a cached result
+
+    No LLM calls were made, so the research costs nothing.
+    """
+    now = datetime.utcnow()
+    research.report = cached.get("report")
+    research.sources = cached.get("sources")
+    research.context = cached.get("context")
+    research.cost = 0.0
+    research.status = "completed"
+    research.started_at = research.started_at or now
+    research.completed_at = now
+
+
 async def execute_research_task(
     research_id: int,
     db_session,
-    websocket_manager: WebSocketManager
+    websocket_manager: WebSocketManager,
+    bypass_cache: bool = False,
+    refresh_cache: bool = False
 ):
     """
     Celery task wrapper for executing research
@@ -197,6 +372,7 @@ async def execute_research_task(
     This function is designed to be called from a Celery task
     """
     from app.models.database import Research
+    from sqlalchemy import func
     from sqlalchemy.orm import sessionmaker
 
     # Create new session for this task
@@ -204,25 +380,61 @@ async def execute_research_task(
     db = Session()
 
     try:
-        # Get research from database
-        research = db.query(Research).filter(Research.id == research_id).first()
+        # Claim the research: only a pending one starts, and only once. A
+        # research paused and resumed while queued on Celery has two queued
+        # messages, the second to arrive finds it running (or finished).
+        # A resumed research keeps its original start time.
+        claimed = db.query(Research).filter(
+            Research.id == research_id,
+            Research.status == "pending"
+        ).update(
+            {
+                Research.status: "running",
+                Research.started_at: func.coalesce(Research.started_at, datetime.utcnow())
+            },
+            synchronize_session=False
+        )
+        db.commit()
 
+        research = db.query(Research).filter(Research.id == research_id).first()
         if not research:
             logger.error(f"Research {research_id} not found")
             return
+        if not claimed:
+            # Paused, cancelled or already taken by another dispatch
+            logger.info(f"Research {research_id} is {research.status}, not starting")
+            return
 
-        # Update status
-        research.status = "running"
-        research.started_at = datetime.utcnow()
-        db.commit()
-
-        # Execute research
+        # Execute research (cancellable through research_cancellation)
         executor = ResearchExecutor(websocket_manager)
-        await executor.execute_research(research)
+        async with research_cancellation.track(research_id):
+            await executor.execute_research(
+                research,
+                bypass_cache=bypass_cache,
+                refresh_cache=refresh_cache
+            )
 
         # Commit final changes
         db.commit()
 
+    except asyncio.CancelledError:
+        # Record the cancellation, then let it propagate so the scheduler
+        # (or whoever awaits the task) sees a cancelled task
+        logger.info(f"Research task {research_id} cancelled")
+        research.status = "cancelled"
+        db.commit()
+        await websocket_manager.broadcast_progress(research_id, {
+            "status": "cancelled",
+            "message": "Research cancelled"
+        })
+        raise
+
+    except SoftTimeLimitExceeded:
+        # Left to the Celery task, which reports the timeout
+        research.status = "failed"
+        db.commit()
+        raise
+
     except Exception as e:
         logger.error(f"Research task failed: {e}")
         research.status = "failed"
@@ -0,0 +1,158 @@
+"""Research Progress Persistence"""
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import case, update
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Research columns a progress event may update
+PROGRESS_FIELDS = (
+    "current_depth",
+    "current_breadth",
+    "completed_queries",
+    "total_queries",
+    "cost",
+)
+
+
+def write_progress_batch(batch: Dict[int, dict]):
+    """
+    Write progress for several researches with a single UPDATE
+
+    Every column is set through a CASE on the research id, so researches
+    that did not report a column keep their current value.
+    """
+    from app.core.database import engine
+    from app.models.database import Research
+
+    table = Research.__table__
+    values = {}
+    for name in PROGRESS_FIELDS:
+        whens = {rid: fields[name] for rid, fields in batch.items() if name in fields}
+        if whens:
+            values[name] = case(whens, value=table.c.id, else_=table.c[name])
+    if not values:
+        return
+
+    statement = update(table).where(table.c.id.in_(list(batch))).values(**values)
+    with engine.begin() as conn:
+        conn.execute(statement)
+
+
+class ProgressWriter:
+    """
+    Coalesces research progress and flushes it in the background
+
+    Progress events only overwrite the latest pending values of their
+    research. A writer thread flushes everything pending at most every
+    `interval` seconds, or straight away on a stage transition, so pollers
+    see live progress while database writes stay bounded regardless of
+    how chatty gpt-researcher is.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.RESEARCH_PROGRESS_FLUSH_INTERVAL,
+        write_batch=write_progress_batch,
+    ):
+        self.interval = interval
+        self.write_batch = write_batch
+
+        self._pending: Dict[int, dict] = {}
+        self._lock = threading.Lock()
+        # Held while a batch is written, so `finish` can wait it out
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.updates = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+
+    def start(self):
+        """
+        Start the writer thread
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="research-progress-writer", daemon=True
+                )
+                self._thread.start()
+
+    def update(self, research_id: int, fields: dict, stage_changed: bool = False):
+        """
+        Record the latest progress of a research
+
+        Args:
+            research_id: Research to update
+            fields: Progress columns, unknown keys are ignored
+            stage_changed: Flush now instead of waiting for the interval
+        """
+        fields = {k: v for k, v in fields.items() if k in PROGRESS_FIELDS and v is not None}
+        if not fields:
+            return
+
+        self.start()
+        with self._lock:
+            self._pending.setdefault(research_id, {}).update(fields)
+            self.updates += 1
+        if stage_changed:
+            self._wakeup.set()
+
+    def finish(self, research_id: int):
+        """
+        Drop pending progress of a research that is about to be saved
+
+        Waits for an in-flight batch so a stale write cannot land after
+        the research's final commit.
+        """
+        with self._write_lock:
+            with self._lock:
+                self._pending.pop(research_id, None)
+
+    def flush(self):
+        """
+        Write all pending progress now
+        """
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+            try:
+                self.write_batch(batch)
+                self.flushes += 1
+                self.rows_written += len(batch)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Failed to write progress for {len(batch)} researches: {e}")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stats(self) -> dict:
+        """
+        Get coalescing and write counters
+        """
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+        }
+
+
+progress_writer = ProgressWriter()
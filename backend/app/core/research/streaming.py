@@ -0,0 +1,137 @@
+"""Report Streaming"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+from app.core.websocket.manager import WebSocketManager
+
+logger = logging.getLogger(__name__)
+
+# gpt-researcher log that lists the sub-queries (in its metadata)
+SUBQUERIES_LOG = "subqueries"
+# Logs that end the research of one sub-query
+SUBQUERY_DONE_LOGS = ("subquery_context_window", "subquery_context_not_found")
+
+
+def persist_partial_report(research_id: int, report: str):
+    """
+    Write partially generated report text to the research row
+
+    Uses its own short-lived session so it never flushes the executor's
+    pending ORM changes.
+    """
+    from app.core.database import SessionLocal
+    from app.models.database import Research
+
+    db = SessionLocal()
+    try:
+        db.query(Research).filter(Research.id == research_id).update(
+            {"report": report}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class ReportStreamHandler:
+    """
+    Websocket stand-in handed to GPTResearcher
+
+    gpt-researcher streams report tokens as {"type": "report", "output": ...}
+    and logs as {"type": "logs", ...} through `send_json`. Report chunks are
+    re-broadcast as `research.report_chunk` events and the text written so
+    far is flushed to the database every few seconds. With `on_progress`,
+    sub-query logs are also turned into completed/total query counts.
+    """
+
+    def __init__(
+        self,
+        research_id: int,
+        websocket_manager: WebSocketManager,
+        persist: Optional[Callable[[int, str], None]] = persist_partial_report,
+        flush_interval: float = settings.REPORT_STREAM_FLUSH_INTERVAL,
+        flush_chars: int = settings.REPORT_STREAM_FLUSH_CHARS,
+        on_progress: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ):
+        self.research_id = research_id
+        self.websocket_manager = websocket_manager
+        self.persist = persist
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.on_progress = on_progress
+
+        self._parts: List[str] = []
+        self._length = 0
+        self._flushed_length = 0
+        self._last_flush = time.monotonic()
+        self._total_queries = 0
+        self._completed_queries = 0
+
+    @property
+    def partial_report(self) -> str:
+        return "".join(self._parts)
+
+    async def send_json(self, data: dict):
+        """
+        Receive a message from gpt-researcher
+        """
+        message_type = data.get("type")
+
+        if message_type == "report":
+            await self._on_report_chunk(data.get("output") or "")
+        elif message_type == "logs":
+            await self.websocket_manager.broadcast_stage(
+                self.research_id,
+                data.get("content", ""),
+                data.get("output", "")
+            )
+            if self.on_progress:
+                progress = self._progress_from_log(data)
+                if progress:
+                    await self.on_progress(progress)
+
+    def _progress_from_log(self, data: dict) -> Optional[dict]:
+        content = data.get("content")
+        if content == SUBQUERIES_LOG and isinstance(data.get("metadata"), list):
+            # Detailed and multi-agent reports plan sub-queries once per subtopic
+            self._total_queries += len(data["metadata"])
+        elif content in SUBQUERY_DONE_LOGS:
+            self._completed_queries += 1
+            self._total_queries = max(self._total_queries, self._completed_queries)
+        else:
+            return None
+        return {"completed_queries": self._completed_queries, "total_queries": self._total_queries}
+
+    async def _on_report_chunk(self, chunk: str):
+        if not chunk:
+            return
+
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+
+        await self.websocket_manager.broadcast_report_chunk(self.research_id, chunk, offset)
+
+        if (
+            self._length - self._flushed_length >= self.flush_chars
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            await self.flush()
+
+    async def flush(self):
+        """
+        Persist the report text received so far
+        """
+        if self.persist is None or self._length == self._flushed_length:
+            return
+
+        report = self.partial_report
+        self._flushed_length = len(report)
+        self._last_flush = time.monotonic()
+        try:
+            await asyncio.to_thread(self.persist, self.research_id, report)
+        except Exception as e:
+            logger.warning(f"Failed to persist partial report for research {self.research_id}: {e}")
@@ -111,6 +111,21 @@ class WebSocketManager:
         }
         await self.broadcast_to_research(research_id, message)
 
+    async def broadcast_report_chunk(self, research_id: int, chunk: str, offset: int):
+        """
+        Broadcast a piece of the report as it is being written
+
+        `offset` is the chunk's character position in the full report, so
+        late joiners can detect gaps.
+        """
+        message = {
+            "event": "research.report_chunk",
+            "research_id": research_id,
+            "chunk": chunk,
+            "offset": offset
+        }
+        await self.broadcast_to_research(research_id, message)
+
     async def broadcast_stage(self, research_id: int, stage: str, message: str):
         """
         Broadcast research stage change
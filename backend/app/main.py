@@ -9,6 +9,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List
 import json
 import os
+import time
 from dotenv import load_dotenv
 
 # 加载 .env 文件 - 指定 backend 目录
@@ -23,6 +24,16 @@ os.environ['DOC_PATH'] = str(doc_path)
 print(f"📁 DOC_PATH 设置为: {os.environ['DOC_PATH']}")
 
 from gpt_researcher import GPTResearcher
+from app.services.research_cache import research_cache, build_cache_key
+from app.services.research_estimator import research_estimator, ResearchSample
+from app.services.page_store import page_store, install_scraper_hook
+from app.services.embedding_cache import embedding_cache, install_embedding_hook
+from app.core.documents import vector_store_kwargs, is_indexed, add_knowledge_base_context
+
+# 抓取的网页正文在研究之间共享，常见来源不再重复抓取和解析
+install_scraper_hook()
+# 已计算过的文本块向量持久缓存，只有未命中的文本块才调用 embedding 接口
+install_embedding_hook()
 
 # CORS 配置 - 支持 JSON 格式和逗号分隔格式
 def parse_cors_origins():
@@ -56,6 +67,12 @@ class ResearchRequest(BaseModel):
     report_format: str = Field(default="markdown", description="报告格式")
     tone: str = Field(default="objective", description="报告语气")
     language: str = Field(default="chinese", description="报告语言")
+    report_source: Optional[str] = Field(default="web", description="研究来源: web, static, local, hybrid")
+    source_urls: Optional[List[str]] = Field(default=None, description="指定研究的URL列表")
+    complement_source_urls: bool = Field(default=False, description="是否在指定URL外进行全网补充搜索")
+    document_ids: Optional[List[str]] = Field(default=None, description="本地文档ID列表")
+    bypass_cache: bool = Field(default=False, description="跳过结果缓存（不读取也不写入）")
+    refresh_cache: bool = Field(default=False, description="忽略已缓存结果，重新研究并覆盖缓存")
 
 
 class ResearchResponse(BaseModel):
@@ -63,12 +80,19 @@ class ResearchResponse(BaseModel):
     sources: List[str]
     costs: float
     images: List[str]
+    cached: bool = False
 
 
 class CostEstimate(BaseModel):
     estimated_cost: float
     estimated_time_minutes: int
     estimated_queries: int
+    # 90% 区间，仅在有足够历史数据时提供
+    cost_interval: Optional[List[float]] = None
+    time_interval_minutes: Optional[List[float]] = None
+    queries_interval: Optional[List[float]] = None
+    basis: str = "default"  # history: 历史数据拟合, history_scaled: 按来源比例换算, default: 内置默认值
+    samples: int = 0
 
 
 # ========== API 端点 ==========
@@ -83,65 +107,44 @@ async def root():
     }
 
 
+def record_research_sample(request_query: str, report_type: str, report_source: Optional[str],
+                           costs: float, started_at: float):
+    """记录一次完成的研究，供成本/耗时估算重新拟合"""
+    research_estimator.observe(ResearchSample(
+        report_type=report_type,
+        report_source=report_source or "web",
+        query_length=len(request_query or ""),
+        cost=costs or 0.0,
+        minutes=(time.monotonic() - started_at) / 60,
+    ))
+
+
 @app.post("/estimate", response_model=CostEstimate)
 async def estimate_research(request: ResearchRequest):
     """
     估算研究成本和时间
 
-    基于查询复杂度、报告类型和研究来源提供估算
+    基于已完成研究的历史数据（按报告类型和研究来源分组）拟合估算，
+    历史数据不足时使用内置默认值
     """
-    # 基础估算逻辑
-    base_cost = 0.15
-    base_time = 2  # 分钟
-    base_queries = 10
-
-    # 根据报告类型调整
-    if request.report_type == "deep":
-        base_cost = 0.40
-        base_time = 8
-        base_queries = 75
-    elif request.report_type == "multi_agent":
-        base_cost = 0.80
-        base_time = 20
-        base_queries = 150
-
-    # 根据研究来源调整成本
-    # 指定URL研究成本更低，因为不需要额外的搜索
-    if request.report_source == "static" and request.source_urls:
-        if not request.complement_source_urls:
-            # 仅研究指定URL，成本大幅降低
-            base_cost *= 0.4
-            base_time *= 0.6
-            base_queries = len(request.source_urls) * 2
-        else:
-            # 指定URL + 全网补充，成本适中
-            base_cost *= 0.7
-            base_time *= 0.8
-
-    # ✨ 本地文档研究 - 成本极低
-    elif request.report_source == "local" and request.document_ids:
-        # 仅处理本地文档，无搜索成本
-        base_cost *= 0.2
-        base_time *= 0.5
-        base_queries = 0  # 无需查询
-
-    # ✨ 混合研究 - URL + 本地文档
-    elif request.report_source == "hybrid":
-        if request.source_urls:
-            # 有URL和文档，成本适中
-            base_cost *= 0.5
-            base_time *= 0.7
-            base_queries = len(request.source_urls)
-        else:
-            # 仅文档，同local模式
-            base_cost *= 0.2
-            base_time *= 0.5
-            base_queries = 0
+    estimate = research_estimator.estimate(
+        query=request.query,
+        report_type=request.report_type,
+        report_source=request.report_source,
+        source_urls=request.source_urls,
+        complement_source_urls=request.complement_source_urls,
+        document_ids=request.document_ids,
+    )
 
     return CostEstimate(
-        estimated_cost=round(base_cost, 2),
-        estimated_time_minutes=int(base_time),
-        estimated_queries=int(base_queries)
+        estimated_cost=round(estimate["cost"], 2),
+        estimated_time_minutes=int(round(estimate["minutes"])),
+        estimated_queries=int(round(estimate["queries"])),
+        cost_interval=estimate["cost_interval"],
+        time_interval_minutes=estimate["minutes_interval"],
+        queries_interval=estimate["queries_interval"],
+        basis=estimate["basis"],
+        samples=estimate["samples"]
     )
 
 
@@ -151,7 +154,29 @@ async def create_research(request: ResearchRequest):
     创建并执行研究任务
 
     直接使用 gpt-researcher 官方包执行研究
+    相同查询和参数的研究在缓存有效期内直接返回缓存结果
     """
+    cache_key = build_cache_key(
+        query=request.query,
+        report_type=request.report_type,
+        report_format=request.report_format,
+        tone=request.tone,
+        language=request.language,
+        report_source=request.report_source,
+        source_urls=request.source_urls,
+        complement_source_urls=request.complement_source_urls,
+        document_ids=request.document_ids,
+    )
+    cached = research_cache.lookup(cache_key, bypass=request.bypass_cache, refresh=request.refresh_cache)
+    if cached:
+        return ResearchResponse(
+            report=cached["report"],
+            sources=cached.get("sources") or [],
+            costs=0.0,
+            images=cached.get("images") or [],
+            cached=True
+        )
+
     try:
         # 构建 GPTResearcher 基础参数
         researcher_kwargs = {
@@ -161,6 +186,9 @@ async def create_research(request: ResearchRequest):
             "tone": request.tone,
         }
 
+        # 混合研究的本地部分直接从知识库检索（BM25 + 向量）
+        knowledge_base_ids = None
+
         # 处理指定来源研究
         if request.report_source and request.report_source != "web":
             # 指定URL研究（STATIC 或 HYBRID 模式）
@@ -172,12 +200,22 @@ async def create_research(request: ResearchRequest):
             if request.report_source in ["local", "hybrid"] and request.document_ids:
                 # 设置 report_source 参数
                 researcher_kwargs["report_source"] = request.report_source
+                # 文档都已建好索引时直接检索向量索引，不再每次重新解析 DOC_PATH
+                if request.report_source == "local":
+                    researcher_kwargs.update(vector_store_kwargs(request.document_ids))
+                elif is_indexed(request.document_ids):
+                    # gpt-researcher 只负责网页部分，本地部分检索知识库后并入上下文
+                    researcher_kwargs["report_source"] = "web"
+                    knowledge_base_ids = request.document_ids
 
         # 创建 GPT Researcher 实例
         researcher = GPTResearcher(**researcher_kwargs)
+        started_at = time.monotonic()
 
         # 执行研究
         await researcher.conduct_research()
+        if knowledge_base_ids:
+            await add_knowledge_base_context(researcher, request.query, knowledge_base_ids)
 
         # 生成报告
         report = await researcher.write_report()
@@ -188,6 +226,16 @@ async def create_research(request: ResearchRequest):
         sources = [source.get("url") for source in research_sources if source.get("url")]
         costs = researcher.get_costs()
         images = researcher.get_research_images()
+        record_research_sample(request.query, request.report_type, request.report_source, costs, started_at)
+
+        if not request.bypass_cache:
+            research_cache.set(cache_key, {
+                "report": report,
+                "sources": sources or [],
+                "context": researcher.get_research_context(),
+                "images": images or [],
+                "cost": costs or 0.0
+            })
 
         return ResearchResponse(
             report=report,
@@ -203,6 +251,47 @@ async def create_research(request: ResearchRequest):
         )
 
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    研究结果缓存命中统计
+    """
+    return research_cache.stats()
+
+
+@app.get("/pages/stats")
+async def get_page_store_stats():
+    """
+    网页正文缓存（跨研究共享）的命中与容量统计
+    """
+    return page_store.stats()
+
+
+@app.get("/embeddings/stats")
+async def get_embedding_cache_stats():
+    """
+    向量缓存的命中率、节省的字节数和淘汰统计
+    """
+    return embedding_cache.stats()
+
+
+@app.get("/estimate/stats")
+async def get_estimator_stats():
+    """
+    成本/耗时估算模型的拟合统计
+    """
+    return research_estimator.stats()
+
+
+@app.delete("/cache")
+async def clear_cache():
+    """
+    清空研究结果缓存
+    """
+    research_cache.clear()
+    return {"message": "研究结果缓存已清空"}
+
+
 @app.get("/research/{research_id}")
 async def get_research(research_id: str):
     """
@@ -237,9 +326,12 @@ async def research_websocket(websocket: WebSocket):
         "report_type": "research_report",
         "report_format": "markdown",
         "tone": "objective",
+        "language": "chinese",
         "report_source": "web" | "static",
         "source_urls": ["url1", "url2"],
-        "complement_source_urls": false
+        "complement_source_urls": false,
+        "bypass_cache": false,
+        "refresh_cache": false
     }
 
     服务器推送事件（由 gpt-researcher 自动推送）:
@@ -258,6 +350,7 @@ async def research_websocket(websocket: WebSocket):
         report_type = data.get("report_type", "research_report")
         report_format = data.get("report_format", "markdown")
         tone = data.get("tone", "objective")
+        language = data.get("language", "chinese")
         report_source = data.get("report_source", "web")
         source_urls = data.get("source_urls")
         complement_source_urls = data.get("complement_source_urls", False)
@@ -270,6 +363,36 @@ async def research_websocket(websocket: WebSocket):
             await websocket.close()
             return
 
+        # 命中结果缓存时直接返回
+        bypass_cache = data.get("bypass_cache", False)
+        cache_key = build_cache_key(
+            query=query,
+            report_type=report_type,
+            report_format=report_format,
+            tone=tone,
+            language=language,
+            report_source=report_source,
+            source_urls=source_urls,
+            complement_source_urls=complement_source_urls,
+            document_ids=data.get("document_ids"),
+        )
+        cached = research_cache.lookup(
+            cache_key,
+            bypass=bypass_cache,
+            refresh=data.get("refresh_cache", False)
+        )
+        if cached:
+            await websocket.send_json({
+                "type": "completed",
+                "output": "✅ 研究完成（缓存结果）",
+                "report": cached["report"],
+                "sources": cached.get("sources") or [],
+                "costs": 0.0,
+                "images": cached.get("images") or [],
+                "cached": True
+            })
+            return
+
         # 构建 researcher 参数
         researcher_kwargs = {
             "query": query,
@@ -280,6 +403,8 @@ async def research_websocket(websocket: WebSocket):
             "verbose": True          # ⭐ 启用详细日志
         }
 
+        knowledge_base_ids = None
+
         # 处理指定来源研究
         if report_source and report_source != "web":
             # 指定URL研究
@@ -291,6 +416,11 @@ async def research_websocket(websocket: WebSocket):
             document_ids = data.get("document_ids")
             if report_source in ["local", "hybrid"] and document_ids:
                 researcher_kwargs["report_source"] = report_source
+                if report_source == "local":
+                    researcher_kwargs.update(vector_store_kwargs(document_ids))
+                elif is_indexed(document_ids):
+                    researcher_kwargs["report_source"] = "web"
+                    knowledge_base_ids = document_ids
 
         # 创建 researcher 实例
         researcher = GPTResearcher(**researcher_kwargs)
@@ -303,7 +433,10 @@ async def research_websocket(websocket: WebSocket):
         print(f"🔧 DEBUG: Source URLs: {source_urls}")
 
         # 执行研究 - gpt-researcher 会自动通过 websocket 发送进度更新
+        started_at = time.monotonic()
         await researcher.conduct_research()
+        if knowledge_base_ids:
+            await add_knowledge_base_context(researcher, query, knowledge_base_ids)
 
         # 生成报告
         report = await researcher.write_report()
@@ -315,6 +448,16 @@ async def research_websocket(websocket: WebSocket):
         sources = [source.get("url") for source in research_sources if source.get("url")]
         costs = researcher.get_costs()
         images = researcher.get_research_images()
+        record_research_sample(query, report_type, report_source, costs, started_at)
+
+        if not bypass_cache:
+            research_cache.set(cache_key, {
+                "report": report,
+                "sources": sources or [],
+                "context": researcher.get_research_context(),
+                "images": images or [],
+                "cost": costs or 0.0
+            })
 
         # 发送完成事件
         await websocket.send_json({
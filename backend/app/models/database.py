@@ -1,13 +1,24 @@
 """Database Models"""
 
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Float, DateTime, ForeignKey, JSON, Enum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from datetime import datetime
 import enum
 
+from app.core.config import settings
+
+try:
+    from pgvector.sqlalchemy import Vector
+except ImportError:  # only needed with VECTOR_STORE_TYPE=pgvector
+    Vector = None
+
 Base = declarative_base()
 
+# Tables that need the pgvector extension, created only where it is available
+VECTOR_TABLES = ("document_chunks",)
+
 
 class ResearchStatus(str, enum.Enum):
     """Research Status"""
@@ -116,6 +127,37 @@ class Document(Base):
     user = relationship("User", back_populates="documents")
 
 
+class IndexedDocument(Base):
+    """Indexed Document Model (pgvector document index state)"""
+    __tablename__ = "document_index"
+
+    doc_key = Column(String(64), primary_key=True)  # stored file name without extension
+    user_id = Column(Integer, index=True)  # owner, if uploaded by a known user
+    model = Column(String(255), nullable=False)  # embedding model of the vectors
+    source = Column(String(255))  # original file name
+    fingerprint = Column(String(64))
+    status = Column(String(20), nullable=False)  # indexing, ready, failed
+    chunk_count = Column(Integer, default=0)
+    error = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DocumentChunk(Base):
+    """Document Chunk Model (text and embedding, searched through an HNSW/IVFFlat index)"""
+    __tablename__ = "document_chunks"
+
+    id = Column(BigInteger, primary_key=True)
+    doc_key = Column(
+        String(64), ForeignKey("document_index.doc_key", ondelete="CASCADE"), nullable=False, index=True
+    )
+    chunk_index = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    # NULL until the whole document is embedded
+    embedding = Column(Vector(settings.PGVECTOR_DIMENSIONS) if Vector is not None else Text)
+    # Terms for BM25-style search (app/core/documents/lexical.py), GIN-indexed
+    lexemes = Column(TSVECTOR)
+
+
 class APIKey(Base):
     """API Key Model"""
     __tablename__ = "api_keys"
@@ -62,6 +62,16 @@ class ResearchRequest(BaseModel):
         description="本地文档ID列表（LOCAL/HYBRID模式需要）"
     )
 
+    # 结果缓存控制
+    bypass_cache: bool = Field(
+        default=False,
+        description="跳过结果缓存（不读取也不写入）"
+    )
+    refresh_cache: bool = Field(
+        default=False,
+        description="忽略已缓存结果，重新研究并覆盖缓存"
+    )
+
 
 class ResearchResponse(BaseModel):
     """Research response"""
@@ -84,6 +94,10 @@ class ResearchResponse(BaseModel):
     report_format: str
     sources: Optional[List[Dict]] = None
     cost: float
+    cached: bool = False
+
+    # Scheduling (1-based, only while waiting for a worker)
+    queue_position: Optional[int] = None
 
     # Timestamps
     created_at: datetime
@@ -261,3 +275,10 @@ class CostEstimate(BaseModel):
     estimated_cost: float
     estimated_time_minutes: int
     estimated_queries: int
+
+    # 90% intervals, only when fitted on enough research history
+    cost_interval: Optional[List[float]] = None
+    time_interval_minutes: Optional[List[float]] = None
+    queries_interval: Optional[List[float]] = None
+    basis: str = "default"  # history, history_scaled or default
+    samples: int = 0
@@ -0,0 +1,463 @@
+"""Content-Addressed Document Store
+
+Uploaded documents are stored once per SHA-256 of their content, so the
+same file uploaded again (by the same or another user) is neither
+written, parsed nor embedded a second time: the upload gets the id of
+the stored document, whose chunks and vectors are already indexed.
+
+The document id is derived from the content hash and formatted like the
+UUIDs the upload endpoint named files with before, so files stay at
+`DOC_PATH/<id><ext>` where the index, downloads and gpt-researcher's
+DOC_PATH loader expect them. Every owner holds a reference count on a
+document; deleting releases one reference and the file is only removed
+with the last one. The index keeps a single user_id per document, so
+ownership of shared documents is answered from the references
+(`owned_documents`).
+
+The store is also the document catalog: id lookups hit the primary key
+and listings are keyset-paginated over indexes, so neither scans the
+directory. Files already in DOC_PATH when the catalog is created (or
+copied in by hand, see `import_files`) are registered once.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Owner of uploads without a user
+ANONYMOUS = 0
+
+_COLUMNS = "id, filename, content_hash, size, original_filename, file_type, created_at"
+
+
+def document_id(content_hash: str) -> str:
+    """Id of the document with this SHA-256"""
+    return str(uuid.UUID(content_hash[:32]))
+
+
+def encode_cursor(created_at: float, doc_id: str) -> str:
+    return f"{created_at!r}_{doc_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Raises ValueError for cursors encode_cursor did not make"""
+    created_at, sep, doc_id = cursor.partition("_")
+    if not sep or not doc_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return float(created_at), doc_id
+
+
+@dataclass
+class StoredDocument:
+    id: str
+    filename: str
+    path: Path
+    content_hash: str
+    size: int
+    original_filename: str
+    file_type: str
+    created_at: float
+    references: int = 0
+    created: bool = False  # written by this upload rather than deduplicated
+
+
+class DocumentStore:
+    """
+    Document files in DOC_PATH with their content hashes and references
+
+    `.store.sqlite3` in the document directory holds a row per stored
+    file and a reference count per (document, owner). Thread-safe, and
+    safe across processes sharing the directory: every change runs in
+    an immediate SQLite transaction.
+    """
+
+    def __init__(self, path: str = settings.DOC_PATH):
+        self.path = Path(path)
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        self.stores = 0
+        self.deduplicated = 0
+        self.releases = 0
+        self.removals = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(
+                str(self.path / ".store.sqlite3"), check_same_thread=False, timeout=30, isolation_level=None
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    original_filename TEXT NOT NULL,
+                    file_type TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (content_hash);
+                CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at, id);
+                CREATE INDEX IF NOT EXISTS idx_documents_type ON documents (file_type, created_at, id);
+                CREATE TABLE IF NOT EXISTS refs (
+                    doc_id TEXT NOT NULL REFERENCES documents (id),
+                    owner INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    original_filename TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (doc_id, owner)
+                );
+                CREATE INDEX IF NOT EXISTS idx_refs_owner ON refs (owner, created_at, doc_id);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                """
+            )
+            self._db = db
+        return self._db
+
+    def _references(self, db: sqlite3.Connection, doc_id: str) -> int:
+        return db.execute("SELECT COALESCE(SUM(count), 0) FROM refs WHERE doc_id = ?", (doc_id,)).fetchone()[0]
+
+    def _document(self, row) -> StoredDocument:
+        return StoredDocument(
+            id=row[0],
+            filename=row[1],
+            path=self.path / row[1],
+            content_hash=row[2],
+            size=row[3],
+            original_filename=row[4],
+            file_type=row[5],
+            created_at=row[6],
+        )
+
+    def add(
+        self,
+        temp_path: Path,
+        content_hash: str,
+        original_filename: str,
+        size: int,
+        owner: Optional[int] = None,
+        file_type: str = "unknown",
+    ) -> StoredDocument:
+        """
+        Store an uploaded file, or take a reference on the identical stored one
+
+        `temp_path` must be in the document directory. It is renamed into
+        place if the content is new and deleted otherwise.
+        """
+        owner = ANONYMOUS if owner is None else owner
+        now = time.time()
+
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    f"SELECT {_COLUMNS} FROM documents WHERE content_hash = ? ORDER BY created_at LIMIT 1",
+                    (content_hash,),
+                ).fetchone()
+                if row is not None and (self.path / row[1]).exists():
+                    document = self._document(row)
+                    os.unlink(temp_path)
+                else:
+                    # New content, or the file was removed behind our back
+                    if row is not None:
+                        db.execute("DELETE FROM refs WHERE doc_id = ?", (row[0],))
+                        db.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+                    doc_id = document_id(content_hash)
+                    document = StoredDocument(
+                        id=doc_id,
+                        filename=f"{doc_id}{Path(original_filename).suffix}",
+                        path=self.path / f"{doc_id}{Path(original_filename).suffix}",
+                        content_hash=content_hash,
+                        size=size,
+                        original_filename=original_filename,
+                        file_type=file_type,
+                        created_at=now,
+                        created=True,
+                    )
+                    os.replace(temp_path, document.path)
+                    db.execute(
+                        f"INSERT INTO documents ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (doc_id, document.filename, content_hash, size, original_filename, file_type, now),
+                    )
+
+                db.execute(
+                    "INSERT INTO refs (doc_id, owner, count, original_filename, created_at) VALUES (?, ?, 1, ?, ?)"
+                    " ON CONFLICT (doc_id, owner) DO UPDATE SET count = count + 1",
+                    (document.id, owner, original_filename, now),
+                )
+                document.references = self._references(db, document.id)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        if document.created:
+            self.stores += 1
+        else:
+            self.deduplicated += 1
+        return document
+
+    def get(self, doc_id: str) -> Optional[StoredDocument]:
+        """
+        Get a stored document, or None for unknown ids
+        """
+        with self._lock:
+            db = self._connect()
+            row = db.execute(f"SELECT {_COLUMNS} FROM documents WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                return None
+            document = self._document(row)
+            document.references = self._references(db, doc_id)
+        return document
+
+    def owned_documents(self, owner: int) -> List[str]:
+        """
+        Ids of the documents an owner holds a reference on
+        """
+        with self._lock:
+            rows = self._connect().execute("SELECT doc_id FROM refs WHERE owner = ?", (owner,)).fetchall()
+        return [doc_id for (doc_id,) in rows]
+
+    def page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        file_type: Optional[str] = None,
+        owner: Optional[int] = None,
+    ) -> Tuple[List[StoredDocument], Optional[str]]:
+        """
+        One page of documents, newest first
+
+        With an owner, only documents it holds a reference on, ordered by
+        when it uploaded them and with the name it uploaded them under.
+
+        Args:
+            limit: Page size
+            cursor: `next_cursor` of the previous page
+            file_type: Only documents of this type
+            owner: Only documents of this owner
+
+        Returns:
+            (documents, next_cursor), next_cursor is None on the last page
+
+        Raises:
+            ValueError: Invalid cursor
+        """
+        if owner is None:
+            sql = f"SELECT {_COLUMNS} FROM documents d WHERE 1"
+            params: list = []
+            key = "d.created_at", "d.id"
+        else:
+            sql = (
+                "SELECT d.id, d.filename, d.content_hash, d.size, r.original_filename, d.file_type, r.created_at"
+                " FROM refs r JOIN documents d ON d.id = r.doc_id WHERE r.owner = ?"
+            )
+            params = [owner]
+            key = "r.created_at", "r.doc_id"
+        if file_type is not None:
+            sql += " AND d.file_type = ?"
+            params.append(file_type)
+        if cursor:
+            created_at, doc_id = decode_cursor(cursor)
+            # Row value comparison, a range seek on the (created_at, id) indexes
+            sql += f" AND ({key[0]}, {key[1]}) < (?, ?)"
+            params += [created_at, doc_id]
+        sql += f" ORDER BY {key[0]} DESC, {key[1]} DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+
+        documents = [self._document(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = documents[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        return documents, next_cursor
+
+    def import_files(
+        self,
+        file_types: Dict[str, str],
+        original_filenames: Optional[Callable[[], Dict[str, str]]] = None,
+        force: bool = False,
+    ) -> int:
+        """
+        Register document files the catalog does not know, once per directory
+
+        Files are hashed and owned by ANONYMOUS, their id is the file stem
+        as before content addressing. With force the directory is scanned
+        again, and rows whose file is gone are dropped.
+
+        Args:
+            file_types: Lower-case extension → file type of the files to register
+            original_filenames: Returns the original names of document ids,
+                called only if the directory is scanned
+            force: Scan even if the directory was imported before
+
+        Returns:
+            Number of files registered
+        """
+        with self._lock:
+            db = self._connect()
+            if not force and db.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+                return 0
+
+            known = {filename for (filename,) in db.execute("SELECT filename FROM documents")}
+            found = []
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    suffix = Path(entry.name).suffix.lower()
+                    if suffix in file_types and entry.name not in known and entry.is_file():
+                        found.append((entry.name, file_types[suffix], entry.stat().st_mtime))
+
+            names = original_filenames() if found and original_filenames else {}
+            rows = []
+            for filename, file_type, mtime in found:
+                digest = hashlib.sha256()
+                with open(self.path / filename, "rb") as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        digest.update(block)
+                doc_id = Path(filename).stem
+                original = names.get(doc_id) or filename
+                rows.append((doc_id, filename, digest.hexdigest(), (self.path / filename).stat().st_size,
+                             original, file_type, mtime))
+
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if force:
+                    missing = [
+                        (doc_id,) for doc_id, filename in db.execute("SELECT id, filename FROM documents")
+                        if not (self.path / filename).exists()
+                    ]
+                    db.executemany("DELETE FROM refs WHERE doc_id = ?", missing)
+                    db.executemany("DELETE FROM documents WHERE id = ?", missing)
+                db.executemany(
+                    f"INSERT OR IGNORE INTO documents ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                db.executemany(
+                    "INSERT OR IGNORE INTO refs (doc_id, owner, count, original_filename, created_at)"
+                    " VALUES (?, ?, 1, ?, ?)",
+                    [(row[0], ANONYMOUS, row[4], row[6]) for row in rows],
+                )
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', ?)", (str(time.time()),))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        if rows:
+            logger.info(f"Registered {len(rows)} existing document files in {self.path}")
+        return len(rows)
+
+    def release(
+        self,
+        doc_id: str,
+        owner: Optional[int] = None,
+        on_removed: Optional[Callable[[str], None]] = None,
+    ) -> Optional[int]:
+        """
+        Release one reference of an owner on a document
+
+        Without an owner, the ANONYMOUS reference is released, or the
+        reference of the only owner if the document has exactly one
+        (uploads made with a user_id can still be deleted without one).
+
+        The file is deleted with the last reference of any owner, and
+        `on_removed(doc_id)` is called before anyone can upload the same
+        content again, so the caller can drop the document from the index
+        without racing a re-upload.
+
+        Returns:
+            References left on the document, or None if the owner holds
+            none (or, without an owner, several owners hold references)
+        """
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if owner is None:
+                    owners = [o for (o,) in db.execute("SELECT owner FROM refs WHERE doc_id = ?", (doc_id,))]
+                    owner = owners[0] if len(owners) == 1 else ANONYMOUS
+                row = db.execute(
+                    "SELECT count FROM refs WHERE doc_id = ? AND owner = ?", (doc_id, owner)
+                ).fetchone()
+                if row is None:
+                    db.execute("ROLLBACK")
+                    return None
+                if row[0] > 1:
+                    db.execute(
+                        "UPDATE refs SET count = count - 1 WHERE doc_id = ? AND owner = ?", (doc_id, owner)
+                    )
+                else:
+                    db.execute("DELETE FROM refs WHERE doc_id = ? AND owner = ?", (doc_id, owner))
+
+                references = self._references(db, doc_id)
+                if references == 0:
+                    (filename,) = db.execute("SELECT filename FROM documents WHERE id = ?", (doc_id,)).fetchone()
+                    db.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+                    try:
+                        os.unlink(self.path / filename)
+                    except FileNotFoundError:
+                        pass
+                    if on_removed:
+                        try:
+                            on_removed(doc_id)
+                        except Exception as e:
+                            logger.warning(f"Cleanup of removed document {doc_id} failed: {e}")
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        self.releases += 1
+        if references == 0:
+            self.removals += 1
+        return references
+
+    def stats(self) -> dict:
+        """
+        Get stored documents, references and deduplication counters
+        """
+        with self._lock:
+            db = self._connect()
+            documents, stored_bytes = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents"
+            ).fetchone()
+            references, referenced_bytes = db.execute(
+                "SELECT COALESCE(SUM(r.count), 0), COALESCE(SUM(r.count * d.size), 0)"
+                " FROM refs r JOIN documents d ON d.id = r.doc_id"
+            ).fetchone()
+
+        return {
+            "documents": documents,
+            "references": references,
+            "bytes": stored_bytes,
+            "bytes_saved": referenced_bytes - stored_bytes,
+            "stores": self.stores,
+            "deduplicated": self.deduplicated,
+            "releases": self.releases,
+            "removals": self.removals,
+        }
+
+
+# Global document store instance
+document_store = DocumentStore()
@@ -0,0 +1,485 @@
+"""Persistent Embedding Cache
+
+Vectors of scraped chunks and local documents, keyed by
+(embedding model, sha256 of the chunk text), so a chunk is sent to the
+embedding provider once no matter how many researches use it.
+
+Vectors are stored as float32 rows of a memory-mapped file per model,
+`<path>/<model>/vectors.f32`; `<path>/index.sqlite3` maps hashes to
+rows. Row allocation happens inside a SQLite write transaction, so API
+and worker processes can share one cache directory. Once the vectors
+exceed the size budget, the least recently used rows are evicted and
+their slots reused.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # only needed once hooked into gpt-researcher
+    Embeddings = object
+
+logger = logging.getLogger(__name__)
+
+# Evict down to this fraction of the budget so eviction does not run on every write
+_EVICT_LOW_WATER = 0.9
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_model_key(provider: str, model: str, **kwargs) -> str:
+    """
+    Cache namespace of an embedding model
+
+    Only options that change the vectors are part of the key, batching
+    options such as chunk_size are not.
+    """
+    key = f"{provider}:{model}"
+    if kwargs.get("dimensions"):
+        key += f":{kwargs['dimensions']}"
+    return key
+
+
+class _ModelVectors:
+    """Memory-mapped float32 rows of one model"""
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.capacity = 0
+        self.array: Optional[np.memmap] = None
+        self.remap()
+
+    def remap(self):
+        """Map the whole file, it may have been grown by another process"""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        capacity = size // (self.dim * 4)
+        if capacity != self.capacity or self.array is None:
+            self.array = (
+                np.memmap(self.path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+                if capacity else None
+            )
+            self.capacity = capacity
+
+    def ensure_capacity(self, rows: int):
+        """
+        Grow the file to hold `rows` rows
+
+        Must be called under the SQLite write lock. Sizes come from the
+        file itself, not self.capacity: another process may have grown it
+        since it was mapped here, and truncating to a smaller size would
+        cut off rows that process is writing through its own map.
+        """
+        if rows <= self.capacity:
+            return
+        with open(self.path, "ab") as f:
+            current = os.fstat(f.fileno()).st_size // (self.dim * 4)
+            if rows > current:
+                capacity = max(rows, current * 2, 1024)
+                f.truncate(capacity * self.dim * 4)
+        self.remap()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache on local disk
+
+    Thread-safe. Lookups read the memory map directly; only stores take
+    the SQLite write lock.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.EMBEDDING_CACHE_PATH,
+        max_bytes: int = settings.EMBEDDING_CACHE_MAX_BYTES,
+        enabled: bool = settings.EMBEDDING_CACHE_ENABLED,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._vectors: Dict[str, _ModelVectors] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0  # chunk text not sent to the provider
+        self.errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.path, exist_ok=True)
+            db = sqlite3.connect(
+                os.path.join(self.path, "index.sqlite3"),
+                check_same_thread=False,
+                timeout=30,
+                isolation_level=None,  # transactions are explicit
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS models (
+                    model TEXT PRIMARY KEY,
+                    dir TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    rows INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    model TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (model, hash)
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at);
+                CREATE TABLE IF NOT EXISTS free_rows (
+                    model TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    PRIMARY KEY (model, row)
+                );
+                """
+            )
+            self._db = db
+        return self._db
+
+    def _model_vectors(self, db: sqlite3.Connection, model: str) -> Optional[_ModelVectors]:
+        vectors = self._vectors.get(model)
+        if vectors is None:
+            row = db.execute("SELECT dir, dim FROM models WHERE model = ?", (model,)).fetchone()
+            if row is None:
+                return None
+            vectors = _ModelVectors(os.path.join(self.path, row[0], "vectors.f32"), row[1])
+            self._vectors[model] = vectors
+        return vectors
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached vectors, returns {hash: vector} for the hits
+        """
+        found: Dict[str, List[float]] = {}
+        if not hashes:
+            return found
+
+        with self._lock:
+            db = self._connect()
+            vectors = self._model_vectors(db, model)
+            if vectors is None:
+                return found
+
+            unique = list(dict.fromkeys(hashes))
+            rows: Dict[str, int] = {}
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows.update(db.execute(
+                    f"SELECT hash, row FROM entries WHERE model = ? AND hash IN ({placeholders})",
+                    (model, *batch),
+                ).fetchall())
+            if not rows:
+                return found
+
+            if max(rows.values()) >= vectors.capacity:
+                vectors.remap()
+            hit_hashes = list(rows)
+            matrix = vectors.array[[rows[h] for h in hit_hashes]]
+            for h, vector in zip(hit_hashes, matrix.tolist()):
+                found[h] = vector
+
+            now = time.time()
+            for start in range(0, len(hit_hashes), _LOOKUP_BATCH):
+                batch = hit_hashes[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                db.execute(
+                    f"UPDATE entries SET accessed_at = ? WHERE model = ? AND hash IN ({placeholders})",
+                    (now, model, *batch),
+                )
+        return found
+
+    def put_many(self, model: str, items: Dict[str, Sequence[float]]):
+        """
+        Store vectors, {hash: vector}
+        """
+        if not items:
+            return
+        matrix = np.asarray(list(items.values()), dtype=np.float32)
+        if matrix.ndim != 2:
+            return
+        dim = matrix.shape[1]
+
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                stored = db.execute("SELECT dim, rows FROM models WHERE model = ?", (model,)).fetchone()
+                if stored is None:
+                    directory = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+                    os.makedirs(os.path.join(self.path, directory), exist_ok=True)
+                    db.execute(
+                        "INSERT INTO models (model, dir, dim, rows) VALUES (?, ?, ?, 0)",
+                        (model, directory, dim),
+                    )
+                    stored = (dim, 0)
+                if stored[0] != dim:
+                    raise ValueError(f"{model} vectors have {dim} dimensions, cache has {stored[0]}")
+
+                hashes = list(items)
+                existing = set()
+                for start in range(0, len(hashes), _LOOKUP_BATCH):
+                    batch = hashes[start:start + _LOOKUP_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    existing.update(h for (h,) in db.execute(
+                        f"SELECT hash FROM entries WHERE model = ? AND hash IN ({placeholders})",
+                        (model, *batch),
+                    ))
+                new = [i for i, h in enumerate(hashes) if h not in existing]
+                if not new:
+                    db.execute("COMMIT")
+                    return
+
+                free = [r for (r,) in db.execute(
+                    "SELECT row FROM free_rows WHERE model = ? ORDER BY row LIMIT ?", (model, len(new))
+                )]
+                if free:
+                    db.executemany(
+                        "DELETE FROM free_rows WHERE model = ? AND row = ?", [(model, r) for r in free]
+                    )
+                appended = len(new) - len(free)
+                rows = free + list(range(stored[1], stored[1] + appended))
+
+                vectors = self._model_vectors(db, model)
+                vectors.ensure_capacity(stored[1] + appended)
+                vectors.array[rows] = matrix[new]
+                vectors.array.flush()
+
+                now = time.time()
+                db.executemany(
+                    "INSERT INTO entries (model, hash, row, accessed_at) VALUES (?, ?, ?, ?)",
+                    [(model, hashes[i], row, now) for i, row in zip(new, rows)],
+                )
+                db.execute("UPDATE models SET rows = rows + ? WHERE model = ?", (appended, model))
+                self.stores += len(new)
+
+                self._evict(db)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def _live_bytes(self, db: sqlite3.Connection) -> int:
+        return db.execute(
+            "SELECT COALESCE(SUM(m.dim * 4), 0) FROM entries e JOIN models m ON m.model = e.model"
+        ).fetchone()[0]
+
+    def _evict(self, db: sqlite3.Connection):
+        live = self._live_bytes(db)
+        if live <= self.max_bytes:
+            return
+        target = self.max_bytes * _EVICT_LOW_WATER
+        dims = dict(db.execute("SELECT model, dim FROM models").fetchall())
+        while live > target:
+            victims = db.execute(
+                "SELECT model, hash, row FROM entries ORDER BY accessed_at LIMIT 500"
+            ).fetchall()
+            if not victims:
+                break
+            for model, h, row in victims:
+                db.execute("DELETE FROM entries WHERE model = ? AND hash = ?", (model, h))
+                db.execute("INSERT OR IGNORE INTO free_rows (model, row) VALUES (?, ?)", (model, row))
+                live -= dims[model] * 4
+                self.evictions += 1
+                if live <= target:
+                    break
+
+    def record(self, hits: int, misses: int, bytes_saved: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.bytes_saved += bytes_saved
+
+    def clear(self):
+        """
+        Drop every cached vector
+        """
+        with self._lock:
+            db = self._connect()
+            for vectors in self._vectors.values():
+                vectors.array = None
+            self._vectors.clear()
+            for (directory,) in db.execute("SELECT dir FROM models").fetchall():
+                try:
+                    os.remove(os.path.join(self.path, directory, "vectors.f32"))
+                except OSError:
+                    pass
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM free_rows")
+            db.execute("DELETE FROM models")
+
+    def stats(self) -> dict:
+        """
+        Get hit rate, bytes saved and eviction counters
+        """
+        with self._lock:
+            db = self._connect()
+            models = {
+                model: {"dim": dim, "entries": count}
+                for model, dim, count in db.execute(
+                    "SELECT m.model, m.dim, COUNT(e.hash) FROM models m"
+                    " LEFT JOIN entries e ON e.model = m.model GROUP BY m.model"
+                )
+            }
+            live = self._live_bytes(db)
+            disk = sum(
+                os.path.getsize(os.path.join(self.path, d, "vectors.f32"))
+                for (d,) in db.execute("SELECT dir FROM models")
+                if os.path.exists(os.path.join(self.path, d, "vectors.f32"))
+            )
+
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "models": models,
+            "vector_bytes": live,
+            "disk_bytes": disk,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings that only send cache misses to the wrapped provider
+
+    Queries are passed through, some models embed queries differently
+    from documents and they rarely repeat.
+    """
+
+    def __init__(self, embeddings, model_key: str, cache: "EmbeddingCache"):
+        self.embeddings = embeddings
+        self.model_key = model_key
+        self.cache = cache
+
+    def _lookup(self, texts: List[str]):
+        hashes = [text_hash(t) for t in texts]
+        try:
+            found = self.cache.get_many(self.model_key, hashes)
+        except Exception as e:
+            self.cache.errors += 1
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            found = {}
+        missing: Dict[str, str] = {}
+        for h, text in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = text
+        hits = sum(1 for h in hashes if h in found)
+        self.cache.record(
+            hits, len(texts) - hits,
+            sum(len(t.encode("utf-8")) for h, t in zip(hashes, texts) if h in found),
+        )
+        return hashes, found, missing
+
+    def _store(self, missing: Dict[str, str], vectors: List[List[float]], found: Dict[str, List[float]]):
+        computed = dict(zip(missing, vectors))
+        found.update(computed)
+        try:
+            self.cache.put_many(self.model_key, computed)
+        except Exception as e:
+            self.cache.errors += 1
+            logger.warning(f"Embedding cache store failed: {e}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not self.cache.enabled:
+            return self.embeddings.embed_documents(texts)
+        hashes, found, missing = self._lookup(texts)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self._store(missing, vectors, found)
+        return [found[h] for h in hashes]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not self.cache.enabled:
+            return await self.embeddings.aembed_documents(texts)
+        hashes, found, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            await asyncio.to_thread(self._store, missing, vectors, found)
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+    def __getattr__(self, name):
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+
+_hook_installed = False
+
+
+def install_embedding_hook(cache: Optional[EmbeddingCache] = None) -> bool:
+    """
+    Route gpt-researcher's embeddings through the embedding cache
+
+    Wraps `Memory.__init__` so the embeddings it builds for context
+    compression and local documents are a CachedEmbeddings. Safe to call
+    more than once.
+    """
+    global _hook_installed
+    if _hook_installed:
+        return True
+
+    try:
+        from gpt_researcher.memory.embeddings import Memory
+    except ImportError as e:
+        logger.warning(f"Embedding cache disabled, gpt-researcher memory not found: {e}")
+        return False
+
+    cache = cache or embedding_cache
+    original_init = Memory.__init__
+
+    def __init__(self, embedding_provider, model, **embedding_kwargs):
+        original_init(self, embedding_provider, model, **embedding_kwargs)
+        if self._embeddings is not None:
+            self._embeddings = CachedEmbeddings(
+                self._embeddings,
+                embedding_model_key(embedding_provider, model, **embedding_kwargs),
+                cache,
+            )
+
+    Memory.__init__ = __init__
+    _hook_installed = True
+    return True
+
+
+# Global embedding cache instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,222 @@
+"""File Downloads
+
+Responses for stored files with what download clients and proxies rely on:
+
+- MIME type from the file name, including the office formats Python's
+  mimetypes table may lack
+- Strong ETag (the content hash, when known) and Last-Modified, answering
+  If-None-Match / If-Modified-Since with 304 Not Modified
+- Single byte ranges (Range / If-Range) for resumed downloads, answered
+  with 206 Partial Content or 416
+- Optionally no body at all: DOCUMENT_DOWNLOAD_OFFLOAD hands the transfer
+  to the front proxy with X-Accel-Redirect (nginx) or X-Sendfile (Apache,
+  lighttpd), which then serves ranges itself and frees the Python worker
+
+Multi-range requests get the whole file, which RFC 9110 allows.
+"""
+
+import asyncio
+import email.utils
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import quote
+
+from starlette.responses import Response, StreamingResponse
+
+from app.core.config import settings
+
+OFFLOAD_MODES = ("", "x-accel-redirect", "x-sendfile")
+
+# Bytes read per block while streaming a file
+READ_BLOCK_SIZE = 256 * 1024
+
+_MIME_TYPES = {
+    ".md": "text/markdown",
+    ".csv": "text/csv",
+    ".txt": "text/plain",
+    ".pdf": "application/pdf",
+    ".doc": "application/msword",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".xls": "application/vnd.ms-excel",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".ppt": "application/vnd.ms-powerpoint",
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def guess_media_type(filename: str) -> str:
+    suffix = Path(filename).suffix.lower()
+    media_type = _MIME_TYPES.get(suffix) or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if media_type.startswith("text/"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    if header.strip() == "*":
+        return True
+    tags = [t.strip() for t in header.split(",")]
+    return any(t.removeprefix("W/") == etag.removeprefix("W/") for t in tags)
+
+
+def _not_modified(headers, etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) of a single-range `Range` header, end inclusive
+
+    Returns None when the whole file is to be sent (no, malformed or
+    multi-range header).
+
+    Raises:
+        ValueError: The range lies outside the file (416)
+    """
+    if not header:
+        return None
+    match = _RANGE.fullmatch(header.strip())
+    if match is None or not any(match.groups()):
+        return None
+    if size == 0:  # no byte of an empty file can be addressed
+        raise ValueError(header)
+    first, last = match.groups()
+    if not first:  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def _range_applies(headers, etag: str, last_modified: str) -> bool:
+    """If-Range: honour Range only if the client's copy is current (strong comparison)"""
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return not etag.startswith("W/") and if_range == etag
+    return if_range == last_modified
+
+
+async def _read_file(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            block = await asyncio.to_thread(f.read, min(READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def file_response(
+    request,
+    path: Path,
+    filename: str,
+    etag: Optional[str] = None,
+    offload: Optional[str] = None,
+    accel_prefix: Optional[str] = None,
+) -> Response:
+    """
+    Response for a download of a file
+
+    Args:
+        request: Starlette request, for its method and conditional/range headers
+        path: File to send
+        filename: Name given to the client, also decides the MIME type
+        etag: Opaque validator of the content (e.g. its SHA-256), size and
+            mtime by default
+        offload: "x-accel-redirect" or "x-sendfile" to let the front proxy
+            send the file, DOCUMENT_DOWNLOAD_OFFLOAD by default
+        accel_prefix: Internal nginx location the file name is appended to,
+            DOCUMENT_DOWNLOAD_ACCEL_PREFIX by default
+
+    Raises:
+        FileNotFoundError: The file does not exist
+    """
+    offload = (settings.DOCUMENT_DOWNLOAD_OFFLOAD if offload is None else offload).lower()
+    if offload not in OFFLOAD_MODES:
+        raise ValueError(f"Unknown download offload mode: {offload}")
+
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{etag}"' if etag else f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+    headers = {
+        "etag": etag,
+        "last-modified": last_modified,
+        "accept-ranges": "bytes",
+        "content-disposition": content_disposition(filename),
+        "cache-control": "private, no-cache",
+    }
+    media_type = guess_media_type(filename)
+
+    if _not_modified(request.headers, etag, stat.st_mtime):
+        headers.pop("content-disposition")
+        return Response(status_code=304, headers=headers)
+
+    if offload == "x-accel-redirect":
+        prefix = (settings.DOCUMENT_DOWNLOAD_ACCEL_PREFIX if accel_prefix is None else accel_prefix).rstrip("/")
+        headers["x-accel-redirect"] = f"{prefix}/{quote(Path(path).name)}"
+        return Response(headers=headers, media_type=media_type)
+    if offload == "x-sendfile":
+        headers["x-sendfile"] = str(Path(path).resolve())
+        return Response(headers=headers, media_type=media_type)
+
+    start, end, status_code = 0, size - 1, 200
+    if _range_applies(request.headers, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={"content-range": f"bytes */{size}", "accept-ranges": "bytes", "etag": etag},
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1
+    headers["content-length"] = str(length)
+    if request.method == "HEAD" or length <= 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        _read_file(str(path), start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
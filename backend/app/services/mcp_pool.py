@@ -0,0 +1,398 @@
+"""Warm Pool of Long-lived MCP Search Servers
+
+Instead of spawning `web_search_mcp.py` over stdio for every research, a
+bounded set of servers is started once in HTTP mode and leased to
+researches. Servers are health-checked and recycled after `max_uses`
+leases.
+"""
+
+import asyncio
+import atexit
+import json
+import contextlib
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MCPPoolExhausted(Exception):
+    """No MCP server became available within the lease timeout"""
+
+
+def _free_port(host: str) -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+class MCPServerProcess:
+    """
+    A single pre-started MCP server process
+    """
+
+    def __init__(self, script: str, host: str, env: Dict[str, str]):
+        self.script = script
+        self.host = host
+        self.port = _free_port(host)
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at: Optional[float] = None
+        self.active_leases = 0
+        self.total_uses = 0
+        self.failed_checks = 0
+        self.retiring = False
+        # Search counters reported by the server's /health endpoint
+        self.search_stats: Dict[str, dict] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, startup_timeout: float):
+        """
+        Start the process and wait until its health endpoint answers
+        """
+        self.process = subprocess.Popen(
+            [
+                sys.executable, self.script,
+                "--transport", "http",
+                "--host", self.host,
+                "--port", str(self.port),
+            ],
+            env={**os.environ, **self.env},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self.started_at = time.monotonic()
+
+        deadline = self.started_at + startup_timeout
+        while time.monotonic() < deadline:
+            if not self.is_alive():
+                raise RuntimeError(f"MCP server exited with code {self.process.returncode}")
+            if self.check_health(timeout=1.0):
+                logger.info(f"MCP server ready at {self.url} (pid {self.process.pid})")
+                return
+            time.sleep(0.1)
+
+        self.stop()
+        raise RuntimeError(f"MCP server at {self.url} did not become healthy")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def check_health(self, timeout: float = 2.0) -> bool:
+        """
+        Probe the server's /health endpoint
+        """
+        if not self.is_alive():
+            return False
+        try:
+            with urllib.request.urlopen(f"{self.url}/health", timeout=timeout) as response:
+                if response.status != 200:
+                    return False
+                try:
+                    self.search_stats = json.loads(response.read()).get("search") or {}
+                except ValueError:
+                    pass
+                return True
+        except Exception:
+            return False
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Terminate the process, killing it if it does not exit in time
+        """
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def mcp_config(self, name: str) -> dict:
+        """
+        gpt-researcher MCP config pointing at this server
+        """
+        return {
+            "name": name,
+            "connection_url": f"{self.url}/mcp",
+        }
+
+
+class MCPServerPool:
+    """
+    Bounded pool of MCP server processes leased to researches
+
+    Researches run on different threads and event loops, so the pool is
+    guarded by a threading.Condition and async callers block in a worker
+    thread.
+    """
+
+    def __init__(
+        self,
+        script: str,
+        env: Optional[Dict[str, str]] = None,
+        name: str = "searxng-search",
+        host: str = "127.0.0.1",
+        min_size: int = 1,
+        max_size: int = 4,
+        max_leases_per_server: int = 4,
+        max_uses: int = 200,
+        health_interval: float = 30.0,
+        startup_timeout: float = 20.0,
+    ):
+        self.script = script
+        self.env = env or {}
+        self.name = name
+        self.host = host
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_leases_per_server = max_leases_per_server
+        self.max_uses = max_uses
+        self.health_interval = health_interval
+        self.startup_timeout = startup_timeout
+
+        self._servers: List[MCPServerProcess] = []
+        self._starting = 0
+        self._condition = threading.Condition()
+        self._monitor: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.leases = 0
+        self.waits = 0
+        self.spawned = 0
+        self.recycled = 0
+        self.unhealthy = 0
+
+    def start(self):
+        """
+        Pre-start `min_size` servers and the health monitor
+        """
+        with self._condition:
+            if self._monitor is not None or self._closed:
+                return
+            self._monitor = threading.Thread(
+                target=self._monitor_loop, name="mcp-pool-monitor", daemon=True
+            )
+            self._monitor.start()
+
+        for _ in range(self.min_size):
+            self._spawn()
+
+    def _spawn(self, raise_errors: bool = False) -> Optional[MCPServerProcess]:
+        with self._condition:
+            if len(self._servers) + self._starting >= self.max_size:
+                return None
+            self._starting += 1
+
+        server = MCPServerProcess(self.script, self.host, self.env)
+        error = None
+        try:
+            server.start(self.startup_timeout)
+        except Exception as e:
+            logger.error(f"Failed to start MCP server: {e}")
+            error = e
+
+        with self._condition:
+            self._starting -= 1
+            if error is None:
+                self._servers.append(server)
+                self.spawned += 1
+            self._condition.notify_all()
+
+        if error is not None:
+            if raise_errors:
+                raise MCPPoolExhausted(f"Failed to start an MCP server: {error}") from error
+            return None
+        return server
+
+    def _prune_dead(self):
+        # Called with the condition held; frees slots of crashed idle servers
+        for server in [s for s in self._servers if not s.is_alive() and not s.active_leases]:
+            self._servers.remove(server)
+            self.unhealthy += 1
+
+    def _pick(self) -> Optional[MCPServerProcess]:
+        candidates = [
+            s for s in self._servers
+            if not s.retiring and s.is_alive()
+            and s.active_leases < self.max_leases_per_server
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda s: s.active_leases)
+
+    def acquire(self, timeout: float) -> MCPServerProcess:
+        """
+        Lease a server, starting a new one if the pool has room
+        """
+        self.start()
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise MCPPoolExhausted("MCP server pool is closed")
+                self._prune_dead()
+                server = self._pick()
+                if server is not None:
+                    server.active_leases += 1
+                    server.total_uses += 1
+                    if server.total_uses >= self.max_uses:
+                        server.retiring = True
+                    self.leases += 1
+                    return server
+                can_spawn = len(self._servers) + self._starting < self.max_size
+
+            if can_spawn:
+                self._spawn(raise_errors=True)
+                continue
+
+            with self._condition:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise MCPPoolExhausted(
+                        f"No MCP server available within {timeout:.0f}s "
+                        f"({len(self._servers)}/{self.max_size} servers busy)"
+                    )
+                self.waits += 1
+                self._condition.wait(timeout=remaining)
+
+    def release(self, server: MCPServerProcess):
+        """
+        Return a leased server, recycling it once it is retired and idle
+        """
+        with self._condition:
+            server.active_leases -= 1
+            retire = server.retiring and server.active_leases == 0
+            if retire:
+                self._servers.remove(server)
+                self.recycled += 1
+            self._condition.notify_all()
+
+        if retire:
+            logger.info(f"Recycling MCP server {server.url} after {server.total_uses} uses")
+            server.stop()
+
+    @contextlib.asynccontextmanager
+    async def lease(self, timeout: Optional[float] = None):
+        """
+        Async context manager leasing a server for one research
+        """
+        timeout = timeout if timeout is not None else settings.MCP_POOL_LEASE_TIMEOUT
+        server = await asyncio.to_thread(self.acquire, timeout)
+        try:
+            yield server
+        finally:
+            await asyncio.to_thread(self.release, server)
+
+    def _monitor_loop(self):
+        while not self._closed:
+            time.sleep(self.health_interval)
+            self.check_health()
+
+    def check_health(self):
+        """
+        Drop dead or unresponsive idle servers and refill to `min_size`
+        """
+        with self._condition:
+            servers = list(self._servers)
+
+        for server in servers:
+            if server.check_health():
+                server.failed_checks = 0
+                continue
+
+            server.failed_checks += 1
+            if server.is_alive() and server.failed_checks < 3:
+                continue
+
+            with self._condition:
+                # Busy servers are retired and stopped by the last release
+                if server.active_leases:
+                    server.retiring = True
+                    continue
+                if server in self._servers:
+                    self._servers.remove(server)
+                self.unhealthy += 1
+                self._condition.notify_all()
+            logger.warning(f"Removing unhealthy MCP server {server.url}")
+            server.stop()
+
+        while not self._closed:
+            with self._condition:
+                if len(self._servers) + self._starting >= self.min_size:
+                    break
+            if self._spawn() is None:
+                break
+
+    def shutdown(self):
+        """
+        Stop all servers
+        """
+        with self._condition:
+            self._closed = True
+            servers, self._servers = self._servers, []
+            self._condition.notify_all()
+        for server in servers:
+            server.stop()
+
+    def stats(self) -> dict:
+        """
+        Get pool size and lease counters
+        """
+        with self._condition:
+            return {
+                "servers": len(self._servers),
+                "starting": self._starting,
+                "max_size": self.max_size,
+                "active_leases": sum(s.active_leases for s in self._servers),
+                "leases": self.leases,
+                "waits": self.waits,
+                "spawned": self.spawned,
+                "recycled": self.recycled,
+                "unhealthy": self.unhealthy,
+                "search": _sum_search_stats(s.search_stats for s in self._servers),
+            }
+
+
+def _sum_search_stats(per_server) -> Dict[str, dict]:
+    """
+    Add up the numeric search counters of all servers, as of their last health check
+    """
+    totals: Dict[str, dict] = {}
+    for stats in per_server:
+        for section, counters in stats.items():
+            if not isinstance(counters, dict):
+                continue
+            target = totals.setdefault(section, {})
+            for name, value in counters.items():
+                if isinstance(value, (int, float)) and not name.endswith("_rate"):
+                    target[name] = target.get(name, 0) + value
+    return totals
+
+
+# Global MCP server pool instance
+mcp_server_pool = MCPServerPool(
+    script=settings.MCP_SERVER_SCRIPT,
+    env={"SEARXNG_URL": settings.SEARXNG_URL},
+    min_size=settings.MCP_POOL_MIN_SIZE,
+    max_size=settings.MCP_POOL_MAX_SIZE,
+    max_leases_per_server=settings.MCP_POOL_MAX_LEASES_PER_SERVER,
+    max_uses=settings.MCP_POOL_MAX_USES,
+    health_interval=settings.MCP_POOL_HEALTH_INTERVAL,
+)
+
+atexit.register(mcp_server_pool.shutdown)
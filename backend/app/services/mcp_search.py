@@ -0,0 +1,72 @@
+"""Batched Searches against the MCP Search Server
+
+Calls the server's `search_batch` tool directly, so a whole layer of
+deep-research sub-queries costs one MCP round trip instead of one tool
+call per sub-query made by each sub-researcher.
+"""
+
+import contextlib
+import json
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+BATCH_TOOL = "search_batch"
+
+
+@contextlib.asynccontextmanager
+async def _session(mcp_config: dict):
+    from mcp import ClientSession
+
+    if mcp_config.get("connection_url"):
+        from mcp.client.streamable_http import streamablehttp_client
+
+        async with streamablehttp_client(mcp_config["connection_url"]) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+    else:
+        from mcp.client.stdio import StdioServerParameters, stdio_client
+
+        params = StdioServerParameters(
+            command=mcp_config["command"],
+            args=mcp_config.get("args", []),
+            env=mcp_config.get("env"),
+        )
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+
+async def search_batch(mcp_config: dict, queries: List[str], max_results: int = 10) -> Dict[str, List[dict]]:
+    """
+    Run several searches in one `search_batch` tool call
+
+    Args:
+        mcp_config: gpt-researcher style MCP config (`connection_url` or `command`/`args`)
+        queries: Search queries
+        max_results: Results per query
+
+    Returns:
+        Results by query, in the server's {"title", "href", "body"} format.
+        Queries that failed on the server are left out.
+    """
+    queries = [q for q in dict.fromkeys(queries) if q and q.strip()]
+    if not queries:
+        return {}
+
+    async with _session(mcp_config) as session:
+        result = await session.call_tool(BATCH_TOOL, {"queries": queries, "max_results": max_results})
+
+    text = "".join(getattr(c, "text", "") for c in result.content)
+    payload = json.loads(text) if text else {}
+
+    results = {}
+    for group in payload.get("batch") or []:
+        if group.get("error"):
+            logger.warning(f"Batched search '{group.get('query')}' failed: {group['error']}")
+            continue
+        results[group["query"]] = [r for r in group.get("results") or [] if r.get("href")]
+    return results
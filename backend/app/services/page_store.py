@@ -0,0 +1,455 @@
+"""Shared Scraped Page Store
+
+Extracted text of scraped pages, shared by all researches and kept on
+local disk. Entries are keyed by canonical URL while the text itself is
+stored once per content hash, so URL variants and mirrors of a page
+share one blob. Pages older than the freshness window are revalidated
+with a conditional GET (ETag / Last-Modified) instead of being scraped
+again, and the least recently used pages are evicted once the blobs
+exceed the size budget.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Click ids that never change page content (besides utm_*). Parameters like
+# ref can select content on some sites, so they are kept.
+_TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid"}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Evict down to this fraction of the budget so eviction does not run on every write
+_EVICT_LOW_WATER = 0.9
+
+REVALIDATE_TIMEOUT = 4  # seconds, same as gpt-researcher's scrapers
+
+
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of a page URL for store lookups
+
+    - scheme/host lowercased, default port and fragment dropped
+    - utm_* and click id parameters (fbclid, gclid, ...) dropped, the rest sorted
+    - path kept as is, `/a` and `/a/` can be different pages
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    )
+    path = parts.path or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+@dataclass
+class StoredPage:
+    """A page served from the store"""
+    url: str
+    content: str
+    title: str = ""
+    image_urls: List[str] = field(default_factory=list)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+    validated_at: float = 0.0
+
+    def as_scraped(self, link: str) -> dict:
+        """Same shape as gpt-researcher's Scraper.extract_data_from_url"""
+        return {
+            "url": link,
+            "raw_content": self.content,
+            "image_urls": list(self.image_urls),
+            "title": self.title,
+        }
+
+
+class PageStore:
+    """
+    Content-addressed page store on local disk
+
+    Layout under `path`: `index.sqlite3` maps canonical URLs to content
+    hashes and validators, `blobs/<aa>/<hash>.txt` holds the text.
+    Thread-safe, scrapes run in worker threads as well as on event loops.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.PAGE_STORE_PATH,
+        max_bytes: int = settings.PAGE_STORE_MAX_BYTES,
+        freshness_seconds: int = settings.PAGE_STORE_FRESHNESS,
+        enabled: bool = settings.PAGE_STORE_ENABLED,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.freshness_seconds = freshness_seconds
+        self.enabled = enabled
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.stores = 0
+        self.deduplicated = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.join(self.path, "blobs"), exist_ok=True)
+            db = sqlite3.connect(
+                os.path.join(self.path, "index.sqlite3"), check_same_thread=False, timeout=10
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    title TEXT,
+                    image_urls TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    validated_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_pages_hash ON pages (content_hash);
+                CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages (accessed_at);
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL
+                );
+                """
+            )
+            db.commit()
+            self._total_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            self._db = db
+        return self._db
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.path, "blobs", content_hash[:2], f"{content_hash}.txt")
+
+    def is_fresh(self, page: StoredPage) -> bool:
+        return time.time() - page.validated_at < self.freshness_seconds
+
+    def get(self, url: str) -> Optional[StoredPage]:
+        """
+        Get a stored page, fresh or not, or None if the URL is unknown
+        """
+        key = canonical_url(url)
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT content_hash, title, image_urls, etag, last_modified, fetched_at, validated_at"
+                " FROM pages WHERE url = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            try:
+                with open(self._blob_path(row[0]), encoding="utf-8") as f:
+                    content = f.read()
+            except OSError:
+                # Blob removed behind our back, forget the page
+                db.execute("DELETE FROM pages WHERE url = ?", (key,))
+                self._release_blob(db, row[0])
+                db.commit()
+                self.misses += 1
+                return None
+
+            db.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), key))
+            db.commit()
+
+        page = StoredPage(
+            url=key,
+            content=content,
+            title=row[1] or "",
+            image_urls=json.loads(row[2] or "[]"),
+            etag=row[3],
+            last_modified=row[4],
+            fetched_at=row[5],
+            validated_at=row[6],
+        )
+        if self.is_fresh(page):
+            self.hits += 1
+        else:
+            self.stale += 1
+        return page
+
+    def put(
+        self,
+        url: str,
+        content: str,
+        title: Optional[str] = None,
+        image_urls: Optional[List[str]] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        """
+        Store freshly scraped page text
+        """
+        key = canonical_url(url)
+        data = content.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            db = self._connect()
+            if db.execute("SELECT 1 FROM blobs WHERE hash = ?", (content_hash,)).fetchone():
+                self.deduplicated += 1
+            else:
+                path = self._blob_path(content_hash)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                db.execute("INSERT INTO blobs (hash, size) VALUES (?, ?)", (content_hash, len(data)))
+                self._total_bytes += len(data)
+
+            previous = db.execute("SELECT content_hash FROM pages WHERE url = ?", (key,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO pages"
+                " (url, content_hash, title, image_urls, etag, last_modified,"
+                "  fetched_at, validated_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, content_hash, title or "", json.dumps(image_urls or []),
+                 etag, last_modified, now, now, now),
+            )
+            if previous and previous[0] != content_hash:
+                self._release_blob(db, previous[0])
+            self.stores += 1
+
+            if self._total_bytes > self.max_bytes:
+                self._evict(db)
+            db.commit()
+
+    def mark_validated(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        Record that the origin confirmed a stored page is unchanged (304)
+        """
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "UPDATE pages SET validated_at = ?,"
+                " etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)"
+                " WHERE url = ?",
+                (time.time(), etag, last_modified, canonical_url(url)),
+            )
+            db.commit()
+            self.revalidated += 1
+
+    def _release_blob(self, db: sqlite3.Connection, content_hash: str):
+        """Delete a blob no page refers to any more"""
+        if db.execute("SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone():
+            return
+        row = db.execute("SELECT size FROM blobs WHERE hash = ?", (content_hash,)).fetchone()
+        db.execute("DELETE FROM blobs WHERE hash = ?", (content_hash,))
+        if row:
+            self._total_bytes -= row[0]
+        try:
+            os.remove(self._blob_path(content_hash))
+        except OSError:
+            pass
+
+    def _evict(self, db: sqlite3.Connection):
+        target = self.max_bytes * _EVICT_LOW_WATER
+        while self._total_bytes > target:
+            rows = db.execute(
+                "SELECT url, content_hash FROM pages ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for url, content_hash in rows:
+                db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self._release_blob(db, content_hash)
+                self.evictions += 1
+                if self._total_bytes <= target:
+                    break
+
+    def clear(self):
+        """
+        Drop every stored page
+        """
+        with self._lock:
+            db = self._connect()
+            for (content_hash,) in db.execute("SELECT hash FROM blobs").fetchall():
+                try:
+                    os.remove(self._blob_path(content_hash))
+                except OSError:
+                    pass
+            db.execute("DELETE FROM pages")
+            db.execute("DELETE FROM blobs")
+            db.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get store size and hit/revalidation counters
+        """
+        with self._lock:
+            db = self._connect()
+            pages = db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            blobs = db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            total_bytes = self._total_bytes
+
+        lookups = self.hits + self.stale + self.misses
+        return {
+            "enabled": self.enabled,
+            "pages": pages,
+            "blobs": blobs,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "changed": self.changed,
+            "stores": self.stores,
+            "deduplicated": self.deduplicated,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.revalidated) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class _RecordingSession:
+    """
+    Proxy for the scraper's requests session that keeps the validators
+    of the page being scraped
+    """
+
+    def __init__(self, session, url: str):
+        self._session = session
+        self._url = url
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+
+    def get(self, url, *args, **kwargs):
+        response = self._session.get(url, *args, **kwargs)
+        if url == self._url and response.status_code == 200:
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def _conditional_get(session, url: str, page: StoredPage):
+    """
+    Ask the origin whether a stored page changed, without downloading it
+
+    Returns:
+        (not_modified, etag, last_modified)
+    """
+    headers = {}
+    if page.etag:
+        headers["If-None-Match"] = page.etag
+    if page.last_modified:
+        headers["If-Modified-Since"] = page.last_modified
+    with session.get(url, headers=headers, timeout=REVALIDATE_TIMEOUT, stream=True) as response:
+        return (
+            response.status_code == 304,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+
+_hook_installed = False
+
+
+def install_scraper_hook(store: Optional[PageStore] = None) -> bool:
+    """
+    Serve gpt-researcher's scraper from the page store
+
+    Wraps `Scraper.extract_data_from_url`: fresh pages are returned
+    without any request, stale pages with validators are revalidated
+    with a conditional GET, everything else is scraped as usual and
+    stored. Safe to call more than once.
+    """
+    global _hook_installed
+    if _hook_installed:
+        return True
+
+    try:
+        from gpt_researcher.scraper.scraper import Scraper
+    except ImportError as e:
+        logger.warning(f"Page store disabled, gpt-researcher scraper not found: {e}")
+        return False
+
+    store = store or page_store
+    original = Scraper.extract_data_from_url
+
+    async def extract_data_from_url(self, link, session):
+        if not store.enabled:
+            return await original(self, link, session)
+
+        try:
+            page = await asyncio.to_thread(store.get, link)
+        except Exception as e:
+            logger.warning(f"Page store lookup failed for {link}: {e}")
+            return await original(self, link, session)
+
+        if page is not None:
+            if store.is_fresh(page):
+                return page.as_scraped(link)
+            if page.etag or page.last_modified:
+                try:
+                    not_modified, etag, last_modified = await asyncio.to_thread(
+                        _conditional_get, session, link, page
+                    )
+                except Exception as e:
+                    logger.debug(f"Revalidating {link} failed: {e}")
+                    not_modified = False
+                if not_modified:
+                    await asyncio.to_thread(store.mark_validated, link, etag, last_modified)
+                    return page.as_scraped(link)
+                store.changed += 1
+
+        recorder = _RecordingSession(session, link)
+        result = await original(self, link, recorder)
+        if result.get("raw_content"):
+            try:
+                await asyncio.to_thread(
+                    store.put,
+                    link,
+                    result["raw_content"],
+                    result.get("title"),
+                    result.get("image_urls"),
+                    recorder.etag,
+                    recorder.last_modified,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to store scraped page {link}: {e}")
+        return result
+
+    Scraper.extract_data_from_url = extract_data_from_url
+    _hook_installed = True
+    return True
+
+
+# Global page store instance
+page_store = PageStore()
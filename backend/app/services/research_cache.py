@@ -0,0 +1,239 @@
+"""Completed Research Result Cache
+
+Serves the report/sources/context of an identical, recently completed
+research instead of re-running the whole gpt-researcher pipeline.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from app.core.config import settings
+
+# Bump when the cached payload layout changes so stale entries are ignored
+CACHE_KEY_VERSION = 1
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " ?？!！.。,，;；"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a research query for cache lookups
+
+    - Unicode NFKC (full-width -> half-width)
+    - case-insensitive
+    - whitespace collapsed
+    - trailing punctuation ignored
+    """
+    text = unicodedata.normalize("NFKC", query or "")
+    text = _WHITESPACE_RE.sub(" ", text).strip().casefold()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def _normalize_text(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return _WHITESPACE_RE.sub(" ", str(value)).strip().casefold() or None
+
+
+def _normalize_url(url: str) -> str:
+    """Lowercase scheme/host, drop fragment and trailing slash"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def _normalize_set(values: Optional[Iterable[Any]], normalizer=str) -> Optional[list]:
+    if not values:
+        return None
+    return sorted({normalizer(v) for v in values if v not in (None, "")}) or None
+
+
+def build_cache_key(
+    query: str,
+    report_type: Optional[str] = "research_report",
+    report_format: Optional[str] = "markdown",
+    tone: Optional[str] = None,
+    language: Optional[str] = None,
+    report_source: Optional[str] = "web",
+    source_urls: Optional[Iterable[str]] = None,
+    complement_source_urls: bool = False,
+    document_ids: Optional[Iterable[Any]] = None,
+    max_subtopics: Optional[int] = None,
+    total_words: Optional[int] = None,
+) -> str:
+    """
+    Build a stable cache key from a query and its research parameters
+
+    Source URLs and document ids are treated as sets, so their order does
+    not affect the key.
+    """
+    if hasattr(report_source, "value"):
+        report_source = report_source.value
+
+    payload = {
+        "v": CACHE_KEY_VERSION,
+        "query": normalize_query(query),
+        "report_type": _normalize_text(report_type) or "research_report",
+        "report_format": _normalize_text(report_format) or "markdown",
+        "tone": _normalize_text(tone),
+        "language": _normalize_text(language),
+        "report_source": _normalize_text(report_source) or "web",
+        "source_urls": _normalize_set(source_urls, _normalize_url),
+        "complement_source_urls": bool(complement_source_urls) if source_urls else False,
+        "document_ids": _normalize_set(document_ids),
+        "max_subtopics": max_subtopics,
+        "total_words": total_words,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return "research:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_key_for_research(research) -> str:
+    """
+    Build the cache key for a Research database row
+
+    Rows do not record a source set, the executor always researches the web.
+    """
+    return build_cache_key(
+        query=research.query,
+        report_type=research.report_type,
+        report_format=research.report_format,
+        tone=research.tone,
+        language=research.language,
+        max_subtopics=research.max_subtopics,
+        total_words=research.total_words,
+    )
+
+
+class ResearchResultCache:
+    """
+    In-process TTL + LRU cache of completed research results
+
+    Thread-safe, research runs in background threads as well as on the
+    main event loop.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, max_entries: int = 500, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        # {key: (expires_at, payload)}
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.bypasses = 0
+        self.refreshes = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached result, or None on miss/expiry
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(payload)
+
+    def set(self, key: str, payload: Dict[str, Any], ttl_seconds: Optional[int] = None):
+        """
+        Store a completed result, evicting least recently used entries
+        """
+        if not self.enabled or not payload.get("report"):
+            return
+
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        entry = dict(payload)
+        entry.setdefault("cached_at", time.time())
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def lookup(self, key: str, bypass: bool = False, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached result honouring the request's bypass/refresh flags
+
+        - bypass: skip the cache entirely (no read, no write)
+        - refresh: skip the read, the new result overwrites the entry
+        """
+        if bypass:
+            with self._lock:
+                self.bypasses += 1
+            return None
+        if refresh:
+            with self._lock:
+                self.refreshes += 1
+            return None
+        return self.get(key)
+
+    def invalidate(self, key: str) -> bool:
+        """
+        Remove a single entry
+        """
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        """
+        Remove all entries
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "bypasses": self.bypasses,
+                "refreshes": self.refreshes,
+            }
+
+
+# Global research result cache instance
+research_cache = ResearchResultCache(
+    ttl_seconds=settings.RESEARCH_CACHE_TTL,
+    max_entries=settings.RESEARCH_CACHE_MAX_ENTRIES,
+    enabled=settings.RESEARCH_CACHE_ENABLED,
+)
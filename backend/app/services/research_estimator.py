@@ -0,0 +1,333 @@
+"""Research Cost and Duration Estimator
+
+Fits cost, duration and query count per (report_type, report_source) on
+completed research history and serves estimates from memory. Groups
+without enough history fall back to the built-in defaults.
+"""
+
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fewest samples a group needs before its fitted model is used
+MIN_SAMPLES = 5
+
+# Central coverage of the reported intervals
+INTERVAL_LOW = 0.05
+INTERVAL_HIGH = 0.95
+
+TARGETS = ("cost", "minutes", "queries")
+
+
+@dataclass
+class ResearchSample:
+    """One completed research"""
+    report_type: str
+    report_source: str
+    query_length: int
+    cost: float
+    minutes: float
+    queries: Optional[int] = None
+
+
+def prior_estimate(
+    report_type: str,
+    report_source: Optional[str] = "web",
+    source_urls: Optional[Sequence[str]] = None,
+    complement_source_urls: bool = False,
+    document_ids: Optional[Sequence] = None,
+) -> Dict[str, float]:
+    """
+    Built-in estimate used until enough history exists
+    """
+    cost, minutes, queries = 0.15, 2.0, 10.0
+
+    if report_type == "deep":
+        cost, minutes, queries = 0.40, 8.0, 75.0
+    elif report_type == "multi_agent":
+        cost, minutes, queries = 0.80, 20.0, 150.0
+
+    # Given URLs and local documents need little or no searching
+    if report_source == "static" and source_urls:
+        if not complement_source_urls:
+            cost, minutes, queries = cost * 0.4, minutes * 0.6, len(source_urls) * 2
+        else:
+            cost, minutes = cost * 0.7, minutes * 0.8
+    elif report_source == "local" and document_ids:
+        cost, minutes, queries = cost * 0.2, minutes * 0.5, 0
+    elif report_source == "hybrid":
+        if source_urls:
+            cost, minutes, queries = cost * 0.5, minutes * 0.7, len(source_urls)
+        else:
+            cost, minutes, queries = cost * 0.2, minutes * 0.5, 0
+
+    return {"cost": cost, "minutes": minutes, "queries": queries}
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+class _LinearFit:
+    """
+    y = intercept + slope * log1p(query_length), with residual quantiles
+    """
+
+    def __init__(self, xs: List[float], ys: List[float]):
+        n = len(xs)
+        mean_x = sum(xs) / n
+        mean_y = sum(ys) / n
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x > 1e-9:
+            self.slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+        else:
+            self.slope = 0.0
+        self.intercept = mean_y - self.slope * mean_x
+        self.samples = n
+
+        residuals = sorted(y - self.predict_x(x) for x, y in zip(xs, ys))
+        self.low = _quantile(residuals, INTERVAL_LOW)
+        self.high = _quantile(residuals, INTERVAL_HIGH)
+
+    def predict_x(self, x: float) -> float:
+        return self.intercept + self.slope * x
+
+    def predict(self, query_length: int) -> Tuple[float, float, float]:
+        value = self.predict_x(math.log1p(query_length))
+        return max(value, 0.0), max(value + self.low, 0.0), max(value + self.high, 0.0)
+
+
+def load_completed_samples(limit: int = settings.RESEARCH_ESTIMATOR_MAX_SAMPLES) -> List[ResearchSample]:
+    """
+    Read the most recent completed researches from the database
+
+    Research rows do not record a source set, they are all web researches.
+    """
+    from app.core.database import SessionLocal
+    from app.models.database import Research
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(
+                Research.report_type,
+                Research.query,
+                Research.cost,
+                Research.started_at,
+                Research.completed_at,
+                Research.completed_queries,
+            )
+            .filter(
+                Research.status == "completed",
+                Research.started_at.isnot(None),
+                Research.completed_at.isnot(None),
+                Research.cost > 0,  # cache hits cost nothing and took no time
+            )
+            .order_by(Research.completed_at.desc())
+            .limit(limit)
+            .all()
+        )
+    finally:
+        db.close()
+
+    return [
+        ResearchSample(
+            report_type=row.report_type or "research_report",
+            report_source="web",
+            query_length=len(row.query or ""),
+            cost=row.cost or 0.0,
+            minutes=(row.completed_at - row.started_at).total_seconds() / 60,
+            queries=row.completed_queries or None,
+        )
+        for row in rows
+    ]
+
+
+class ResearchEstimator:
+    """
+    In-memory estimator refit in the background
+
+    History comes from `loader` (completed Research rows) plus samples
+    reported with `observe`, for backends that keep no database.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[], List[ResearchSample]]] = load_completed_samples,
+        refit_interval: int = settings.RESEARCH_ESTIMATOR_REFIT_INTERVAL,
+        max_samples: int = settings.RESEARCH_ESTIMATOR_MAX_SAMPLES,
+    ):
+        self.loader = loader
+        self.refit_interval = refit_interval
+        self.max_samples = max_samples
+
+        self._observed: List[ResearchSample] = []
+        self._models: Dict[Tuple[str, str], Dict[str, _LinearFit]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._refit_now = threading.Event()
+
+        self.fitted_at: Optional[float] = None
+        self.sample_count = 0
+        self.fits = 0
+        self.errors = 0
+
+    def start(self):
+        """
+        Start the background refit thread
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="research-estimator", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.refit()
+            self._refit_now.wait(self.refit_interval)
+            self._refit_now.clear()
+
+    def request_refit(self):
+        """
+        Refit in the background without waiting for the interval
+        """
+        self._refit_now.set()
+
+    def observe(self, sample: ResearchSample):
+        """
+        Add a completed research, picked up by the next refit
+        """
+        with self._lock:
+            self._observed.append(sample)
+            if len(self._observed) > self.max_samples:
+                del self._observed[: len(self._observed) - self.max_samples]
+
+    def refit(self):
+        """
+        Fit all groups from the loader and observed samples
+        """
+        samples: List[ResearchSample] = []
+        if self.loader is not None:
+            try:
+                samples.extend(self.loader())
+            except Exception as e:
+                self.errors += 1
+                logger.debug(f"Could not load research history: {e}")
+        with self._lock:
+            samples.extend(self._observed)
+
+        self.fit(samples)
+
+    def fit(self, samples: List[ResearchSample]):
+        """
+        Replace the models with ones fitted on `samples`
+        """
+        groups: Dict[Tuple[str, str], List[ResearchSample]] = {}
+        for sample in samples:
+            groups.setdefault((sample.report_type, sample.report_source or "web"), []).append(sample)
+
+        models: Dict[Tuple[str, str], Dict[str, _LinearFit]] = {}
+        for key, group in groups.items():
+            fits = {}
+            for target in TARGETS:
+                points = [
+                    (math.log1p(s.query_length), getattr(s, target))
+                    for s in group
+                    if getattr(s, target) is not None
+                ]
+                if len(points) >= MIN_SAMPLES:
+                    fits[target] = _LinearFit([x for x, _ in points], [y for _, y in points])
+            if fits:
+                models[key] = fits
+
+        with self._lock:
+            self._models = models
+            self.sample_count = len(samples)
+            self.fitted_at = time.time()
+            self.fits += 1
+
+    def estimate(
+        self,
+        query: str,
+        report_type: str = "research_report",
+        report_source: Optional[str] = "web",
+        source_urls: Optional[Sequence[str]] = None,
+        complement_source_urls: bool = False,
+        document_ids: Optional[Sequence] = None,
+    ) -> dict:
+        """
+        Estimate cost (USD), duration (minutes) and query count
+
+        Returns:
+            dict with point estimates, 90% intervals for fitted targets
+            and the number of samples behind each of them
+        """
+        self.start()
+        prior = prior_estimate(
+            report_type, report_source, source_urls, complement_source_urls, document_ids
+        )
+        scale = {target: 1.0 for target in TARGETS}
+        with self._lock:
+            fits = self._models.get((report_type, report_source or "web"), {})
+            basis = "history" if fits else "default"
+            if not fits and (report_source or "web") != "web":
+                # No history for this source mode: scale the web fit by
+                # the default source-mode ratio
+                fits = self._models.get((report_type, "web"), {})
+                if fits:
+                    basis = "history_scaled"
+                    web_prior = prior_estimate(report_type)
+                    scale = {
+                        target: prior[target] / web_prior[target] if web_prior[target] else 0.0
+                        for target in TARGETS
+                    }
+
+        result = {"basis": basis, "samples": 0}
+        for target in TARGETS:
+            fit = fits.get(target)
+            if fit is None:
+                result[target] = prior[target]
+                result[f"{target}_interval"] = None
+            else:
+                value, low, high = (v * scale[target] for v in fit.predict(len(query or "")))
+                result[target] = value
+                result[f"{target}_interval"] = [low, high]
+                result["samples"] = max(result["samples"], fit.samples)
+        return result
+
+    def stats(self) -> dict:
+        """
+        Get fitted groups and refit counters
+        """
+        with self._lock:
+            return {
+                "samples": self.sample_count,
+                "observed": len(self._observed),
+                "fitted_at": self.fitted_at,
+                "fits": self.fits,
+                "errors": self.errors,
+                "groups": {
+                    f"{report_type}/{source}": {
+                        target: fit.samples for target, fit in fits.items()
+                    }
+                    for (report_type, source), fits in self._models.items()
+                },
+            }
+
+
+research_estimator = ResearchEstimator()
@@ -0,0 +1,275 @@
+"""Bounded In-process Research Scheduler
+
+All researches run as tasks on a single dedicated event loop with a fixed
+number of workers. Queued jobs are ordered by priority so standard
+reports are not stuck behind long deep/multi-agent runs, and admission is
+refused once the queue is full.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Lower value runs first
+REPORT_TYPE_PRIORITY = {
+    "deep": 1,
+    "multi_agent": 1,
+}
+DEFAULT_PRIORITY = 0
+
+# Assumed job duration before any job of a priority has finished
+DEFAULT_JOB_SECONDS = {0: 120.0, 1: 600.0}
+
+
+class SchedulerFull(Exception):
+    """
+    Research was not admitted
+
+    `status_code` is 429 when the submitting user has too many queued
+    researches and 503 when the whole queue is full.
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    job_id: Any = field(compare=False)
+    user_id: Any = field(compare=False)
+    factory: Callable[[], Awaitable[Any]] = field(compare=False)
+    submitted_at: float = field(compare=False, default_factory=time.monotonic)
+
+
+def priority_for(report_type: Optional[str]) -> int:
+    return REPORT_TYPE_PRIORITY.get(report_type or "", DEFAULT_PRIORITY)
+
+
+class ResearchScheduler:
+    """
+    Priority job queue drained by a fixed pool of workers on one loop
+
+    `submit` may be called from any thread; jobs are coroutine factories
+    executed on the scheduler's own event loop thread.
+    """
+
+    def __init__(self, workers: int = 2, max_queue_depth: int = 50, max_queued_per_user: int = 10):
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.max_queued_per_user = max_queued_per_user
+
+        self._heap: List[_Job] = []
+        self._running: Dict[Any, _Job] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+        # Exponentially weighted job duration per priority, for retry hints
+        self._avg_seconds: Dict[int, float] = dict(DEFAULT_JOB_SECONDS)
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """
+        The scheduler's event loop, started on first use
+        """
+        self.start()
+        return self._loop
+
+    def start(self):
+        """
+        Start the scheduler thread and its workers
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run_loop, name="research-scheduler", daemon=True
+                )
+                self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        for i in range(self.workers):
+            loop.create_task(self._worker(i))
+        self._ready.set()
+        loop.run_forever()
+
+    def _retry_after(self, priority: int) -> int:
+        # Rough time until a worker frees up for a job queued now
+        depth = len(self._heap)
+        rounds = math.ceil((depth + 1) / max(self.workers, 1))
+        return max(1, int(rounds * self._avg_seconds.get(priority, DEFAULT_JOB_SECONDS[0])))
+
+    def check_admission(self, user_id: Any = None, report_type: Optional[str] = None):
+        """
+        Raise SchedulerFull if a new job would not be admitted
+        """
+        with self._lock:
+            self._check_admission(user_id, priority_for(report_type))
+
+    def _check_admission(self, user_id: Any, priority: int):
+        if len(self._heap) >= self.max_queue_depth:
+            self.rejected += 1
+            raise SchedulerFull(
+                f"Research queue is full ({len(self._heap)} waiting)",
+                status_code=503,
+                retry_after=self._retry_after(priority),
+            )
+        if user_id is not None:
+            queued = sum(1 for job in self._heap if job.user_id == user_id)
+            if queued >= self.max_queued_per_user:
+                self.rejected += 1
+                raise SchedulerFull(
+                    f"Too many queued researches ({queued}) for this user",
+                    status_code=429,
+                    retry_after=self._retry_after(priority),
+                )
+
+    def submit(
+        self,
+        job_id: Any,
+        factory: Callable[[], Awaitable[Any]],
+        report_type: Optional[str] = None,
+        user_id: Any = None,
+    ) -> int:
+        """
+        Queue a job
+
+        Args:
+            job_id: Identifier used for position lookups (research id)
+            factory: Zero-argument callable returning the coroutine to run
+            report_type: Determines the job's priority
+            user_id: Owner, for the per-user queue limit
+
+        Returns:
+            1-based position in the queue
+        """
+        loop = self.loop
+        priority = priority_for(report_type)
+        with self._lock:
+            self._check_admission(user_id, priority)
+            job = _Job(priority, next(self._seq), job_id, user_id, factory)
+            heapq.heappush(self._heap, job)
+            self.submitted += 1
+            position = self._position(job_id)
+
+        loop.call_soon_threadsafe(self._wakeup.set)
+        return position
+
+    def _position(self, job_id: Any) -> Optional[int]:
+        for index, job in enumerate(sorted(self._heap)):
+            if job.job_id == job_id:
+                return index + 1
+        return None
+
+    def queue_position(self, job_id: Any) -> Optional[int]:
+        """
+        1-based queue position, or None if the job is not waiting
+        """
+        with self._lock:
+            return self._position(job_id)
+
+    def discard(self, job_id: Any) -> bool:
+        """
+        Remove a job that has not started yet
+        """
+        with self._lock:
+            for index, job in enumerate(self._heap):
+                if job.job_id == job_id:
+                    self._heap.pop(index)
+                    heapq.heapify(self._heap)
+                    return True
+        return False
+
+    async def _worker(self, index: int):
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                job = heapq.heappop(self._heap) if self._heap else None
+                if job is not None:
+                    self._running[job.job_id] = job
+
+            if job is None:
+                await self._wakeup.wait()
+                continue
+
+            started = time.monotonic()
+            logger.info(
+                f"Worker {index} starting job {job.job_id} "
+                f"(waited {started - job.submitted_at:.1f}s)"
+            )
+            # Each job is its own task so it can be cancelled without
+            # taking the worker down with it
+            task = asyncio.create_task(job.factory())
+            try:
+                await asyncio.wait([task])
+                if task.cancelled():
+                    self.cancelled += 1
+                    logger.info(f"Scheduled job {job.job_id} cancelled")
+                elif task.exception() is not None:
+                    self.failed += 1
+                    logger.error(f"Scheduled job {job.job_id} failed: {task.exception()}")
+                else:
+                    self.completed += 1
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self._running.pop(job.job_id, None)
+                    previous = self._avg_seconds.get(job.priority, elapsed)
+                    self._avg_seconds[job.priority] = 0.8 * previous + 0.2 * elapsed
+
+    def stats(self) -> dict:
+        """
+        Get queue depth, running jobs and counters
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "queued": len(self._heap),
+                "max_queue_depth": self.max_queue_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "rejected": self.rejected,
+                "avg_job_seconds": {
+                    str(priority): round(seconds, 1)
+                    for priority, seconds in self._avg_seconds.items()
+                },
+            }
+
+
+# Global research scheduler instance
+research_scheduler = ResearchScheduler(
+    workers=settings.RESEARCH_WORKERS,
+    max_queue_depth=settings.RESEARCH_MAX_QUEUE_DEPTH,
+    max_queued_per_user=settings.RESEARCH_MAX_QUEUED_PER_USER,
+)
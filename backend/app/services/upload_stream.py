@@ -0,0 +1,230 @@
+"""Streaming File Uploads
+
+Multipart uploads parsed straight from the request body stream instead
+of through `UploadFile`, which buffers the whole body before the handler
+runs. The file part is written to disk in UPLOAD_CHUNK_SIZE blocks from
+a worker thread, hashed while it is written, and abandoned as soon as it
+exceeds the size limit, so memory per upload stays at one block whatever
+the file size and the event loop never waits on disk I/O.
+"""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import settings
+
+# Multipart boundaries and part headers on top of the file itself
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadError(Exception):
+    """Malformed upload or rejected file, `status_code` is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UploadTooLarge(UploadError):
+    def __init__(self, max_size: int):
+        super().__init__(f"File exceeds the upload limit of {max_size} bytes", 413)
+        self.max_size = max_size
+
+
+@dataclass
+class ReceivedFile:
+    path: Path
+    filename: str
+    size: int
+    sha256: str
+    content_type: Optional[str] = None
+
+
+class _FileSink:
+    """Temporary file the part is written to, in blocks, from a worker thread"""
+
+    def __init__(self, directory: Path, chunk_size: int, max_size: int):
+        self.path = directory / f".upload-{uuid.uuid4().hex}.part"
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self._buffer = bytearray()
+        self._file = None
+
+    def feed(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(self.max_size)
+        self._buffer += data
+
+    @property
+    def full(self) -> bool:
+        return len(self._buffer) >= self.chunk_size
+
+    def _write(self, block: bytes):
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        self._file.write(block)
+        self.digest.update(block)
+
+    async def flush(self):
+        if self._buffer:
+            block, self._buffer = bytes(self._buffer), bytearray()
+            await asyncio.to_thread(self._write, block)
+
+    async def close(self):
+        await self.flush()
+        if self._file is None:  # empty file
+            await asyncio.to_thread(self._write, b"")
+        await asyncio.to_thread(self._file.close)
+
+    async def discard(self):
+        def remove():
+            if self._file is not None:
+                self._file.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+        await asyncio.to_thread(remove)
+
+
+async def receive_upload(
+    request,
+    directory: Path,
+    field: str = "file",
+    validate_filename: Optional[Callable[[str], None]] = None,
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> ReceivedFile:
+    """
+    Stream the `field` file of a multipart request into a temporary file in directory
+
+    The caller moves `ReceivedFile.path` to its final name (it is in the
+    same directory, so that is a rename) or deletes it.
+
+    Args:
+        request: Starlette request whose body has not been read
+        directory: Where the temporary file is written
+        field: Form field holding the file, other fields are ignored
+        validate_filename: Raises UploadError to reject a file by its name,
+            called before any of it is written
+        max_size: Largest accepted file in bytes, MAX_UPLOAD_SIZE by default
+        chunk_size: Bytes written to disk per block, UPLOAD_CHUNK_SIZE by default
+
+    Raises:
+        UploadTooLarge: Content-Length or the received file exceeds max_size
+        UploadError: Not a multipart request, no file in `field`, or
+            rejected by validate_filename
+    """
+    max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
+    chunk_size = max(chunk_size or settings.UPLOAD_CHUNK_SIZE, 64 * 1024)
+    content_type, options = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadError("Expected a multipart/form-data upload")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_size + _MULTIPART_OVERHEAD:
+        raise UploadTooLarge(max_size)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    state = {"headers": {}, "header_field": b"", "header_value": b"", "sink": None, "done": None}
+    errors = []
+
+    def on_part_begin():
+        state["headers"], state["sink"] = {}, None
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"], state["header_value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition"))
+        if state["done"] is not None or disposition.get(b"name", b"").decode("latin-1") != field:
+            return
+        filename = disposition.get(b"filename")
+        if filename is None:
+            errors.append(UploadError(f"Form field '{field}' is not a file"))
+            return
+        filename = Path(filename.decode("utf-8", "replace")).name
+        try:
+            if validate_filename:
+                validate_filename(filename)
+        except UploadError as e:
+            errors.append(e)
+            return
+        state["sink"] = _FileSink(directory, chunk_size, max_size)
+        state["filename"] = filename
+        state["content_type"] = state["headers"].get(b"content-type", b"").decode("latin-1") or None
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if state["sink"] is not None and not errors:
+            try:
+                state["sink"].feed(data[start:end])
+            except UploadTooLarge as e:
+                errors.append(e)
+
+    def on_part_end():
+        if state["sink"] is not None:
+            state["done"], state["sink"] = state["sink"], None
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    sink = None
+    try:
+        try:
+            async for data in request.stream():
+                parser.write(data)
+                if errors:
+                    raise errors[0]
+                sink = state["sink"] or state["done"]
+                if sink is not None and sink.full:
+                    await sink.flush()
+            parser.finalize()
+        except UploadError:
+            raise
+        except Exception as e:  # malformed body or client disconnected
+            raise UploadError(f"Malformed multipart upload: {e}") from e
+        if errors:
+            raise errors[0]
+        sink = state["done"]
+        if sink is None:
+            raise UploadError(f"No file in form field '{field}'")
+        await sink.close()
+    except BaseException:
+        for pending in {id(p): p for p in (sink, state["sink"], state["done"]) if p is not None}.values():
+            await pending.discard()
+        raise
+
+    return ReceivedFile(
+        path=sink.path,
+        filename=state["filename"],
+        size=sink.size,
+        sha256=sink.digest.hexdigest(),
+        content_type=state["content_type"],
+    )
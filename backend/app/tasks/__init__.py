@@ -1,8 +1,38 @@
 """Celery Tasks"""
 
 from celery import Celery
+from kombu import Queue
 from app.core.config import settings
 
+# Research queues by report type, each served by its own workers:
+#   celery -A app.tasks.celery_app worker -Q research_report
+#   celery -A app.tasks.celery_app worker -Q deep --concurrency=1
+RESEARCH_QUEUES = {
+    "research_report": {
+        "task": "execute_research",
+        "soft_time_limit": settings.CELERY_STANDARD_SOFT_TIME_LIMIT,
+        "time_limit": settings.CELERY_STANDARD_TIME_LIMIT,
+    },
+    "deep": {
+        "task": "execute_research_deep",
+        "soft_time_limit": settings.CELERY_DEEP_SOFT_TIME_LIMIT,
+        "time_limit": settings.CELERY_DEEP_TIME_LIMIT,
+    },
+    "multi_agent": {
+        "task": "execute_research_multi_agent",
+        "soft_time_limit": settings.CELERY_MULTI_AGENT_SOFT_TIME_LIMIT,
+        "time_limit": settings.CELERY_MULTI_AGENT_TIME_LIMIT,
+    },
+}
+
+
+def research_queue_for(report_type: str) -> str:
+    """
+    Get the queue for a report type (unknown types run as standard reports)
+    """
+    return report_type if report_type in RESEARCH_QUEUES else "research_report"
+
+
 # Create Celery app
 celery_app = Celery(
     "gpt_researcher",
@@ -23,4 +53,17 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=50,
+    task_queues=[Queue("default")] + [Queue(name) for name in RESEARCH_QUEUES],
+    task_default_queue="default",
+    task_routes={
+        config["task"]: {"queue": queue}
+        for queue, config in RESEARCH_QUEUES.items()
+    },
+    task_annotations={
+        config["task"]: {
+            "soft_time_limit": config["soft_time_limit"],
+            "time_limit": config["time_limit"],
+        }
+        for config in RESEARCH_QUEUES.values()
+    },
 )
@@ -1,40 +1,52 @@
 """Celery Research Tasks"""
 
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from app.tasks import celery_app, RESEARCH_QUEUES, research_queue_for
 from app.core.database import SessionLocal
+from app.models.database import Research
 from app.core.websocket.manager import websocket_manager
 from app.core.research.executor import execute_research_task
+from app.core.documents.pipeline import ingest_document
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(name="execute_research")
-def execute_research_celery_task(research_id: int):
+def run_research(research_id: int, bypass_cache: bool = False, refresh_cache: bool = False):
     """
-    Execute research task asynchronously
+    Run one research inside a Celery worker
 
-    This task is queued when a user creates a new research.
-    It runs the research using gpt-researcher and updates the database.
+    Shared by the per-report-type research tasks below.
     """
     logger.info(f"Starting Celery research task for research {research_id}")
 
     # Create database session
     db = SessionLocal()
 
-    try:
-        # Import asyncio and run the async executor
-        import asyncio
+    # Import asyncio and run the async executor
+    import asyncio
 
+    try:
         # Run the async research executor
         asyncio.run(execute_research_task(
             research_id=research_id,
             db_session=db,
-            websocket_manager=websocket_manager
+            websocket_manager=websocket_manager,
+            bypass_cache=bypass_cache,
+            refresh_cache=refresh_cache
         ))
 
         logger.info(f"Celery research task completed for research {research_id}")
 
+    except SoftTimeLimitExceeded:
+        logger.error(f"Celery research task timed out for research {research_id}")
+        _mark_failed(research_id)
+
+    except asyncio.CancelledError:
+        # Already recorded as cancelled by the executor
+        logger.info(f"Celery research task cancelled for research {research_id}")
+
     except Exception as e:
         logger.error(f"Celery research task failed for research {research_id}: {e}")
 
@@ -42,6 +54,86 @@ def execute_research_celery_task(research_id: int):
         db.close()
 
 
+def _mark_failed(research_id: int):
+    db = SessionLocal()
+    try:
+        research = db.query(Research).filter(Research.id == research_id).first()
+        if research and research.status in ("pending", "running"):
+            research.status = "failed"
+            db.commit()
+    finally:
+        db.close()
+
+
+@shared_task(name="execute_research")
+def execute_research_celery_task(research_id: int, bypass_cache: bool = False, refresh_cache: bool = False):
+    """
+    Execute a standard research (research_report queue)
+
+    This task is queued when a user creates a new research.
+    It runs the research using gpt-researcher and updates the database.
+    """
+    run_research(research_id, bypass_cache, refresh_cache)
+
+
+@shared_task(name="execute_research_deep")
+def execute_deep_research_celery_task(research_id: int, bypass_cache: bool = False, refresh_cache: bool = False):
+    """
+    Execute a deep research (deep queue)
+    """
+    run_research(research_id, bypass_cache, refresh_cache)
+
+
+@shared_task(name="execute_research_multi_agent")
+def execute_multi_agent_research_celery_task(research_id: int, bypass_cache: bool = False, refresh_cache: bool = False):
+    """
+    Execute a multi-agent research (multi_agent queue)
+    """
+    run_research(research_id, bypass_cache, refresh_cache)
+
+
+def enqueue_research(
+    research_id: int,
+    report_type: str,
+    bypass_cache: bool = False,
+    refresh_cache: bool = False
+):
+    """
+    Dispatch a research to the Celery queue for its report type
+
+    The task id is derived from the research id so the task can be
+    looked up or revoked later without storing it.
+    """
+    queue = research_queue_for(report_type)
+    task = celery_app.tasks[RESEARCH_QUEUES[queue]["task"]]
+    return task.apply_async(
+        kwargs={
+            "research_id": research_id,
+            "bypass_cache": bypass_cache,
+            "refresh_cache": refresh_cache,
+        },
+        queue=queue,
+        task_id=research_task_id(research_id),
+    )
+
+
+def revoke_research(research_id: int):
+    """
+    Keep a queued Celery research from starting
+
+    A research that is already running stops itself once its worker sees
+    the cancelled status.
+    """
+    celery_app.control.revoke(research_task_id(research_id))
+
+
+def research_task_id(research_id: int) -> str:
+    """
+    Celery task id for a research
+    """
+    return f"research-{research_id}"
+
+
 @shared_task(name="export_report")
 def export_report_task(research_id: int, export_format: str):
     """
@@ -64,27 +156,27 @@ def export_report_task(research_id: int, export_format: str):
     }
 
 
-@shared_task(name="process_document")
-def process_document_task(document_id: int):
+@shared_task(name="process_document", bind=True)
+def process_document_task(self, document_id: int, force: bool = False):
     """
     Process uploaded document
 
-    - Extract text content
-    - Split into chunks
-    - Vectorize and store
+    Streams the text out of the file, splits it into chunks, embeds them
+    in batches and writes them to the configured vector store. Progress
+    is reported as PROGRESS task state and on the Document row; running
+    it again for an unchanged document does nothing.
     """
     logger.info(f"Processing document {document_id}")
 
-    # TODO: Implement document processing
-    # - Get document from database
-    # - Extract text based on file type
-    # - Split into chunks
-    # - Generate embeddings
-    # - Store in vector database
+    def report(progress: dict):
+        self.update_state(state="PROGRESS", meta={"document_id": document_id, **progress})
+
+    result = ingest_document(document_id, on_progress=report, force=force)
 
     return {
         "document_id": document_id,
-        "status": "processed"
+        "status": result.status,
+        "chunk_count": result.chunk_count,
     }
 
 
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+文档目录（catalog）列表与查找基准测试
+
+在临时目录中生成 N 个文档文件，对比:
+- 旧做法: 每次请求 iterdir() + stat() 全部文件后在 Python 中排序；按 ID 查找时逐个扩展名 exists()
+- 文档目录: SQLite 索引上的键集分页（首页 / 深翻页 / 按类型 / 按上传者）和主键查找
+文档目录首次登记已有文件（计算哈希）的一次性耗时也一并给出。
+
+用法:
+    python scripts/bench_document_catalog.py [--files 100000] [--page 100] [--runs 20]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.document_store import ANONYMOUS, DocumentStore
+
+# 与 documents 接口的 FILE_TYPE_MAPPING 相同
+FILE_TYPES = {
+    '.pdf': 'pdf', '.txt': 'text', '.csv': 'csv', '.xlsx': 'excel', '.xls': 'excel', '.md': 'markdown',
+    '.ppt': 'powerpoint', '.pptx': 'powerpoint', '.docx': 'word', '.doc': 'word',
+}
+
+
+def create_files(path: Path, n: int, rng: np.random.Generator) -> list:
+    extensions = list(FILE_TYPES)
+    ids = []
+    for i in range(n):
+        doc_id = str(uuid.UUID(int=int(rng.integers(2 ** 63)) << 64 | i))
+        file_path = path / f"{doc_id}{extensions[i % len(extensions)]}"
+        file_path.write_bytes(f"document {i}\n".encode() * 8)
+        os.utime(file_path, (1_600_000_000 + i, 1_600_000_000 + i))
+        ids.append(doc_id)
+    return ids
+
+
+def scan_directory(path: Path) -> list:
+    """旧的 list_documents: 遍历目录、stat 每个文件、按修改时间排序"""
+    documents = []
+    for file_path in path.iterdir():
+        if file_path.is_file() and file_path.suffix.lower() in FILE_TYPES:
+            stat = file_path.stat()
+            documents.append((stat.st_mtime, file_path.stem, stat.st_size))
+    documents.sort(reverse=True)
+    return documents
+
+
+def probe_extensions(path: Path, doc_id: str):
+    """旧的 delete/download: 逐个扩展名检查文件是否存在"""
+    for ext in FILE_TYPES:
+        file_path = path / f"{doc_id}{ext}"
+        if file_path.exists():
+            return file_path
+    return None
+
+
+def timed(fn, runs: int):
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def report(name: str, result):
+    p50, p95 = result
+    print(f"  {name:<24} p50 {p50:9.3f} ms  p95 {p95:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文档目录列表与查找基准测试")
+    parser.add_argument("--files", type=int, default=100000, help="文档文件数")
+    parser.add_argument("--page", type=int, default=100, help="每页文档数")
+    parser.add_argument("--runs", type=int, default=20, help="每项测量次数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    path = Path(tempfile.mkdtemp(prefix="bench_catalog_"))
+    try:
+        started = time.perf_counter()
+        ids = create_files(path, args.files, rng)
+        print(f"📋 {args.files:,} 个文档文件 (生成 {time.perf_counter() - started:.1f}s)，每页 {args.page} 条\n")
+
+        lookups = [ids[i] for i in rng.integers(0, len(ids), args.runs)]
+
+        print("📊 旧做法（扫描目录）")
+        report("列出全部并排序", timed(lambda: scan_directory(path), max(args.runs // 4, 3)))
+        remaining = iter(lookups)
+        report("按 ID 查找文件", timed(lambda: probe_extensions(path, next(remaining)), args.runs))
+
+        store = DocumentStore(str(path))
+        started = time.perf_counter()
+        store.import_files(FILE_TYPES)
+        print(f"\n📊 文档目录（首次登记已有文件 {time.perf_counter() - started:.1f}s）")
+
+        report("首页", timed(lambda: store.page(args.page), args.runs))
+
+        # 翻到中间一页作为深翻页的游标
+        cursor = None
+        for _ in range(args.files // args.page // 2):
+            _, cursor = store.page(args.page, cursor)
+        report("深翻页（第 50% 处）", timed(lambda: store.page(args.page, cursor), args.runs))
+        report("按类型过滤", timed(lambda: store.page(args.page, file_type="pdf"), args.runs))
+        report("按上传者过滤", timed(lambda: store.page(args.page, owner=ANONYMOUS), args.runs))
+        remaining = iter(lookups)
+        report("按 ID 查找", timed(lambda: store.get(next(remaining)), args.runs))
+
+        walked, cursor, started = 0, None, time.perf_counter()
+        while True:
+            documents, cursor = store.page(1000, cursor)
+            walked += len(documents)
+            if cursor is None:
+                break
+        print(f"\n  分页遍历全部 {walked:,} 条（每页 1000）: {time.perf_counter() - started:.2f}s")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
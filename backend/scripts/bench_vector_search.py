@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+pgvector 向量检索基准测试
+
+在 DATABASE_URL 的临时表 bench_document_chunks 中逐步写入 1万 / 10万 / 100万 条
+随机（聚簇分布）向量，每个规模都用与 document_chunks 相同的 HNSW/IVFFlat 参数
+建索引，然后对不同的 ef_search（IVFFlat 为 probes）测量 top-k 的召回率和延迟。
+精确 top-k 在写入数据时流式计算，不需要把全部向量放进内存。
+
+用法:
+    python scripts/bench_vector_search.py [--sizes 10000,100000,1000000] [--dim 1536]
+        [--queries 100] [--k 10] [--ef 10,20,40,80,160] [--keep]
+
+提示: 100 万条 1536 维向量约 6GB，建 HNSW 索引需要较长时间，
+可以用 --dim 384 或调大 --maintenance-work-mem 加快测试。
+"""
+
+import argparse
+import io
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine
+from app.core.config import settings
+from app.core.documents.pgvector import vector_index_ddl, vector_index_options
+
+TABLE = "bench_document_chunks"
+INDEX = "ix_bench_document_chunks_embedding"
+BATCH = 20000
+CLUSTERS = 256
+
+
+class Corpus:
+    """按批生成可复现的聚簇向量（单位长度）"""
+
+    def __init__(self, dim: int, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.centers = rng.standard_normal((CLUSTERS, dim)).astype(np.float32)
+        self.seed = seed
+
+    def batch(self, start: int, n: int, stream: int = 0) -> np.ndarray:
+        rng = np.random.default_rng((self.seed, stream, start))
+        vectors = self.centers[rng.integers(0, CLUSTERS, n)] + rng.standard_normal((n, self.dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def queries(self, n: int) -> np.ndarray:
+        return self.batch(0, n, stream=1)
+
+
+def copy_binary(cursor, start: int, vectors: np.ndarray):
+    """用二进制 COPY 写入一批向量（比文本格式快一个数量级）"""
+    n, dim = vectors.shape
+    row = np.dtype([
+        ("fields", ">i2"),
+        ("id_len", ">i4"), ("id", ">i8"),
+        ("vec_len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("values", ">f4", (dim,)),
+    ])
+    rows = np.zeros(n, dtype=row)
+    rows["fields"] = 2
+    rows["id_len"] = 8
+    rows["id"] = np.arange(start, start + n)
+    rows["vec_len"] = 4 + 4 * dim
+    rows["dim"] = dim
+    rows["values"] = vectors
+    data = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0) + rows.tobytes() + struct.pack(">h", -1)
+    cursor.copy_expert(f"COPY {TABLE} (id, embedding) FROM STDIN WITH (FORMAT binary)", io.BytesIO(data))
+
+
+def update_truth(best_scores, best_ids, queries, vectors, start, k):
+    """把一批向量并入每个查询当前的精确 top-k"""
+    scores = queries @ vectors.T
+    ids = np.broadcast_to(np.arange(start, start + len(vectors)), scores.shape)
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_ids = np.concatenate([best_ids, ids], axis=1)
+    top = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(all_scores, top, 1), np.take_along_axis(all_ids, top, 1)
+
+
+def vector_literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def measure(cursor, queries, truth_ids, k, ef_values, index_type):
+    param = "ivfflat.probes" if index_type == "ivfflat" else "hnsw.ef_search"
+    literals = [vector_literal(q) for q in queries]
+    truth = [set(row) for row in truth_ids]
+    for ef in ef_values:
+        cursor.execute(f"SET {param} = {int(ef)}")
+        latencies, recalls = [], []
+        for literal, expected in zip(literals, truth):
+            started = time.perf_counter()
+            cursor.execute(
+                f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s::vector LIMIT %s", (literal, k)
+            )
+            got = [r[0] for r in cursor.fetchall()]
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(expected.intersection(got)) / k)
+        print(
+            f"  {param}={ef:<5} recall@{k} {np.mean(recalls):.3f}  "
+            f"p50 {np.percentile(latencies, 50):7.2f} ms  p95 {np.percentile(latencies, 95):7.2f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pgvector 向量检索基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="逐步测试的向量条数")
+    parser.add_argument("--dim", type=int, default=settings.PGVECTOR_DIMENSIONS, help="向量维度")
+    parser.add_argument("--queries", type=int, default=100, help="查询条数")
+    parser.add_argument("--k", type=int, default=10, help="top-k")
+    parser.add_argument("--ef", default="10,20,40,80,160", help="要测试的 ef_search（IVFFlat 为 probes）")
+    parser.add_argument("--index-type", default=settings.PGVECTOR_INDEX_TYPE, choices=["hnsw", "ivfflat"])
+    parser.add_argument("--maintenance-work-mem", default="1GB", help="建索引使用的 maintenance_work_mem")
+    parser.add_argument("--keep", action="store_true", help="测试结束后保留测试表")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    ef_values = [int(e) for e in args.ef.split(",")]
+    corpus = Corpus(args.dim)
+    queries = corpus.queries(args.queries)
+
+    engine = create_engine(settings.DATABASE_URL)
+    conn = engine.raw_connection()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    print(f"📋 {args.index_type} {vector_index_options(args.index_type)}，{args.dim} 维，{args.queries} 条查询，top-{args.k}\n")
+
+    try:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} (id bigint PRIMARY KEY, embedding vector({args.dim}))")
+        cursor.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+
+        best_scores = np.full((args.queries, args.k), -np.inf, dtype=np.float32)
+        best_ids = np.full((args.queries, args.k), -1, dtype=np.int64)
+        loaded = 0
+        for size in sizes:
+            started = time.perf_counter()
+            cursor.execute(f"DROP INDEX IF EXISTS {INDEX}")
+            while loaded < size:
+                n = min(BATCH, size - loaded)
+                vectors = corpus.batch(loaded, n)
+                copy_binary(cursor, loaded, vectors)
+                best_scores, best_ids = update_truth(best_scores, best_ids, queries, vectors, loaded, args.k)
+                loaded += n
+            load_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            cursor.execute(vector_index_ddl(TABLE, INDEX, args.index_type))
+            cursor.execute(f"ANALYZE {TABLE}")
+            build_seconds = time.perf_counter() - started
+            cursor.execute("SELECT pg_relation_size(%s::regclass)", (INDEX,))
+            index_mb = cursor.fetchone()[0] / 1024 / 1024
+
+            print(f"📊 {size:,} 条: 写入 {load_seconds:.1f}s，建索引 {build_seconds:.1f}s，索引 {index_mb:.0f} MB")
+            measure(cursor, queries, best_ids, args.k, ef_values, args.index_type)
+            print()
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
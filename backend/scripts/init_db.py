@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from sqlalchemy import create_engine, text, inspect
 from app.core.config import settings
-from app.models.database import Base
+from app.models.database import Base, VECTOR_TABLES
 
 
 def check_pgvector_extension(engine):
@@ -96,7 +96,16 @@ def init_database():
 
         # 创建所有表
         print("🔨 创建数据库表...")
-        Base.metadata.create_all(bind=engine)
+        vector_ready = False
+        if pgvector_ok:
+            from app.core.documents.pgvector import init_vector_store, INDEX_NAME
+            vector_ready = init_vector_store(engine)
+            if vector_ready:
+                print(f"✅ document_chunks 表和 {settings.PGVECTOR_INDEX_TYPE} 向量索引 {INDEX_NAME} 已就绪")
+        Base.metadata.create_all(bind=engine, tables=[
+            table for table in Base.metadata.sorted_tables
+            if vector_ready or table.name not in VECTOR_TABLES
+        ])
 
         # 检查新创建的表
         inspector = inspect(engine)
@@ -106,7 +115,7 @@ def init_database():
         print(f"📋 数据表: {', '.join(new_tables)}")
 
         # 如果使用 pgvector，显示额外信息
-        if pgvector_ok and settings.DATABASE_URL.startswith("postgresql"):
+        if vector_ready:
             print()
             print("✨ pgvector 功能可用")
             print("💡 知识库功能已启用，可以上传文档并进行语义搜索")
@@ -0,0 +1,37 @@
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Keep the default store paths of module-level instances out of the working tree
+_data = tempfile.mkdtemp(prefix="backend-tests-")
+for name, sub in (
+    ("DOC_PATH", "documents"),
+    ("VECTOR_STORE_PATH", "vectors"),
+    ("EMBEDDING_CACHE_PATH", "embeddings"),
+    ("PAGE_STORE_PATH", "pages"),
+):
+    os.environ.setdefault(name, os.path.join(_data, sub))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def documents_client():
+    """Test client for the documents router, loaded the way app.main loads it"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    spec = importlib.util.spec_from_file_location(
+        "documents", Path(__file__).parent.parent / "app" / "api" / "v1" / "endpoints" / "documents.py"
+    )
+    documents = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(documents)
+
+    app = FastAPI()
+    app.include_router(documents.router, prefix="/documents")
+    with TestClient(app) as client:
+        yield client
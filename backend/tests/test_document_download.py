@@ -0,0 +1,123 @@
+import hashlib
+
+import pytest
+
+from app.core.config import settings
+from app.services.file_download import parse_range
+
+CONTENT = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def document(documents_client, monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_INDEX_ON_UPLOAD", False)
+    response = documents_client.post("/documents/upload", files={"file": ("报告.pdf", CONTENT)})
+    assert response.status_code == 200
+    return response.json()
+
+
+def download(client, document, method="GET", **headers):
+    return client.request(method, f"/documents/{document['id']}/download", headers=headers)
+
+
+def test_full_download(documents_client, document):
+    response = download(documents_client, document)
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["etag"] == f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-disposition"] == "attachment; filename*=utf-8''%E6%8A%A5%E5%91%8A.pdf"
+
+
+def test_head_has_headers_but_no_body(documents_client, document):
+    response = download(documents_client, document, "HEAD")
+
+    assert response.status_code == 200
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert response.content == b""
+
+
+def test_byte_ranges(documents_client, document):
+    response = download(documents_client, document, range="bytes=100-199")
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(CONTENT)}"
+    assert response.content == CONTENT[100:200]
+
+    suffix = download(documents_client, document, range="bytes=-10")
+    assert suffix.status_code == 206
+    assert suffix.content == CONTENT[-10:]
+
+    open_ended = download(documents_client, document, range="bytes=10000-")
+    assert open_ended.content == CONTENT[10000:]
+
+
+def test_unsatisfiable_range(documents_client, document):
+    response = download(documents_client, document, range=f"bytes={len(CONTENT)}-")
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_if_range_with_stale_etag_sends_everything(documents_client, document):
+    response = download(documents_client, document, range="bytes=0-9", **{"if-range": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_conditional_requests(documents_client, document):
+    etag = download(documents_client, document, "HEAD").headers["etag"]
+
+    assert download(documents_client, document, **{"if-none-match": etag}).status_code == 304
+    assert download(documents_client, document, **{"if-none-match": f"W/{etag}"}).status_code == 304
+    assert download(documents_client, document, **{"if-none-match": '"other"'}).status_code == 200
+
+    last_modified = download(documents_client, document, "HEAD").headers["last-modified"]
+    assert download(documents_client, document, **{"if-modified-since": last_modified}).status_code == 304
+
+
+def test_offload_to_proxy(documents_client, document, monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_DOWNLOAD_OFFLOAD", "x-accel-redirect")
+    response = download(documents_client, document)
+    assert response.headers["x-accel-redirect"] == f"/internal/documents/{document['filename']}"
+    assert response.content == b""
+
+    monkeypatch.setattr(settings, "DOCUMENT_DOWNLOAD_OFFLOAD", "x-sendfile")
+    response = download(documents_client, document)
+    assert response.headers["x-sendfile"].endswith(document["filename"])
+    assert response.content == b""
+
+
+def test_unknown_document(documents_client):
+    response = documents_client.get("/documents/00000000-0000-0000-0000-000000000000/download")
+    assert response.status_code == 404
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9,20-29", 100) is None
+    assert parse_range("bytes=90-200", 100) == (90, 99)
+    assert parse_range("bytes=-200", 100) == (0, 99)
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+    with pytest.raises(ValueError):
+        parse_range("bytes=-0", 100)
+    with pytest.raises(ValueError):
+        parse_range("bytes=-5", 0)
+    with pytest.raises(ValueError):
+        parse_range("bytes=0-", 0)
+
+
+def test_range_of_empty_file(documents_client, monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_INDEX_ON_UPLOAD", False)
+    document = documents_client.post("/documents/upload", files={"file": ("empty.txt", b"")}).json()
+
+    response = download(documents_client, document, range="bytes=-5")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
+
+    response = download(documents_client, document)
+    assert response.status_code == 200
+    assert response.content == b""
@@ -0,0 +1,112 @@
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from app.core.documents.index import STATUS_READY, FaissDocumentIndex
+
+MODEL = "test:model"
+DIM = 16
+
+
+def vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def add_document(index, doc_key: str, seeds, user_id=None):
+    index.begin(doc_key, f"{doc_key}.txt", "fingerprint", user_id)
+    ids = index.add_chunks(doc_key, 0, [f"{doc_key} chunk {s}" for s in seeds])
+    index.finish(doc_key, ids, np.stack([vector(s) for s in seeds]))
+
+
+def top_doc(index, seed: int, **filters) -> str:
+    hits = index.search(vector(seed), 1, **filters)
+    return hits[0][0]["doc_key"] if hits else None
+
+
+@pytest.fixture
+def index(tmp_path):
+    return FaissDocumentIndex(MODEL, str(tmp_path), merge_threshold=10 ** 9)
+
+
+def test_search_spans_base_and_delta(index):
+    add_document(index, "a", [1, 2])
+    assert index.merge()
+    add_document(index, "b", [3, 4])
+
+    stats = index.stats()
+    assert stats["base_vectors"] == 2 and stats["delta_vectors"] == 2
+    assert top_doc(index, 1) == "a"
+    assert top_doc(index, 4) == "b"
+    assert top_doc(index, 1, doc_keys=["b"]) == "b"
+    assert index.documents()["a"]["status"] == STATUS_READY
+
+
+def test_removed_documents_are_excluded_before_and_after_merge(index):
+    add_document(index, "a", [1])
+    add_document(index, "b", [2])
+    assert index.merge()
+
+    assert index.remove("a")
+    assert top_doc(index, 1) == "b"
+    assert index.stats()["removed_vectors"] == 1
+
+    assert index.merge()
+    stats = index.stats()
+    assert stats["base_vectors"] == 1 and stats["removed_vectors"] == 0
+    assert top_doc(index, 1) == "b"
+
+
+def test_user_filter(index):
+    add_document(index, "mine", [1], user_id=1)
+    add_document(index, "theirs", [2], user_id=2)
+    assert top_doc(index, 2, user_id=1) == "mine"
+    assert top_doc(index, 2, user_id=3) is None
+
+
+def test_other_instances_see_writes_and_merges(tmp_path):
+    writer = FaissDocumentIndex(MODEL, str(tmp_path), merge_threshold=10 ** 9)
+    reader = FaissDocumentIndex(MODEL, str(tmp_path), merge_threshold=10 ** 9)
+
+    add_document(writer, "a", [1])
+    assert top_doc(reader, 1) == "a"
+
+    assert writer.merge()
+    add_document(writer, "b", [2])
+    assert top_doc(reader, 2) == "b"
+    assert reader.stats()["base_vectors"] == 1
+
+
+def test_concurrent_writers_and_background_merges(tmp_path):
+    index = FaissDocumentIndex(MODEL, str(tmp_path), merge_threshold=8)
+    errors = []
+
+    def write(worker: int):
+        try:
+            for i in range(10):
+                seed = worker * 100 + i
+                add_document(index, f"doc-{seed}", [seed])
+                if i % 3 == 2:
+                    index.remove(f"doc-{seed - 1}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if index._merge_thread is not None:
+        index._merge_thread.join()
+    index.merge()
+
+    assert not errors and index.merge_errors == 0
+    removed = {f"doc-{w * 100 + i - 1}" for w in range(4) for i in range(10) if i % 3 == 2}
+    kept = {f"doc-{w * 100 + i}" for w in range(4) for i in range(10)} - removed
+    assert set(index.documents()) == kept
+    stats = index.stats()
+    assert stats["base_vectors"] + stats["delta_vectors"] - stats["removed_vectors"] == len(kept)
+    for doc_key in kept:
+        assert top_doc(index, int(doc_key.split("-")[1])) == doc_key
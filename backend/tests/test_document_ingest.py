@@ -0,0 +1,120 @@
+import hashlib
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from app.core.config import settings
+from app.core.documents import pipeline
+from app.core.documents.index import STATUS_READY, DocumentBusy, FaissDocumentIndex
+
+DIM = 8
+
+
+class FakeEmbeddings:
+    """Deterministic embeddings that can hold a run inside its first batch"""
+
+    def __init__(self, hold: bool = False):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(10)
+        return [
+            np.frombuffer(hashlib.sha256(t.encode()).digest()[:DIM * 4], dtype=np.uint32).astype(np.float32)
+            for t in texts
+        ]
+
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    fake = FakeEmbeddings(hold=True)
+    monkeypatch.setattr(pipeline, "get_document_embeddings", lambda: fake)
+    return fake
+
+
+def write_document(tmp_path, name: str) -> str:
+    path = tmp_path / f"{name}.txt"
+    path.write_text(f"{name} paragraph.\n\n" * 300)
+    return str(path)
+
+
+def test_concurrent_ingests_of_one_document_run_once(tmp_path, embeddings):
+    path = write_document(tmp_path, "concurrent")
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda user: results.append(pipeline.ingest_file(path, user_id=user)), args=(u,))
+        for u in (1, 2)
+    ]
+    threads[0].start()
+    assert embeddings.started.wait(10)
+    threads[1].start()
+    embeddings.release.set()
+    for t in threads:
+        t.join()
+
+    assert sorted(r.status for r in results) == ["indexed", "unchanged"]
+    calls = embeddings.calls
+    state = pipeline.get_document_index().get_document("concurrent")
+    assert state["status"] == STATUS_READY
+    assert state["chunk_count"] == results[0].chunk_count > 0
+    assert state["user_id"] == 1
+
+    # Another owner reuses the indexed document as well
+    assert pipeline.ingest_file(path, user_id=3).status == "unchanged"
+    assert embeddings.calls == calls
+
+
+def test_index_refuses_a_second_live_run(tmp_path):
+    first = FaissDocumentIndex("test:busy", str(tmp_path))
+    second = FaissDocumentIndex("test:busy", str(tmp_path))
+
+    first.begin("doc", "doc.txt", "fingerprint")
+    with pytest.raises(DocumentBusy):
+        second.begin("doc", "doc.txt", "fingerprint")
+
+    first.fail("doc", "interrupted")
+    second.begin("doc", "doc.txt", "fingerprint")
+
+
+def test_stale_indexing_run_can_be_taken_over(tmp_path, monkeypatch):
+    index = FaissDocumentIndex("test:stale", str(tmp_path))
+    index.begin("doc", "doc.txt", "fingerprint")
+
+    monkeypatch.setattr(settings, "DOCUMENT_INDEX_STALE_AFTER", 0)
+    index.begin("doc", "doc.txt", "fingerprint")
+
+
+def test_reupload_while_indexing_does_not_start_another_ingest(documents_client, embeddings, monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_INDEX_ON_UPLOAD", True)
+    content = b"uploaded while indexing.\n\n" * 300
+    responses = {}
+
+    def upload(user_id):
+        responses[user_id] = documents_client.post(
+            "/documents/upload", params={"user_id": user_id}, files={"file": ("notes.txt", content)}
+        )
+
+    first = threading.Thread(target=upload, args=(1,))
+    first.start()
+    assert embeddings.started.wait(10)
+
+    upload(2)
+    embeddings.release.set()
+    first.join()
+
+    assert responses[1].json()["index_status"] == "pending"
+    second = responses[2].json()
+    assert second["deduplicated"] and second["index_status"] == "indexing"
+
+    state = pipeline.get_document_index().get_document(second["id"])
+    assert state["status"] == STATUS_READY
+    assert embeddings.calls == 1
@@ -0,0 +1,103 @@
+import hashlib
+import threading
+
+import pytest
+
+from app.services.document_store import ANONYMOUS, DocumentStore, document_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DocumentStore(str(tmp_path))
+
+
+def upload(store, content: bytes, owner=None, name="report.pdf"):
+    """Write a temp upload into the document directory and add it"""
+    temp = store.path / f".upload-{threading.get_ident()}-{hashlib.md5(content).hexdigest()}-{owner}"
+    store.path.mkdir(parents=True, exist_ok=True)
+    temp.write_bytes(content)
+    return store.add(temp, hashlib.sha256(content).hexdigest(), name, len(content), owner, "pdf")
+
+
+def test_identical_content_is_stored_once(store):
+    first = upload(store, b"same", owner=1)
+    second = upload(store, b"same", owner=2, name="copy.pdf")
+
+    assert first.created and not second.created
+    assert first.id == second.id == document_id(hashlib.sha256(b"same").hexdigest())
+    assert second.references == 2
+    assert [p.name for p in store.path.iterdir() if not p.name.startswith(".")] == [first.filename]
+    assert store.stats()["bytes_saved"] == 4
+
+
+def test_file_is_removed_with_the_last_reference(store):
+    doc = upload(store, b"shared", owner=1)
+    upload(store, b"shared", owner=1)
+    upload(store, b"shared", owner=2)
+    removed = []
+
+    assert store.release(doc.id, 1, removed.append) == 2
+    assert store.release(doc.id, 2, removed.append) == 1
+    assert store.release(doc.id, 2, removed.append) is None
+    assert doc.path.exists() and not removed
+
+    assert store.release(doc.id, 1, removed.append) == 0
+    assert removed == [doc.id]
+    assert not doc.path.exists()
+    assert store.get(doc.id) is None
+
+
+def test_owned_documents_include_shared_ones(store):
+    shared = upload(store, b"shared", owner=1)
+    upload(store, b"shared", owner=2)
+    own = upload(store, b"own", owner=2)
+
+    assert store.owned_documents(1) == [shared.id]
+    assert sorted(store.owned_documents(2)) == sorted([shared.id, own.id])
+    assert store.owned_documents(3) == []
+
+
+def test_release_without_owner_falls_back_to_the_only_owner(store):
+    doc = upload(store, b"mine", owner=5)
+    assert store.release(doc.id) == 0
+    assert store.get(doc.id) is None
+
+
+def test_release_without_owner_is_ambiguous_for_several_owners(store):
+    doc = upload(store, b"ours", owner=5)
+    upload(store, b"ours", owner=6)
+    assert store.release(doc.id) is None
+
+    upload(store, b"ours")
+    assert store.release(doc.id) == 2
+    assert sorted(store.owned_documents(5) + store.owned_documents(6)) == [doc.id, doc.id]
+    assert store.owned_documents(ANONYMOUS) == []
+
+
+def test_concurrent_uploads_and_releases_keep_counts(tmp_path):
+    # Separate stores behave like separate processes sharing the directory
+    stores = [DocumentStore(str(tmp_path)) for _ in range(4)]
+    content = b"contended"
+    doc_id = document_id(hashlib.sha256(content).hexdigest())
+    errors = []
+
+    def work(store, owner):
+        try:
+            for _ in range(20):
+                upload(store, content, owner)
+            for _ in range(10):
+                assert store.release(doc_id, owner) is not None
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(s, i)) for i, s in enumerate(stores)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    doc = stores[0].get(doc_id)
+    assert doc.references == 4 * 10
+    assert doc.path.read_bytes() == content
+    assert stores[0].stats()["documents"] == 1
@@ -0,0 +1,85 @@
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def no_indexing(monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_INDEX_ON_UPLOAD", False)
+
+
+def temp_files():
+    return [name for name in os.listdir(settings.DOC_PATH) if name.startswith(".upload")]
+
+
+def test_upload_is_stored_under_its_content_hash(documents_client):
+    content = b"upload test\n" * 1000
+    response = documents_client.post(
+        "/documents/upload", params={"user_id": 7}, files={"file": ("notes.md", content)}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["content_hash"] == hashlib.sha256(content).hexdigest()
+    assert body["file_size"] == len(content)
+    assert body["original_filename"] == "notes.md"
+    assert body["file_type"] == "markdown"
+    assert not body["deduplicated"]
+    assert Path(body["file_path"]).read_bytes() == content
+
+    again = documents_client.post("/documents/upload", files={"file": ("copy.md", content)}).json()
+    assert again["id"] == body["id"]
+    assert again["deduplicated"] and again["references"] == 2
+
+
+def test_upload_over_the_size_limit_is_rejected(documents_client, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 1024)
+    before = set(os.listdir(settings.DOC_PATH))
+
+    response = documents_client.post("/documents/upload", files={"file": ("big.txt", b"x" * 4096)})
+
+    assert response.status_code == 413
+    assert set(os.listdir(settings.DOC_PATH)) == before
+    assert not temp_files()
+
+
+def test_upload_of_unsupported_type_is_rejected(documents_client):
+    response = documents_client.post("/documents/upload", files={"file": ("run.exe", b"MZ")})
+
+    assert response.status_code == 400
+    assert not temp_files()
+
+
+def test_upload_without_file_is_rejected(documents_client):
+    response = documents_client.post("/documents/upload", data={"other": "field"})
+
+    assert response.status_code == 400
+
+
+def test_chunked_upload_over_the_size_limit_is_aborted(documents_client, monkeypatch):
+    # No Content-Length: the limit is enforced while the file streams in
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 64 * 1024)
+    boundary = "test-boundary"
+
+    def body():
+        yield (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="big.txt"\r\n'
+            "Content-Type: text/plain\r\n\r\n"
+        ).encode()
+        for _ in range(16):
+            yield b"x" * 16 * 1024
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    response = documents_client.post(
+        "/documents/upload",
+        content=body(),
+        headers={"content-type": f"multipart/form-data; boundary={boundary}"},
+    )
+
+    assert response.status_code == 413
+    assert not temp_files()
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache
+
+MODEL = "test:model"
+DIM = 256
+
+
+def vectors(start: int, n: int) -> dict:
+    rng = np.random.default_rng(start)
+    return {f"h{start + i}": rng.standard_normal(DIM).astype(np.float32).tolist() for i in range(n)}
+
+
+def test_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=10 ** 9)
+    items = vectors(0, 10)
+    cache.put_many(MODEL, items)
+    found = cache.get_many(MODEL, list(items) + ["missing"])
+    assert set(found) == set(items)
+    np.testing.assert_allclose(found["h3"], items["h3"], rtol=1e-6)
+
+
+def test_growth_by_another_process_is_never_truncated(tmp_path):
+    """A maps a small file, B doubles it, A's next growth must not shrink it"""
+    a = EmbeddingCache(str(tmp_path), max_bytes=10 ** 9)
+    b = EmbeddingCache(str(tmp_path), max_bytes=10 ** 9)
+    a.put_many(MODEL, vectors(0, 1000))  # 1024 rows, mapped by A
+    b.put_many(MODEL, vectors(1000, 1000))  # B grows it to 2048 rows
+    b.put_many(MODEL, vectors(2000, 100))  # and doubles it to 4096
+    path = os.path.join(str(tmp_path), "test_model", "vectors.f32")
+    grown = os.path.getsize(path)
+    assert grown == 4096 * DIM * 4
+
+    a.put_many(MODEL, vectors(2100, 200))  # needs 2300 rows, A still maps 1024
+    assert os.path.getsize(path) == grown
+
+    b.put_many(MODEL, vectors(2300, 1000))  # B writes beyond row 2300 through its map
+    expected = {**vectors(0, 1000), **vectors(1000, 1000), **vectors(2000, 100),
+                **vectors(2100, 200), **vectors(2300, 1000)}
+    for cache in (a, b):
+        found = cache.get_many(MODEL, list(expected))
+        assert set(found) == set(expected)
+        for h in ("h5", "h1500", "h2050", "h2200", "h3000"):
+            np.testing.assert_allclose(found[h], expected[h], rtol=1e-6)
+
+
+def test_eviction_reuses_rows(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=DIM * 4 * 100)
+    cache.put_many(MODEL, vectors(0, 100))
+    cache.put_many(MODEL, vectors(100, 50))
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert len(cache.get_many(MODEL, [f"h{i}" for i in range(100, 150)])) == 50
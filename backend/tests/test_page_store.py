@@ -0,0 +1,18 @@
+from app.services.page_store import canonical_url
+
+
+def test_tracking_parameters_are_dropped():
+    assert canonical_url("HTTPS://Example.com:443/a?utm_source=x&b=2&fbclid=1&a=1#top") == (
+        "https://example.com/a?a=1&b=2"
+    )
+
+
+def test_content_parameters_are_kept():
+    assert canonical_url("https://example.com/a?ref=main&ref_src=twsrc") == (
+        "https://example.com/a?ref=main&ref_src=twsrc"
+    )
+
+
+def test_trailing_slash_is_kept():
+    assert canonical_url("https://example.com/docs/") != canonical_url("https://example.com/docs")
+    assert canonical_url("https://example.com") == "https://example.com/"
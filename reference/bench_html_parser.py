@@ -0,0 +1,104 @@
+"""
+SearXNG HTML 结果页解析基准测试
+
+对比 searx_html 的各个解析后端（BeautifulSoup 完整解析 / 流式提前停止 / selectolax），
+并检查它们的解析结果与 BeautifulSoup 一致。
+
+用法:
+    python bench_html_parser.py [--results 100] [--max-results 10] [--rounds 50] [page.html ...]
+
+传入保存的 SearXNG 结果页（浏览器"另存为"或 curl 保存）时使用这些页面，
+否则生成一个结构与 SearXNG simple 主题相同的结果页。
+"""
+import argparse
+import html
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from searx_html import PARSERS
+
+
+def make_page(results: int) -> str:
+    """生成 SearXNG simple 主题风格的结果页"""
+    articles = []
+    for i in range(results):
+        url = f"https://example.com/articles/{i}?ref=searxng&amp;lang=zh"
+        articles.append(f"""
+<article class="result result-default category-general">
+  <a href="{url}" class="url_header" rel="noreferrer">
+    <div class="url_wrapper"><span class="url_o1"><span class="url_i1">https://example.com</span></span>
+    <span class="url_o2"><span class="url_i2"> › articles › {i}</span></span></div>
+  </a>
+  <a href="{url}" class="thumbnail_link" rel="noreferrer"><img class="thumbnail" src="/image_proxy?url=x{i}" loading="lazy"></a>
+  <h3><a href="{url}" rel="noreferrer">结果 <span class="highlight">{i}</span>: {html.escape("搜索 & 研究")} 标题</a></h3>
+  <div class="content">这是第 {i} 条结果的摘要，<span class="highlight">关键词</span>出现在这里。{"更多的描述文字。" * 8}</div>
+  <div class="engines"><span>google</span><span>bing</span><span>duckduckgo</span>
+    <a href="https://web.archive.org/web/{url}" class="cache_link" rel="noreferrer">cached</a></div>
+  <div class="break"></div>
+</article>""")
+
+    sidebar = "".join(
+        f'<div class="infobox"><h2>信息框 {i}</h2><p>{"侧栏内容 " * 40}</p></div>' for i in range(5)
+    )
+    return f"""<!DOCTYPE html>
+<html class="no-js theme-auto center-alignment-no" lang="zh">
+<head><meta charset="UTF-8"><title>query - SearXNG</title>
+<link rel="stylesheet" href="/static/themes/simple/css/searxng.min.css" type="text/css">
+<script src="/static/themes/simple/js/searxng.min.js"></script></head>
+<body class="results_endpoint">
+<main id="main_results" class="only_template_images">
+  <div id="results" class="">
+    <div id="sidebar">{sidebar}</div>
+    <div id="urls" role="main">{"".join(articles)}</div>
+    <nav id="pagination"><form action="/search" method="POST"><input type="hidden" name="q" value="query"></form></nav>
+  </div>
+</main>
+<footer><p>Powered by <a href="/info/en/about">SearXNG</a></p></footer>
+</body></html>"""
+
+
+def bench(parser, page: str, max_results: int, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parser(page, max_results)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SearXNG HTML 解析基准测试")
+    parser.add_argument("pages", nargs="*", help="保存的 SearXNG 结果页")
+    parser.add_argument("--results", type=int, default=100, help="生成页面中的结果条数")
+    parser.add_argument("--max-results", type=int, default=10, help="需要的结果数")
+    parser.add_argument("--rounds", type=int, default=50, help="每个页面解析次数")
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = []
+        for path in args.pages:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                pages.append((os.path.basename(path), f.read()))
+    else:
+        pages = [(f"生成页面（{args.results} 条结果）", make_page(args.results))]
+
+    for name, page in pages:
+        print(f"📄 {name}: {len(page) / 1024:.0f} KB，取前 {args.max_results} 条")
+        expected = PARSERS["bs4"](page, args.max_results)
+
+        baseline = None
+        for backend in ["bs4"] + [n for n in PARSERS if n != "bs4"]:
+            results = PARSERS[backend](page, args.max_results)
+            status = "✅" if results == expected else "❌ 结果与 BeautifulSoup 不一致"
+            elapsed = bench(PARSERS[backend], page, args.max_results, args.rounds)
+            baseline = baseline or elapsed
+            print(
+                f"  {backend:<11} {elapsed * 1000:8.2f} ms/页  "
+                f"{baseline / elapsed:6.1f}x  {len(results)} 条 {status}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
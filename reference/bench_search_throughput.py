@@ -0,0 +1,123 @@
+"""
+SearXNG MCP 搜索吞吐量基准测试
+
+启动一个本地假 SearXNG（固定延迟），对比：
+- 阻塞版：call_tool 中直接调用 requests.get（旧实现），并发调用实际串行执行
+- 异步版：SearXNGSearch 的 httpx 连接池 + 并发上限
+
+用法:
+    python bench_search_throughput.py [--requests 100] [--concurrency 20] [--delay 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SEARCH_CACHE_PATH", "")  # 基准测试不使用磁盘缓存
+
+
+def start_fake_searxng(delay: float) -> ThreadingHTTPServer:
+    """启动假 SearXNG：每个请求等待 delay 秒后返回 20 条 JSON 结果"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(delay)
+            body = json.dumps({
+                "results": [
+                    {"title": f"结果 {i}", "url": f"https://example.com/{i}", "content": "内容" * 20}
+                    for i in range(20)
+                ]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128  # 默认 5，并发连接多时会排队
+
+    httpd = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def blocking_search(url: str, query: str) -> str:
+    """旧实现：每次新建连接的阻塞请求"""
+    response = requests.get(
+        f"{url}/search",
+        params={"q": query, "language": "auto", "safesearch": 1, "format": "json"},
+        headers={"User-Agent": "Mozilla/5.0"},
+        timeout=15,
+    )
+    response.raise_for_status()
+    return response.text
+
+
+async def bench_blocking(url: str, total: int, concurrency: int) -> float:
+    """并发发起工具调用，但阻塞请求会卡住事件循环"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(i):
+        async with semaphore:
+            blocking_search(url, f"查询 {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def bench_async(url: str, total: int, concurrency: int) -> float:
+    from web_search_mcp import SearXNGSearch
+
+    client = SearXNGSearch(url, cache=None, max_connections=concurrency, max_concurrency=concurrency)
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(client.search(f"查询 {i}", 10) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.aclose()
+
+    errors = sum(1 for r in results if "搜索失败" in r)
+    if errors:
+        print(f"⚠️  异步版有 {errors} 个请求失败")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SearXNG 搜索吞吐量基准测试")
+    parser.add_argument("--requests", type=int, default=100, help="搜索请求总数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发调用数")
+    parser.add_argument("--delay", type=float, default=0.1, help="假 SearXNG 每个请求的延迟（秒）")
+    args = parser.parse_args()
+
+    httpd = start_fake_searxng(args.delay)
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    print(f"🔧 假 SearXNG: {url}，延迟 {args.delay * 1000:.0f}ms")
+    print(f"🔧 {args.requests} 个请求，并发 {args.concurrency}\n")
+
+    blocking = asyncio.run(bench_blocking(url, args.requests, args.concurrency))
+    print(f"阻塞 requests:   {blocking:7.2f}s  {args.requests / blocking:8.1f} 次/秒")
+
+    pooled = asyncio.run(bench_async(url, args.requests, args.concurrency))
+    print(f"异步 httpx 连接池: {pooled:7.2f}s  {args.requests / pooled:8.1f} 次/秒")
+
+    print(f"\n✅ 吞吐量提升 {blocking / pooled:.1f}x")
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
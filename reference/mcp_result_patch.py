@@ -29,11 +29,43 @@ def patch_mcp_research():
                 except:
                     return None
 
+            # Helper: Split a search_batch payload {"batch": [{"query", "results", "error"}]}
+            # into one flat result list, skipping failed queries and repeated URLs
+            def split_batch(parsed):
+                if not (isinstance(parsed, dict) and isinstance(parsed.get('batch'), list)):
+                    return None
+                items, seen = [], set()
+                for group in parsed['batch']:
+                    if not isinstance(group, dict):
+                        continue
+                    if group.get('error'):
+                        logging.getLogger(__name__).warning(
+                            f"Batched query '{group.get('query')}' failed: {group['error']}"
+                        )
+                        continue
+                    for item in group.get('results') or []:
+                        if not isinstance(item, dict):
+                            continue
+                        href = item.get("href", item.get("url"))
+                        if href and href in seen:
+                            continue
+                        seen.add(href)
+                        items.append({
+                            "title": item.get("title", f"Result from {tool_name}"),
+                            "href": href or f"mcp://{tool_name}",
+                            "body": item.get("body", item.get("content", str(item)))
+                        })
+                return items
+
             # Handle MCP TextContent format: {'type': 'text', 'text': '...', 'id': '...'}
             if isinstance(result, dict) and result.get('type') == 'text':
                 text_content = result.get('text', '')
-                # Try to parse as JSON array of search results
                 parsed = try_parse_json(text_content)
+                batch_results = split_batch(parsed)
+                if batch_results is not None:
+                    logging.getLogger(__name__).info(f"Patched method: Parsed {len(batch_results)} results from MCP search batch")
+                    return batch_results
+                # Try to parse as JSON array of search results
                 if parsed and isinstance(parsed, list):
                     for item in parsed:
                         if isinstance(item, dict):
@@ -59,7 +91,10 @@ def patch_mcp_research():
                     if isinstance(item, dict) and item.get('type') == 'text':
                         text_content = item.get('text', '')
                         parsed = try_parse_json(text_content)
-                        if parsed and isinstance(parsed, list):
+                        batch_results = split_batch(parsed)
+                        if batch_results is not None:
+                            search_results.extend(batch_results)
+                        elif parsed and isinstance(parsed, list):
                             for sub_item in parsed:
                                 if isinstance(sub_item, dict):
                                     search_results.append({
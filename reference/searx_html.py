@@ -0,0 +1,236 @@
+"""
+SearXNG HTML 结果页解析
+
+SearXNG 未开启 JSON 格式时返回 HTML 结果页，而我们只需要前 max_results 条结果。
+可选解析后端（环境变量 SEARCH_HTML_PARSER 选择，默认 auto）:
+- selectolax: C 实现的 HTML 解析器，需要 pip install selectolax
+- stream: 标准库 HTMLParser 流式扫描，不构建 DOM 树，凑够 max_results 条就停止
+- bs4: BeautifulSoup 完整解析，作为兜底
+
+auto 优先使用 selectolax，未安装时使用 stream；快速后端出错时回退到 bs4。
+所有后端与原来的 BeautifulSoup 实现结果一致：取前 max_results 个
+article.result，标题和链接来自第一个 h3 中的第一个 a，摘要来自 div.content。
+"""
+import os
+import sys
+from html.parser import HTMLParser
+from typing import Callable, Dict, List
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+
+def _has_class(attrs, name: str) -> bool:
+    for key, value in attrs:
+        if key == "class" and value and name in value.split():
+            return True
+    return False
+
+
+class _Done(Exception):
+    """已解析到足够的结果"""
+
+
+class _ResultScanner(HTMLParser):
+    """流式扫描 article.result，只记录需要的字段"""
+
+    # 这些标签内的文本不属于可见内容（与 BeautifulSoup.get_text 一致）
+    SKIP_TEXT = {"script", "style", "template"}
+
+    def __init__(self, max_results: int):
+        super().__init__(convert_charrefs=True)
+        self.max_results = max_results
+        self.results: List[dict] = []
+        self.articles = 0
+
+        self._article_depth = 0   # 当前所在 article.result 的嵌套层数
+        self._h3_seen = False     # 只看每个结果中的第一个 h3
+        self._in_h3 = 0
+        self._link = None         # {"href", "text"}，第一个 h3 中的第一个 a
+        self._in_link = 0
+        self._content = None      # div.content 的文本片段
+        self._content_depth = 0
+        self._skip = 0
+
+    def _start_article(self):
+        self._h3_seen = False
+        self._in_h3 = 0
+        self._link = None
+        self._in_link = 0
+        self._content = None
+        self._content_depth = 0
+
+    def _end_article(self):
+        self.articles += 1
+        if self._link is not None:
+            self.results.append({
+                "title": "".join(self._link["text"]).strip(),
+                "href": self._link["href"],
+                "body": "".join(self._content or []),
+            })
+        if self.articles >= self.max_results:
+            raise _Done()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TEXT:
+            self._skip += 1
+            return
+
+        if tag == "article":
+            if self._article_depth:
+                self._article_depth += 1
+            elif _has_class(attrs, "result"):
+                self._article_depth = 1
+                self._start_article()
+            return
+        if not self._article_depth:
+            return
+
+        if tag == "h3":
+            if self._in_h3:
+                self._in_h3 += 1
+            elif not self._h3_seen:
+                self._h3_seen = True
+                self._in_h3 = 1
+        elif tag == "a":
+            if self._in_link:
+                self._in_link += 1
+            elif self._in_h3 and self._link is None:
+                self._link = {"href": dict(attrs).get("href") or "", "text": []}
+                self._in_link = 1
+        elif tag == "div":
+            if self._content_depth:
+                self._content_depth += 1
+            elif self._content is None and _has_class(attrs, "content"):
+                self._content = []
+                self._content_depth = 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TEXT:
+            self._skip = max(0, self._skip - 1)
+            return
+        if not self._article_depth:
+            return
+
+        if tag == "article":
+            self._article_depth -= 1
+            if not self._article_depth:
+                self._end_article()
+        elif tag == "h3" and self._in_h3:
+            self._in_h3 -= 1
+        elif tag == "a" and self._in_link:
+            self._in_link -= 1
+        elif tag == "div" and self._content_depth:
+            self._content_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip or not self._article_depth:
+            return
+        if self._in_link:
+            self._link["text"].append(data)
+        if self._content_depth:
+            text = data.strip()
+            if text:
+                self._content.append(text)
+
+
+def parse_stream(html: str, max_results: int) -> List[dict]:
+    # 扫描器在结果结束时才检查数量，0 条要提前返回
+    if max_results <= 0:
+        return []
+    scanner = _ResultScanner(max_results)
+    try:
+        scanner.feed(html)
+        scanner.close()
+    except _Done:
+        pass
+    return scanner.results
+
+
+def parse_selectolax(html: str, max_results: int) -> List[dict]:
+    tree = SelectolaxParser(html)
+    formatted_results = []
+    for result in tree.css("article.result")[:max_results]:
+        h3 = result.css_first("h3")
+        if h3:
+            link = h3.css_first("a")
+            if link:
+                content_div = result.css_first("div.content")
+                if content_div:
+                    for node in content_div.css("script, style, template"):
+                        node.decompose()
+                formatted_results.append({
+                    "title": link.text().strip(),
+                    "href": link.attributes.get("href") or "",
+                    "body": content_div.text(strip=True) if content_div else "",
+                })
+    return formatted_results
+
+
+def parse_bs4(html: str, max_results: int) -> List[dict]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    results = soup.find_all("article", class_="result")
+
+    formatted_results = []
+    for result in results[:max_results]:
+        h3 = result.find("h3")
+        if h3:
+            link = h3.find("a")
+            if link:
+                # 获取内容
+                content_div = result.find("div", class_="content")
+                content = content_div.get_text(strip=True) if content_div else ""
+
+                formatted_results.append({
+                    "title": link.text.strip(),
+                    "href": link.get("href", ""),
+                    "body": content
+                })
+
+    return formatted_results
+
+
+PARSERS: Dict[str, Callable[[str, int], List[dict]]] = {
+    "stream": parse_stream,
+    "bs4": parse_bs4,
+}
+if SelectolaxParser is not None:
+    PARSERS["selectolax"] = parse_selectolax
+
+
+def register_parser(name: str, parser: Callable[[str, int], List[dict]]):
+    """注册自定义解析后端，parser(html, max_results) 返回结果列表"""
+    PARSERS[name] = parser
+
+
+def default_parser() -> str:
+    name = os.getenv("SEARCH_HTML_PARSER", "auto")
+    if name == "auto":
+        return "selectolax" if "selectolax" in PARSERS else "stream"
+    if name not in PARSERS:
+        print(f"⚠️  未知的 HTML 解析后端 {name}，使用 stream", file=sys.stderr)
+        return "stream"
+    return name
+
+
+def parse_results(html: str, max_results: int, parser: str = None) -> List[dict]:
+    """
+    解析 SearXNG HTML 结果页
+
+    Returns:
+        [{"title", "href", "body"}, ...]，最多 max_results 条
+    """
+    name = parser or default_parser()
+    if name != "bs4":
+        try:
+            return PARSERS[name](html, max_results)
+        except Exception as e:
+            print(f"⚠️  HTML 解析后端 {name} 失败，回退到 BeautifulSoup: {e}", file=sys.stderr)
+    return parse_bs4(html, max_results)
@@ -1,35 +1,134 @@
 #!/usr/bin/env python3
-"""SearXNG Search Script for Codex Skill"""
+"""SearXNG Search Script for Codex Skill
+
+SEARXNG_URL may list several instances separated by commas. Each call tries
+them in order of moving-average latency and error rate; instances that keep
+failing are skipped with exponential backoff. The routing state is kept in
+SEARXNG_STATE_PATH so it survives between invocations.
+
+Result pages are parsed with searx_html (a streaming parser that stops after
+max_results) when it sits next to this script or in the reference directory,
+otherwise with BeautifulSoup.
+"""
 import requests
 from bs4 import BeautifulSoup
 import json
+import os
 import sys
+import time
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path[1:1] = [_here, os.path.join(_here, "..", "..", "..")]
+try:
+    from searx_html import parse_results
+except ImportError:
+    parse_results = None
+
+ENGINES = [
+    url.strip().rstrip("/")
+    for url in os.getenv("SEARXNG_URL", "http://127.0.0.1:8888").split(",")
+    if url.strip()
+]
+STATE_PATH = os.path.expanduser(
+    os.getenv("SEARXNG_STATE_PATH", "~/.cache/searxng-mcp/instances.json")
+)
+ALPHA = 0.2
+EJECT_AFTER = 3
+BACKOFF = 5.0
+MAX_BACKOFF = 300.0
+ERROR_PENALTY = 2.0  # seconds of latency one unit of error rate is worth
+
+
+def load_state():
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    try:
+        os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+        tmp = f"{STATE_PATH}.{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, STATE_PATH)
+    except OSError:
+        pass
+
+
+def order_engines(state, now):
+    """Healthy instances by score, then ejected ones by when they come back"""
+    def score(engine):
+        s = state.get(engine, {})
+        return (s.get("latency") or 0.001) + ERROR_PENALTY * s.get("error_rate", 0.0)
+
+    healthy = [e for e in ENGINES if state.get(e, {}).get("ejected_until", 0) <= now]
+    ejected = [e for e in ENGINES if e not in healthy]
+    return sorted(healthy, key=score) + sorted(ejected, key=lambda e: state[e]["ejected_until"])
+
+
+def record(state, engine, latency, ok):
+    s = state.setdefault(engine, {"latency": None, "error_rate": 0.0, "failures": 0, "ejections": 0})
+    s["error_rate"] += ALPHA * ((0.0 if ok else 1.0) - s["error_rate"])
+    if ok:
+        s["latency"] = latency if s["latency"] is None else s["latency"] + ALPHA * (latency - s["latency"])
+        s.update(failures=0, ejections=0, ejected_until=0)
+        return
+    s["failures"] += 1
+    if s["failures"] >= EJECT_AFTER:
+        s["ejections"] += 1
+        s["ejected_until"] = time.time() + min(BACKOFF * 2 ** (s["ejections"] - 1), MAX_BACKOFF)
+
 
 def search(query, max_results=10, lang="en"):
     """Search using SearXNG and return structured results"""
-    engine = "http://127.0.0.1:8888"
     params = {"q": query, "language": lang, "safesearch": 1}
     headers = {"User-Agent": "Mozilla/5.0"}
-    
+
+    state = load_state()
+    error = None
     try:
-        r = requests.get(f"{engine}/search", params=params, headers=headers, timeout=15)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        results = soup.find_all("article", class_="result")
-        
-        output = []
-        for result in results[:max_results]:
-            h3 = result.find("h3")
-            if h3:
-                link = h3.find("a")
-                if link:
-                    output.append({
-                        "title": link.text.strip(),
-                        "url": link.get("href", "")
-                    })
-        return output
-    except Exception as e:
-        return [{"error": str(e)}]
+        for engine in order_engines(state, time.time()):
+            started = time.time()
+            try:
+                r = requests.get(f"{engine}/search", params=params, headers=headers, timeout=15)
+                # Rate limiting and server errors mean another instance may do better
+                if r.status_code == 429 or r.status_code >= 500:
+                    r.raise_for_status()
+            except requests.RequestException as e:
+                record(state, engine, time.time() - started, False)
+                error = e
+                continue
+            record(state, engine, time.time() - started, True)
+
+            try:
+                r.raise_for_status()
+                if parse_results is not None:
+                    return [
+                        {"title": item["title"], "url": item["href"]}
+                        for item in parse_results(r.text, max_results)
+                    ]
+                soup = BeautifulSoup(r.text, "html.parser")
+                results = soup.find_all("article", class_="result")
+
+                output = []
+                for result in results[:max_results]:
+                    h3 = result.find("h3")
+                    if h3:
+                        link = h3.find("a")
+                        if link:
+                            output.append({
+                                "title": link.text.strip(),
+                                "url": link.get("href", "")
+                            })
+                return output
+            except Exception as e:
+                return [{"error": str(e)}]
+        return [{"error": str(error)}]
+    finally:
+        save_state(state)
 
 if __name__ == "__main__":
     query = " ".join(sys.argv[1:])
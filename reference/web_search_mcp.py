@@ -5,112 +5,726 @@ MCP Server for SearXNG Search
 """
 import asyncio
 import json
+import os
+import sqlite3
 import sys
+import threading
+import time
+from collections import OrderedDict
 from typing import Any
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
-import requests
-from bs4 import BeautifulSoup
+import httpx
+from searx_html import parse_results
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询（合并空白、忽略大小写），用于合并相同的搜索"""
+    return " ".join((query or "").split()).casefold()
+
+
+class SearchCache:
+    """
+    两级搜索结果缓存：内存 LRU + SQLite 磁盘
+
+    - 内存层按 LRU 淘汰，命中时无 IO
+    - 磁盘层在 MCP 服务器重启后仍然有效，多个进程可共享同一文件（WAL）
+    - 每个条目有自己的过期时间，超过条目上限时淘汰最久未访问的条目
+    - 磁盘读在线程中执行；写入和命中时的访问时间先放进缓冲区，
+      由后台一次事务批量提交，慢提交或其他进程持有写锁都不会阻塞事件循环
+    """
+
+    # 缓冲的写入最多等待的秒数
+    FLUSH_INTERVAL = 0.5
+    # 每写入多少条清理一次磁盘层
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        path: str = None,
+        ttl: float = 3600,
+        memory_entries: int = 1000,
+        disk_entries: int = 50000,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None  # 后台写入用
+        self._reader = None  # 线程中读取用
+        self._db_lock = threading.Lock()
+        self._reader_lock = threading.Lock()
+        self._pending = {}  # key -> (value, expires_at, accessed_at)，待写入
+        self._touched = {}  # key -> accessed_at，待更新的访问时间
+        self._flush_task = None
+        self._disk_writes = 0
+        self._disk_count = None  # 上次清理时的磁盘条目数
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            try:
+                self._open(path)
+            except sqlite3.Error as e:
+                print(f"⚠️  搜索缓存数据库不可用，仅使用内存缓存: {e}", file=sys.stderr)
+                self._db = self._reader = None
+
+    def _open(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache (accessed_at)"
+        )
+        self._db.commit()
+        self._reader = sqlite3.connect(path, check_same_thread=False, timeout=5)
+
+    @staticmethod
+    def make_key(query: str, max_results: int, lang: str) -> str:
+        return json.dumps([normalize_query(query), int(max_results), lang or "auto"], ensure_ascii=False)
+
+    def get_memory(self, key: str):
+        """只读内存层，未命中返回 None（不计入未命中次数）"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+            # 还没写到磁盘的条目
+            pending = self._pending.get(key)
+            if pending is not None and pending[1] > now:
+                self._remember(key, pending[0], pending[1])
+                self.memory_hits += 1
+                return pending[0]
+            return None
+
+    async def get(self, key: str):
+        """读取缓存，未命中或已过期返回 None"""
+        value = self.get_memory(key)
+        if value is not None:
+            return value
+
+        if self._reader is not None:
+            try:
+                row = await asyncio.to_thread(self._read, key)
+            except sqlite3.Error as e:
+                print(f"⚠️  读取搜索缓存失败: {e}", file=sys.stderr)
+                row = None
+            now = time.time()
+            if row and row[1] > now:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self._touched[key] = now
+                    self.disk_hits += 1
+                self._schedule_flush()
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _read(self, key: str):
+        with self._reader_lock:
+            return self._reader.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+    async def set(self, key: str, value: str, ttl: float = None):
+        """写入缓存，ttl 为该条目的有效秒数（默认使用全局 TTL）"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is None:
+                return
+            self._pending[key] = (value, expires_at, now)
+            self._touched.pop(key, None)
+        self._schedule_flush()
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.FLUSH_INTERVAL)
+        while self._pending or self._touched:
+            await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """把缓冲的写入和访问时间一次提交到磁盘（在线程中调用）"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, {}
+        if self._db is None or not (pending or touched):
+            return
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO search_cache (key, value, expires_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    [(key, *entry) for key, entry in pending.items()],
+                )
+                self._db.executemany(
+                    "UPDATE search_cache SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, key) for key, accessed_at in touched.items()],
+                )
+                self._db.commit()
+                # 定期清理，避免每次写入都统计行数
+                before = self._disk_writes // self.EVICT_EVERY
+                self._disk_writes += len(pending)
+                if self._disk_writes // self.EVICT_EVERY != before or self._disk_count is None:
+                    self._evict_disk()
+            except sqlite3.Error as e:
+                self._db.rollback()
+                print(f"⚠️  写入搜索缓存失败: {e}", file=sys.stderr)
+
+    async def aclose(self):
+        """提交缓冲中的写入"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await asyncio.to_thread(self.flush)
+
+    def _evict_disk(self):
+        self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+        count = self._db.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        overflow = count - self.disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                " SELECT key FROM search_cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            with self._lock:
+                self.evictions += overflow
+            count -= overflow
+        self._db.commit()
+        self._disk_count = count
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_count,  # 上次清理时统计
+                "pending_writes": len(self._pending),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "path": self.path,
+            }
+
+
+class SearXNGInstance:
+    """单个 SearXNG 实例的健康状态和限流令牌桶"""
+
+    def __init__(self, url: str, rate_limit: float = 0):
+        self.url = url.rstrip("/")
+        self.rate_limit = rate_limit  # 每秒请求数，0 表示不限流
+
+        self.latency = None      # 延迟移动平均（秒），None 表示尚未请求过
+        self.error_rate = 0.0    # 错误率移动平均
+        self.active = 0
+        self.failures = 0        # 连续失败次数
+        self.ejections = 0       # 连续剔除次数，决定退避时长
+        self.ejected_until = 0.0
+        self.probing = False     # 剔除期满后只放行一个探测请求
+
+        self._tokens = max(1.0, rate_limit)
+        self._refilled_at = time.monotonic()
+
+        self.requests = 0
+        self.errors = 0
+
+    def _refill(self, now: float):
+        if self.rate_limit > 0:
+            self._tokens = min(
+                max(1.0, self.rate_limit),
+                self._tokens + (now - self._refilled_at) * self.rate_limit,
+            )
+        self._refilled_at = now
+
+    def wait_time(self, now: float) -> float:
+        """距离下一个可用令牌的秒数，0 表示现在就能发请求"""
+        if self.rate_limit <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate_limit
+
+    def take_token(self, now: float):
+        if self.rate_limit > 0:
+            self._refill(now)
+            self._tokens -= 1
+
+    # 错误率折算成的延迟惩罚（秒），错误率 10% 相当于慢 0.2 秒
+    ERROR_PENALTY = 2.0
+
+    def score(self) -> float:
+        """越小越好：按当前负载放大的延迟，加上错误惩罚"""
+        # 尚未测过延迟的实例优先，但仍按负载分摊
+        latency = self.latency if self.latency is not None else 0.001
+        return latency * (1 + self.active) + self.ERROR_PENALTY * self.error_rate
+
+    def stats(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "active": self.active,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejected_for": round(max(0.0, self.ejected_until - now), 1),
+        }
+
+
+class InstanceRouter:
+    """
+    在多个 SearXNG 实例间路由搜索请求
+
+    - 按延迟和错误率的指数移动平均选择得分最低的实例，并考虑当前负载
+    - 连续失败 eject_after 次的实例被剔除，剔除时长按次数指数退避
+    - 剔除期满后先放行一个探测请求，成功才恢复，失败则继续退避
+    - 每个实例有独立的令牌桶限流，所有实例都限流时等待最早可用的令牌
+    """
+
+    def __init__(
+        self,
+        urls: list,
+        rate_limit: float = 0,
+        eject_after: int = 3,
+        backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        alpha: float = 0.2,
+    ):
+        if not urls:
+            raise ValueError("至少需要一个 SearXNG 实例")
+        self.instances = [SearXNGInstance(url, rate_limit) for url in urls]
+        self.eject_after = eject_after
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.alpha = alpha
+
+    @staticmethod
+    def parse_urls(value: str) -> list:
+        """解析逗号分隔的实例地址"""
+        return [url.strip() for url in (value or "").split(",") if url.strip()]
+
+    def _candidates(self, now: float, exclude: set) -> list:
+        healthy = [
+            i for i in self.instances
+            if i.url not in exclude and i.ejected_until <= now and not i.probing
+        ]
+        if healthy:
+            return healthy
+        # 全部被剔除：选剔除期最早结束的实例，总比直接失败好
+        remaining = [i for i in self.instances if i.url not in exclude]
+        if not remaining:
+            return []
+        return [min(remaining, key=lambda i: i.ejected_until)]
+
+    async def acquire(self, exclude: set = frozenset()) -> SearXNGInstance:
+        """选择一个实例并占用一个令牌；exclude 中的实例本次请求已失败过"""
+        while True:
+            now = time.monotonic()
+            candidates = self._candidates(now, exclude)
+            if not candidates:
+                return None
+            ready = [i for i in candidates if i.wait_time(now) == 0]
+            if ready:
+                instance = min(ready, key=lambda i: i.score())
+                instance.take_token(now)
+                if instance.failures >= self.eject_after:
+                    instance.probing = True
+                instance.active += 1
+                instance.requests += 1
+                return instance
+            await asyncio.sleep(min(i.wait_time(now) for i in candidates))
+
+    def release(self, instance: SearXNGInstance, latency: float, ok: bool = None):
+        """记录一次请求的结果，更新移动平均并决定是否剔除；ok 为 None 表示请求被取消，不计入统计"""
+        instance.active -= 1
+        instance.probing = False
+        if ok is None:
+            return
+        instance.error_rate += self.alpha * ((0.0 if ok else 1.0) - instance.error_rate)
+
+        if ok:
+            if instance.latency is None:
+                instance.latency = latency
+            else:
+                instance.latency += self.alpha * (latency - instance.latency)
+            instance.failures = 0
+            instance.ejections = 0
+            instance.ejected_until = 0.0
+            return
+
+        instance.errors += 1
+        instance.failures += 1
+        # 已被剔除时，同一批并发请求的失败不再叠加退避
+        if instance.failures >= self.eject_after and instance.ejected_until <= time.monotonic():
+            instance.ejections += 1
+            duration = min(self.backoff * 2 ** (instance.ejections - 1), self.max_backoff)
+            instance.ejected_until = time.monotonic() + duration
+            print(f"⚠️  SearXNG 实例 {instance.url} 连续失败 {instance.failures} 次，剔除 {duration:.1f} 秒", file=sys.stderr)
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        return [i.stats(now) for i in self.instances]
 
 
 class SearXNGSearch:
-    """SearXNG 搜索类"""
+    """
+    SearXNG 搜索类
+
+    使用异步 HTTP 客户端：keep-alive 连接池复用连接，每个请求有独立超时，
+    并用信号量限制同时发往 SearXNG 的请求数，一个慢请求不会阻塞其他工具调用。
+
+    engine_url 可以是逗号分隔的多个实例，由 InstanceRouter 按延迟和错误率选择，
+    某个实例连接失败、限流（429）或返回 5xx 时换下一个实例重试。
+    """
+
+    # 空结果可能是上游临时问题，只短暂缓存
+    EMPTY_RESULT_TTL = 300
+
+    # 搜索失败时返回单条结果，标题为 ERROR_TITLE
+    ERROR_TITLE = "搜索错误"
 
-    def __init__(self, engine_url: str = "http://127.0.0.1:8888"):
+    def __init__(
+        self,
+        engine_url: str = "http://127.0.0.1:8888",
+        cache: SearchCache = None,
+        timeout: float = 15.0,
+        max_connections: int = 20,
+        max_concurrency: int = 10,
+        router: InstanceRouter = None,
+    ):
         self.engine_url = engine_url
+        self.router = router or InstanceRouter(InstanceRouter.parse_urls(engine_url))
+        self.cache = cache
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+
+        # 客户端和信号量属于事件循环，首次搜索时在当前循环中创建
+        self._client = None
+        self._semaphore = None
+
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": "Mozilla/5.0"},
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self):
+        """关闭连接池，并提交缓存中尚未写入磁盘的条目"""
+        if self.cache is not None:
+            await self.cache.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
 
-    def search(self, query: str, max_results: int = 10, lang: str = "auto") -> str:
+    async def cached(self, query: str, max_results: int = 10, lang: str = "auto"):
+        """只查缓存，未命中返回 None"""
+        if self.cache is None:
+            return None
+        return await self.cache.get(SearchCache.make_key(query, max_results, lang))
+
+    async def search(self, query: str, max_results: int = 10, lang: str = "auto", check_cache: bool = True) -> str:
         """
-        执行搜索并返回格式化结果
+        执行搜索并返回格式化结果（优先读取缓存，失败结果不缓存）
 
         Args:
             query: 搜索查询
             max_results: 最大结果数
             lang: 语言设置
+            check_cache: 调用方已查过缓存时传 False
 
         Returns:
             JSON 格式的搜索结果字符串
         """
+        if check_cache:
+            cached = await self.cached(query, max_results, lang)
+            if cached is not None:
+                return cached
+
+        try:
+            formatted_results = await self._fetch(query, max_results, lang)
+        except Exception as e:
+            self.errors += 1
+            error_result = [{
+                "title": self.ERROR_TITLE,
+                "href": "",
+                "body": f"搜索失败: {str(e) or type(e).__name__}"
+            }]
+            return json.dumps(error_result, ensure_ascii=False)
+
+        result = json.dumps(formatted_results, ensure_ascii=False)
+        if self.cache is not None:
+            await self.cache.set(
+                SearchCache.make_key(query, max_results, lang),
+                result,
+                ttl=None if formatted_results else self.EMPTY_RESULT_TTL,
+            )
+        return result
+
+    async def _fetch(self, query: str, max_results: int, lang: str) -> list:
+        """请求 SearXNG 并解析结果，出错时抛出异常"""
         params = {
             "q": query,
             "language": lang,
             "safesearch": 1,
             "format": "json"  # 使用 JSON 格式更容易解析
         }
-        headers = {"User-Agent": "Mozilla/5.0"}
 
+        client = self._get_client()
+        async with self._semaphore:
+            self.active += 1
+            try:
+                response = await self._get_from_instances(client, params)
+            finally:
+                self.active -= 1
+        response.raise_for_status()
+
+        # 尝试解析 JSON 格式结果
         try:
-            response = requests.get(
-                f"{self.engine_url}/search",
-                params=params,
-                headers=headers,
-                timeout=15
-            )
-            response.raise_for_status()
+            data = response.json()
+        except json.JSONDecodeError:
+            # 如果不是 JSON 格式，回退到 HTML 解析（CPU 密集，放到线程中）
+            return await asyncio.to_thread(self._parse_html, response.text, max_results)
 
-            # 尝试解析 JSON 格式结果
+        return self._parse_json(data, max_results)
+
+    async def _get_from_instances(self, client: httpx.AsyncClient, params: dict) -> httpx.Response:
+        """依次尝试实例直到某个实例正常响应，所有实例都失败时抛出最后一个错误"""
+        tried = set()
+        last_error = None
+        while True:
+            instance = await self.router.acquire(tried)
+            if instance is None:
+                raise last_error
+            tried.add(instance.url)
+
+            self.requests += 1
+            started = time.monotonic()
+            ok = None
             try:
-                data = response.json()
-                results = data.get("results", [])
-
-                # 格式化结果为 gpt-researcher 期望的格式
-                formatted_results = []
-                for result in results[:max_results]:
-                    # 提取内容
-                    content = result.get("content", "")
-                    if not content:
-                        # 如果没有内容，尝试获取 snippet
-                        content = result.get("snippet", "")
-
-                    formatted_results.append({
-                        "title": result.get("title", ""),
-                        "href": result.get("url", ""),
-                        "body": content
-                    })
-
-                return json.dumps(formatted_results, ensure_ascii=False)
-
-            except json.JSONDecodeError:
-                # 如果不是 JSON 格式，回退到 HTML 解析
-                soup = BeautifulSoup(response.text, "html.parser")
-                results = soup.find_all("article", class_="result")
-
-                formatted_results = []
-                for result in results[:max_results]:
-                    h3 = result.find("h3")
-                    if h3:
-                        link = h3.find("a")
-                        if link:
-                            # 获取内容
-                            content_div = result.find("div", class_="content")
-                            content = content_div.get_text(strip=True) if content_div else ""
-
-                            formatted_results.append({
-                                "title": link.text.strip(),
-                                "href": link.get("href", ""),
-                                "body": content
-                            })
-
-                return json.dumps(formatted_results, ensure_ascii=False)
+                response = await client.get(f"{instance.url}/search", params=params)
+                # 限流和服务端错误是实例的问题，换实例重试；其他 4xx 直接返回给调用方
+                if response.status_code == 429 or response.status_code >= 500:
+                    response.raise_for_status()
+                ok = True
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                ok = False
+                last_error = e
+            finally:
+                self.router.release(instance, time.monotonic() - started, ok)
+
+    @staticmethod
+    def _parse_json(data: dict, max_results: int) -> list:
+        results = data.get("results", [])
+
+        # 格式化结果为 gpt-researcher 期望的格式
+        formatted_results = []
+        for result in results[:max_results]:
+            # 提取内容
+            content = result.get("content", "")
+            if not content:
+                # 如果没有内容，尝试获取 snippet
+                content = result.get("snippet", "")
+
+            formatted_results.append({
+                "title": result.get("title", ""),
+                "href": result.get("url", ""),
+                "body": content
+            })
+
+        return formatted_results
+
+    @staticmethod
+    def _parse_html(html: str, max_results: int) -> list:
+        return parse_results(html, max_results)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "max_connections": self.max_connections,
+            "instances": self.router.stats(),
+        }
 
-        except Exception as e:
-            error_result = [{
-                "title": "搜索错误",
-                "href": "",
-                "body": f"搜索失败: {str(e)}"
-            }]
-            return json.dumps(error_result, ensure_ascii=False)
+
+class SingleFlight:
+    """
+    合并相同的并发搜索
+
+    同一 (query, max_results, lang) 的搜索正在进行时，后来的调用不再请求
+    SearXNG，而是等待同一个结果。上游请求在独立任务中执行，某个调用方
+    被取消不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._inflight: dict = {}
+        self.calls = 0      # 总调用次数
+        self.upstream = 0   # 实际发往 SearXNG 的请求数
+        self.merged = 0     # 合并到进行中请求的调用数
+
+    async def do(self, key, fn):
+        """执行 fn()，相同 key 的并发调用共享同一结果"""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.merged += 1
+        else:
+            self.upstream += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "upstream": self.upstream,
+            "merged": self.merged,
+            "in_flight": len(self._inflight),
+            "merge_rate": round(self.merged / self.calls, 4) if self.calls else 0.0,
+        }
 
 
 # 创建 MCP 服务器实例
 server = Server("searxng-search")
 
 # 初始化搜索客户端
-# 可以通过环境变量 SEARXNG_URL 自定义 SearXNG 地址
-import os
+# 可以通过环境变量 SEARXNG_URL 自定义 SearXNG 地址，多个实例用逗号分隔
 searxng_url = os.getenv("SEARXNG_URL", "http://127.0.0.1:8888")
-search_client = SearXNGSearch(searxng_url)
+searxng_router = InstanceRouter(
+    InstanceRouter.parse_urls(searxng_url) or ["http://127.0.0.1:8888"],
+    rate_limit=float(os.getenv("SEARCH_INSTANCE_RATE_LIMIT", "0")),
+    eject_after=int(os.getenv("SEARCH_INSTANCE_EJECT_AFTER", "3")),
+    backoff=float(os.getenv("SEARCH_INSTANCE_BACKOFF", "5")),
+    max_backoff=float(os.getenv("SEARCH_INSTANCE_MAX_BACKOFF", "300")),
+)
+
+# 搜索结果缓存，SEARCH_CACHE_PATH 为空时只使用内存缓存
+search_cache = SearchCache(
+    path=os.path.expanduser(
+        os.getenv("SEARCH_CACHE_PATH", "~/.cache/searxng-mcp/search_cache.sqlite3")
+    ) or None,
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+    memory_entries=int(os.getenv("SEARCH_CACHE_MEMORY_ENTRIES", "1000")),
+    disk_entries=int(os.getenv("SEARCH_CACHE_DISK_ENTRIES", "50000")),
+)
+search_client = SearXNGSearch(
+    searxng_url,
+    cache=search_cache,
+    timeout=float(os.getenv("SEARCH_TIMEOUT", "15")),
+    max_connections=int(os.getenv("SEARCH_MAX_CONNECTIONS", "20")),
+    max_concurrency=int(os.getenv("SEARCH_MAX_CONCURRENCY", "10")),
+    router=searxng_router,
+)
+search_flight = SingleFlight()
+
+# search_batch 同时执行的查询数上限
+search_batch_concurrency = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "5"))
+
+
+async def search(query: str, max_results: int = 10, lang: str = "auto") -> str:
+    """搜索入口：先查缓存，再合并相同的并发搜索"""
+    cached = await search_client.cached(query, max_results, lang)
+    if cached is not None:
+        return cached
+
+    key = (normalize_query(query), int(max_results), lang)
+    return await search_flight.do(
+        key, lambda: search_client.search(query, max_results, lang, check_cache=False)
+    )
+
+
+async def search_batch(
+    queries: list,
+    max_results: int = 10,
+    lang: str = "auto",
+    concurrency: int = None,
+) -> dict:
+    """
+    批量搜索：并发执行多个查询，结果按查询分组
+
+    每个查询仍走缓存和请求合并；单个查询失败只记录在它自己的 error 字段，
+    不影响其他查询。
+
+    Returns:
+        {"batch": [{"query": ..., "results": [...], "error": None 或错误信息}, ...]}
+    """
+    limit = min(int(concurrency or search_batch_concurrency), search_batch_concurrency)
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(query: str) -> dict:
+        async with semaphore:
+            try:
+                results = json.loads(await search(query, max_results, lang))
+            except Exception as e:
+                return {"query": query, "results": [], "error": str(e) or type(e).__name__}
+        if (
+            len(results) == 1
+            and results[0].get("title") == SearXNGSearch.ERROR_TITLE
+            and not results[0].get("href")
+        ):
+            return {"query": query, "results": [], "error": results[0].get("body", "")}
+        return {"query": query, "results": results, "error": None}
+
+    queries = [q for q in queries if isinstance(q, str) and q.strip()]
+    return {"batch": list(await asyncio.gather(*(run(q) for q in queries)))}
+
+
+def search_stats() -> dict:
+    """搜索统计（合并次数、缓存命中等）"""
+    return {
+        "single_flight": search_flight.stats(),
+        "cache": search_cache.stats(),
+        "http": search_client.stats(),
+    }
 
 
 @server.list_tools()
@@ -143,6 +757,43 @@ async def list_tools() -> list[Tool]:
                 },
                 "required": ["query"]
             }
+        ),
+        Tool(
+            name="search_batch",
+            description=(
+                "一次执行多个搜索查询（并发），结果按查询分组返回。"
+                "需要同时搜索多个子问题时使用，比多次调用 search 更快。"
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "搜索查询字符串列表"
+                    },
+                    "max_results": {
+                        "type": "number",
+                        "description": "每个查询返回的最大结果数（默认10）",
+                        "default": 10
+                    },
+                    "lang": {
+                        "type": "string",
+                        "description": "语言设置（默认auto自动检测）",
+                        "default": "auto"
+                    },
+                    "concurrency": {
+                        "type": "number",
+                        "description": f"同时执行的查询数（默认且最多 {search_batch_concurrency}）"
+                    }
+                },
+                "required": ["queries"]
+            }
+        ),
+        Tool(
+            name="search_stats",
+            description="返回搜索服务的统计信息（请求合并次数、缓存命中率等），不执行搜索。",
+            inputSchema={"type": "object", "properties": {}}
         )
     ]
 
@@ -156,22 +807,103 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
         lang = arguments.get("lang", "auto")
 
         # 执行搜索
-        result = search_client.search(query, max_results, lang)
+        result = await search(query, max_results, lang)
 
         return [TextContent(type="text", text=result)]
+    elif name == "search_batch":
+        queries = arguments.get("queries", [])
+        if isinstance(queries, str):
+            queries = [queries]
+        result = await search_batch(
+            queries,
+            arguments.get("max_results", 10),
+            arguments.get("lang", "auto"),
+            arguments.get("concurrency"),
+        )
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+    elif name == "search_stats":
+        return [TextContent(type="text", text=json.dumps(search_stats(), ensure_ascii=False))]
     else:
         return [TextContent(type="text", text=f"未知工具: {name}")]
 
 
 async def main():
     """启动 MCP 服务器"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        await search_client.aclose()
+
+
+def run_http(host: str = "127.0.0.1", port: int = 8765):
+    """
+    以 Streamable HTTP 方式启动常驻 MCP 服务器
+
+    供后端进程池预先启动并在多个研究之间复用:
+    - MCP 端点: http://{host}:{port}/mcp
+    - 健康检查: http://{host}:{port}/health
+    """
+    import contextlib
+    import time
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Mount, Route
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+    # 无状态模式：每个请求独立，多个研究可并发共享同一进程
+    session_manager = StreamableHTTPSessionManager(app=server, stateless=True)
+    started_at = time.time()
+
+    async def handle_mcp(scope, receive, send):
+        await session_manager.handle_request(scope, receive, send)
+
+    async def health(request):
+        return JSONResponse({
+            "status": "ok",
+            "searxng_url": searxng_url,
+            "uptime_seconds": round(time.time() - started_at, 1),
+            "search": search_stats()
+        })
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            try:
+                yield
+            finally:
+                await search_client.aclose()
+
+    app = Starlette(
+        routes=[
+            Route("/health", health),
+            Mount("/mcp", app=handle_mcp),
+        ],
+        lifespan=lifespan,
+    )
+    uvicorn.run(app, host=host, port=port, log_level="warning")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SearXNG MCP Server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "http"],
+        default="stdio",
+        help="stdio: 由调用方按需启动; http: 常驻进程，供进程池复用"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.transport == "http":
+        run_http(args.host, args.port)
+    else:
+        asyncio.run(main())